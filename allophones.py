@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak allophone table
+# retroSpeak is a Raspberry Pi controlled speech synthesizer using the vintage
+# SP0256-AL2 chip, and MCP23S17 SPI controlled port expander.
+#
+# The 64 allophones of the SP0256-AL2 with their address codes and durations,
+# taken from the Archer/Radioshack SP0256 datasheet.
+# The datasheet is available here: http://www.cpcwiki.eu/imgs/3/35/Sp0256al2_datasheet.pdf
+#
+# This module doesn't need any hardware libraries, so it can be used to work
+# with allophones on machines without a retroSpeak board.
+#
+# allophoneCodes['HH1'] returns the address code 27
+# allophoneNames[27] returns 'HH1'
+# allophoneDurations['HH1'] returns the duration in ms at the default 3.12MHz clock
+# codeDurations[27] returns the same, by address code
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import array
+
+# Clock speed the datasheet durations are given for
+defaultClock = 3.12
+
+# Allophone lookup table from datasheet
+allophoneCodes = { 'PA1':0, 'PA2':1, 'PA3':2, 'PA4':3, 'PA5':4, 'OY':5, 'AY':6, 'EH':7,
+             'KK3':8, 'PP':9, 'JH':10, 'NN1':11, 'IH':12, 'TT2':13, 'RR1':14, 'AX':15,
+             'MM':16, 'TT1':17, 'DH1':18, 'IY':19, 'EY':20, 'DD1':21, 'UW1':22, 'AO':23,
+             'AA':24, 'YY2':25, 'AE':26, 'HH1':27, 'BB1':28, 'TH':29, 'UH':30, 'UW2':31,
+             'AW':32, 'DD2':33, 'GG3':34, 'VV':35, 'GG1':36, 'SH':37, 'ZH':38, 'RR2':39,
+             'FF':40, 'KK2':41, 'KK1':42, 'ZZ':43, 'NG':44, 'LL':45, 'WW':46, 'XR':47,
+             'WH':48, 'YY1':49, 'CH':50, 'ER1':51, 'ER2':52, 'OW':53, 'DH2':54, 'SS':55,
+             'NN2':56, 'HH2':57, 'OR':58, 'AR':59, 'YR':60, 'GG2':61, 'EL':62, 'BB2':63 }
+
+# Address code to allophone name
+allophoneNames = sorted(allophoneCodes, key=allophoneCodes.get)
+
+# Allophone durations in ms at 3.12MHz from datasheet
+allophoneDurations = { 'PA1':10, 'PA2':30, 'PA3':50, 'PA4':100, 'PA5':200, 'OY':420, 'AY':260, 'EH':70,
+             'KK3':120, 'PP':210, 'JH':140, 'NN1':140, 'IH':70, 'TT2':140, 'RR1':170, 'AX':70,
+             'MM':180, 'TT1':100, 'DH1':290, 'IY':250, 'EY':280, 'DD1':70, 'UW1':100, 'AO':100,
+             'AA':100, 'YY2':180, 'AE':120, 'HH1':130, 'BB1':80, 'TH':180, 'UH':100, 'UW2':260,
+             'AW':370, 'DD2':160, 'GG3':140, 'VV':190, 'GG1':80, 'SH':160, 'ZH':190, 'RR2':120,
+             'FF':150, 'KK2':190, 'KK1':160, 'ZZ':210, 'NG':220, 'LL':110, 'WW':180, 'XR':360,
+             'WH':200, 'YY1':130, 'CH':190, 'ER1':160, 'ER2':300, 'OW':240, 'DH2':240, 'SS':90,
+             'NN2':190, 'HH2':180, 'OR':330, 'AR':290, 'YR':350, 'GG2':40, 'EL':190, 'BB2':50 }
+
+# Allophone durations in ms at 3.12MHz by address code
+codeDurations = [allophoneDurations[a] for a in allophoneNames]
+
+# Mean allophone duration in ms at 3.12MHz
+meanDuration = sum(allophoneDurations.values()) / float(len(allophoneDurations))
+
+def duration(allophone, clock=defaultClock):
+    # Return the time in seconds the allophone takes to speak at the given clock speed
+    # The SP0256 runs proportionally slower or faster with its clock
+    return allophoneDurations[allophone] * defaultClock / (clock * 1000.0)
+
+def codeDuration(code, clock=defaultClock):
+    # As duration, for an allophone address code
+    return codeDurations[code] * defaultClock / (clock * 1000.0)
+
+def speechDuration(allophones, clock=defaultClock):
+    # Return the time in seconds a list of allophones takes to speak
+    return sum(allophoneDurations[a] for a in allophones) * defaultClock / (clock * 1000.0)
+
+def encode(speech):
+    # Convert a string of allophones separated by spaces to an array of address codes
+    # Strings not in the allophone table are ignored
+    return array.array('B', [allophoneCodes[a] for a in speech.upper().split() if a in allophoneCodes])
+
+def decode(codes):
+    # Convert a sequence of address codes to a list of allophone names
+    return [allophoneNames[c & 0x3F] for c in codes]
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak benchmark - text to speech on a reference corpus
+#
+#   usage: benchCorpus.py [-h] [-r REPEAT] [-o RESULTS] [--update]
+#                         [--words WORDS] [--sentences SENTENCES]
+#
+# Runs the text to speech engine over the bundled corpus in benchmarks/data:
+#   words.txt      - English words, one per line
+#   sentences.txt  - English sentences, one per line
+#   phonemes.txt   - the phonemes for every word in both, from the reference
+#                    implementation (translateWordLinear - findRule and lrMatch)
+#
+# First it checks every word gives exactly the same phonemes from
+# translateWord as from the reference, and as recorded in phonemes.txt. Any
+# difference is listed and the benchmark stops. --update writes phonemes.txt
+# again from the reference, for when the rules are meant to have changed.
+#
+# Then it reports
+#   words per second   - translateWord over words.txt, and textToAllophones
+#                        over sentences.txt, best of REPEAT runs
+#   latency            - percentiles of the time translateWord takes per word
+#   comparisons        - rules tried per letter looked up, by the rule tries
+#                        and by a linear scan of the rules (ruleProfile.py)
+#   peak memory        - the maximum resident set size of the process
+# and with -o writes them to a JSON file, to keep for tracking over time.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import json
+import time
+import timeit
+import resource
+import platform
+import subprocess
+
+os.environ['RETROSPEAK_SIMULATE'] = '1'
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+
+import retroTTS
+import ruleProfile
+
+data = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+def readWords(path):
+    return [line.strip().upper() for line in open(path) if line.strip()]
+
+def readSentences(path):
+    return [line.split() for line in open(path) if line.strip()]
+
+def corpusWords(words, sentences):
+    # Every distinct word as translateWord sees it
+    seen = set(words)
+    for sentence in sentences:
+        seen.update(word.upper() for word in sentence)
+    return sorted(seen)
+
+def readPhonemes(path):
+    phonemes = {}
+    if os.path.exists(path):
+        for line in open(path):
+            fields = line.rstrip('\n').split('\t')
+            phonemes[fields[0]] = fields[1].split()
+    return phonemes
+
+def writePhonemes(path, words):
+    with open(path, 'w') as f:
+        for word in words:
+            f.write('{}\t{}\n'.format(word, ' '.join(retroTTS.translateWordLinear(word))))
+
+def differences(words, recorded):
+    # Words where translateWord disagrees with the reference or the recording
+    different = []
+    for word in words:
+        phonemes = retroTTS.translateWord(word)
+        reference = retroTTS.translateWordLinear(word)
+        if phonemes != reference or (recorded and recorded.get(word) != reference):
+            different.append((word, phonemes, reference, recorded.get(word)))
+    return different
+
+def best(run, repeat):
+    times = []
+    for n in range(repeat):
+        start = timeit.default_timer()
+        run()
+        times.append(timeit.default_timer() - start)
+    return min(times)
+
+def percentile(values, p):
+    return values[min(len(values)-1, int(len(values)*p/100.0))]
+
+def latencies(words):
+    timer = timeit.default_timer
+    translate = retroTTS.translateWord
+    times = []
+    for word in words:
+        start = timer()
+        translate(word)
+        times.append(timer() - start)
+    return sorted(times)
+
+def comparisons(words):
+    # Rules tried for each letter looked up, over all letters and by letter
+    profiler, phonemes = ruleProfile.profile(words)
+    tried, linear, elapsed = profiler.totals()
+    lookups = sum(sum(fired.values()) for fired in (profiler.fired(letter) for letter in profiler.rules))
+    byLetter = {}
+    for letter in sorted(profiler.rules):
+        fired = sum(profiler.fired(letter).values())
+        byLetter[letter] = { 'lookups':fired,
+                             'trie':sum(c[0] for c in profiler.rules[letter].values()) / float(max(fired, 1)),
+                             'linear':profiler.comparisons.get(letter, 0) / float(max(fired, 1)) }
+    return { 'lookups':lookups, 'trie':tried / float(max(lookups, 1)),
+             'linear':linear / float(max(lookups, 1)), 'letters':byLetter }
+
+def commit():
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=root, stderr=devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark the text to speech engine on a reference corpus')
+    parser.add_argument('-r','--repeat', action="store", default=3, dest='repeat', type=int, help='Best of this many runs')
+    parser.add_argument('-o','--output', action="store", default=None, dest='output', metavar='RESULTS', help='Write the results to this JSON file')
+    parser.add_argument('--update', action="store_const", const=True, default=False, dest='update', help='Record the reference phonemes again')
+    parser.add_argument('--words', action="store", default=os.path.join(data, 'words.txt'), dest='words', help='File with one word per line')
+    parser.add_argument('--sentences', action="store", default=os.path.join(data, 'sentences.txt'), dest='sentences', help='File with one sentence per line')
+    args = parser.parse_args()
+
+    words = readWords(args.words)
+    sentences = readSentences(args.sentences)
+    checked = corpusWords(words, sentences)
+    recordedPath = os.path.join(data, 'phonemes.txt')
+    if args.update:
+        writePhonemes(recordedPath, checked)
+        print("Recorded phonemes for {} words in {}".format(len(checked), recordedPath))
+
+    different = differences(checked, readPhonemes(recordedPath))
+    for word, phonemes, reference, recorded in different[:20]:
+        print("{}: translateWord {}  reference {}  recorded {}".format(word, phonemes, reference, recorded))
+    if different:
+        print("{} of {} words differ".format(len(different), len(checked)))
+        sys.exit(1)
+
+    sentenceWords = sum(len(sentence) for sentence in sentences)
+    wordRate = len(words) / best(lambda: [retroTTS.translateWord(word) for word in words], args.repeat)
+    sentenceRate = sentenceWords / best(lambda: [retroTTS.textToAllophones(sentence) for sentence in sentences], args.repeat)
+    times = latencies(words)
+    compared = comparisons(checked)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    results = { 'time':time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit':commit(), 'python':platform.python_version(),
+                'words':len(words), 'sentences':len(sentences), 'checked':len(checked), 'differences':len(different),
+                'wordsPerSecond':wordRate, 'sentenceWordsPerSecond':sentenceRate,
+                'latencyMicroseconds':dict(('p{}'.format(p), percentile(times, p)*1000000) for p in (50, 90, 99, 100)),
+                'comparisonsPerLetter':compared, 'peakRSSkB':peak }
+
+    print("{} words checked against the reference - all the same".format(len(checked)))
+    print("translateWord      {:8.0f} words/s".format(wordRate))
+    print("textToAllophones   {:8.0f} words/s".format(sentenceRate))
+    print("latency us         p50 {p50:.1f}  p90 {p90:.1f}  p99 {p99:.1f}  max {p100:.1f}".format(**results['latencyMicroseconds']))
+    print("rules per letter   trie {:.2f}  linear {:.2f}".format(compared['trie'], compared['linear']))
+    print("peak RSS           {} kB".format(peak))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
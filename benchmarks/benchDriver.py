@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak benchmark - driver throughput and latency suite
+#
+#   usage: benchDriver.py [-h] [-n COUNT] [--spi SECONDS] [-o RESULTS]
+#                         [-b BASELINE] [--save-baseline] [--tolerance PERCENT]
+#
+# Runs the retroSpeak driver on simulated boards (simBoard.py) - one board,
+# and a stack of four all speaking at once - normal and pipelined, and
+# measures
+#   allophonesPerSecond  - allophones spoken a second when they take no time
+#                          on the chip, so the driver is all there is - not
+#                          in pipelined mode, which sleeps through each
+#                          allophone by its datasheet time whatever the chip
+#                          does
+#   spiPerAllophone      - SPI transactions for each allophone
+#   latencyMs            - from speakCodes with one allophone to its ALD
+#                          pulse, percentiles
+#   gapMs                - from SBY going high on the chip to the next ALD
+#                          pulse, with allophones taking their datasheet
+#                          time, percentiles
+#   speakerCpu           - CPU seconds the speaker threads use for each
+#                          second of speech, over the same run as gapMs
+# and for one board
+#   freqToCodeUs         - microseconds for _freqToCode
+#   setClockUs           - microseconds for setClock
+#
+# The results are compared with a baseline - benchmarks/data/driverBaseline.json
+# unless -b is given - and anything more than --tolerance percent worse is
+# listed - the default is generous, as times on a shared machine wander. The
+# p99 and p100 percentiles are the slowest one or two of the samples, so they
+# are shown but not checked. The exit status is 1 if anything is worse.
+# --save-baseline makes these results the baseline. -o writes them to a JSON
+# file as well.
+#
+# SPI transactions take --spi seconds each, as on a real bus, except for
+# allophonesPerSecond, which is the driver code alone.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import json
+import time
+import timeit
+import platform
+import multiprocessing
+import subprocess
+
+os.environ['RETROSPEAK_SIMULATE'] = '1'
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+
+import retroSpeak
+import simBoard
+import allophones
+
+data = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Results where bigger is better - smaller is better for the rest
+higherIsBetter = ('allophonesPerSecond',)
+# Results too noisy to check against the baseline
+unchecked = ('p99', 'p100')
+
+def percentiles(values):
+    values = sorted(values)
+    return dict(('p{}'.format(p), values[min(len(values)-1, int(len(values)*p/100.0))] * 1000) for p in (50, 90, 99, 100))
+
+def threadTicks():
+    # CPU clock ticks used by each thread but this one, by thread id
+    ticks = {}
+    try:
+        for task in os.listdir('/proc/self/task'):
+            if int(task) != os.getpid():
+                fields = open('/proc/self/task/{}/stat'.format(task)).read().rsplit(')', 1)[1].split()
+                ticks[task] = int(fields[11]) + int(fields[12])
+    except (IOError, OSError):
+        return None
+    return ticks
+
+def speakerCpu(before, after):
+    # CPU seconds used by other threads between two threadTicks
+    if before is None or after is None:
+        return None
+    return sum(t - before.get(task, 0) for task, t in after.items()) / float(os.sysconf('SC_CLK_TCK'))
+
+def waitAll(boards):
+    # As retroSpeak.wait, but polling often enough not to hide the times
+    while any(board.isSpeaking() for board in boards):
+        time.sleep(0.001)
+
+def throughput(boards, count):
+    # Allophones a second, all boards at once
+    simBoard.setTimeScale(0)
+    simBoard.setSpiDelay(0)
+    codes = allophones.encode(' '.join(allophones.allophoneNames[5 + n % 59] for n in range(count)))
+    simBoard.clearEvents()
+    start = time.time()
+    for board in boards:
+        board.speakCodes(codes)
+    waitAll(boards)
+    elapsed = time.time() - start
+    return len(simBoard.events()) / elapsed
+
+def latency(boards, count, spi):
+    # Percentiles of speakCodes to ALD for one allophone at a time, taking
+    # turns round the boards
+    simBoard.setTimeScale(0)
+    simBoard.setSpiDelay(spi)
+    code = allophones.encode('PA1')
+    latencies = []
+    for n in range(count):
+        board = boards[n % len(boards)]
+        simBoard.clearEvents()
+        sent = time.time()
+        board.speakCodes(code)
+        while not simBoard.events():
+            time.sleep(0.0001)
+        latencies.append(simBoard.events()[0][0] - sent)
+        waitAll([board])
+    return percentiles(latencies)
+
+def gaps(boards, count, spi):
+    # Percentiles of the gap between allophones on the chip, SPI transactions
+    # for each allophone, and speaker CPU seconds for each second of speech
+    simBoard.setTimeScale(1)
+    simBoard.setSpiDelay(spi)
+    codes = allophones.encode(' '.join(allophones.allophoneNames[5 + n % 59] for n in range(count)))
+    simBoard.clearEvents()
+    before = threadTicks()
+    start = time.time()
+    for board in boards:
+        board.speakCodes(codes)
+    waitAll(boards)
+    elapsed = time.time() - start
+    cpu = speakerCpu(before, threadTicks())
+    found = []
+    for board in boards:
+        events = [e for e in simBoard.events() if e[1] == board._deviceNum]
+        found += [events[n+1][0] - events[n][3] for n in range(len(events)-1)]
+    spoken = len(simBoard.events())
+    return percentiles(found), simBoard.spiTransactions() / float(spoken), (cpu / elapsed if cpu is not None else None)
+
+def clockCosts(board, count):
+    simBoard.setSpiDelay(0)
+    freqToCode = timeit.timeit(lambda: board._freqToCode(3.12), number=count) / count * 1000000
+    setClock = timeit.timeit(lambda: board.setClock(3.12), number=count) / count * 1000000
+    return freqToCode, setClock
+
+def modeResults(mode, count, spi):
+    # Results for one board and a stack of four in one mode - boards can't be
+    # taken down, and there can only be four, so each mode has a process
+    results = {}
+    stack = [retroSpeak.retroSpeak(base=100+16*device, device=device, pipelined=(mode == 'pipelined')) for device in range(4)]
+    time.sleep(0.1)
+    for name, chosen in (('single', stack[:1]), ('stack', stack)):
+        gapMs, spiPer, cpu = gaps(chosen, count, spi)
+        result = results['{} {}'.format(name, mode)] = {
+            'latencyMs':latency(chosen, count, spi), 'gapMs':gapMs,
+            'spiPerAllophone':spiPer, 'speakerCpu':cpu }
+        if mode == 'normal':
+            result['allophonesPerSecond'] = throughput(chosen, count * 20)
+    if mode == 'normal':
+        freqToCode, setClock = clockCosts(stack[0], count * 10)
+        results['clock'] = { 'freqToCodeUs':freqToCode, 'setClockUs':setClock }
+    return results
+
+def suite(count, spi):
+    results = {}
+    for mode in ('normal', 'pipelined'):
+        pool = multiprocessing.Pool(1)
+        results.update(pool.apply(modeResults, (mode, count, spi)))
+        pool.close()
+        pool.join()
+    return results
+
+def flatten(results, prefix=''):
+    # {'single normal.latencyMs.p50': value, ...}
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + '.'))
+        elif value is not None:
+            flat[prefix + key] = value
+    return flat
+
+def compare(results, baseline, tolerance):
+    # Lines for every result, and the names of those worse than the baseline
+    lines = []
+    worse = []
+    old = flatten(baseline)
+    for name, value in sorted(flatten(results).items()):
+        if name not in old or not old[name]:
+            lines.append("{:45} {:12.3f}".format(name, value))
+            continue
+        change = (value - old[name]) / float(old[name]) * 100
+        better = change > 0 if name.split('.')[1] in higherIsBetter else change < 0
+        flag = ''
+        if not better and abs(change) > tolerance and name.split('.')[-1] not in unchecked:
+            flag = '  worse'
+            worse.append(name)
+        lines.append("{:45} {:12.3f} {:12.3f} {:+7.1f}%{}".format(name, value, old[name], change, flag))
+    return lines, worse
+
+def commit():
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=root, stderr=devnull).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark the retroSpeak driver on simulated boards')
+    parser.add_argument('-n','--count', action="store", default=100, dest='count', type=int, help='Allophones for latency and gaps - twenty times as many for throughput')
+    parser.add_argument('--spi', action="store", default=0.0001, dest='spi', type=float, help='Time each SPI transaction takes in seconds')
+    parser.add_argument('-o','--output', action="store", default=None, dest='output', metavar='RESULTS', help='Write the results to this JSON file')
+    parser.add_argument('-b','--baseline', action="store", default=os.path.join(data, 'driverBaseline.json'), dest='baseline', help='Baseline results to compare with')
+    parser.add_argument('--save-baseline', action="store_const", const=True, default=False, dest='save', help='Make these results the baseline')
+    parser.add_argument('--tolerance', action="store", default=50.0, dest='tolerance', type=float, metavar='PERCENT', help='How much worse than the baseline is allowed')
+    args = parser.parse_args()
+
+    results = { 'time':time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit':commit(), 'python':platform.python_version(),
+                'machine':platform.machine(), 'count':args.count, 'spi':args.spi,
+                'results':suite(args.count, args.spi) }
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    lines, worse = compare(results['results'], baseline['results'] if baseline else {}, args.tolerance)
+    if baseline:
+        print("{:45} {:>12} {:>12}  against {} {}".format('', 'now', 'baseline', baseline.get('commit'), baseline.get('time')))
+    for line in lines:
+        print(line)
+    for path in ([args.output] if args.output else []) + ([args.baseline] if args.save else []):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if worse:
+        print("{} results more than {}% worse than the baseline".format(len(worse), args.tolerance))
+        sys.exit(1)
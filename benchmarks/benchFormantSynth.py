@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak benchmark - formant synthesizer real time factor
+#
+#   usage: benchFormantSynth.py [-h] [-n SENTENCES] [-j JOBS]
+#
+# Renders sentences from benchmarks/data/sentences.txt with formantSynth.py and
+# reports seconds of audio made per second of rendering - the real time
+# factor - for
+#   reference  - renderReference, a sample at a time in Python
+#   render     - render with NumPy, a frame at a time, once the filters for
+#                every set of formants have been made
+#   pool       - render spread over JOBS processes, as formantSynth.py does
+# It checks render and renderReference give the same samples first - within
+# one step, as the two add up the filter in a different order.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import time
+import array
+import multiprocessing
+
+os.environ['RETROSPEAK_SIMULATE'] = '1'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import formantSynth
+import retroTTS
+
+data = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+def audioSeconds(utterances):
+    return sum(formantSynth._excitation(codes)[1] for codes in utterances) / formantSynth.sampleRate()
+
+def timed(run):
+    start = time.time()
+    run()
+    return time.time() - start
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark the formant synthesizer')
+    parser.add_argument('-n','--sentences', action="store", default=50, dest='sentences', type=int, help='Sentences to render')
+    parser.add_argument('-j','--jobs', action="store", default=None, dest='jobs', type=int, help='Processes for the pool - default is one for each CPU')
+    args = parser.parse_args()
+
+    lines = [line.split() for line in open(os.path.join(data, 'sentences.txt')) if line.strip()][:args.sentences]
+    utterances = [retroTTS.textToCodes(line) for line in lines]
+    seconds = audioSeconds(utterances)
+    print("{} sentences, {:.1f}s of audio at {:.0f}Hz".format(len(utterances), seconds, formantSynth.sampleRate()))
+
+    if formantSynth.numpy is None:
+        print("NumPy isn't installed - only renderReference can be measured")
+        print("reference  {:7.1f}x real time".format(seconds / timed(lambda: [formantSynth.renderReference(codes) for codes in utterances])))
+        sys.exit(0)
+
+    for codes in utterances[:5]:
+        rendered = array.array('h', formantSynth.render(codes))
+        if sys.byteorder != 'little':
+            rendered.byteswap()
+        if max(abs(a - b) for a, b in zip(formantSynth.renderReference(codes), rendered)) > 1:
+            print("render and renderReference differ for {}".format(codes))
+            sys.exit(1)
+    reference = timed(lambda: [formantSynth.renderReference(codes) for codes in utterances[:5]])
+    print("reference  {:7.1f}x real time".format(audioSeconds(utterances[:5]) / reference))
+    cold = timed(lambda: [formantSynth.render(codes) for codes in utterances])
+    warm = timed(lambda: [formantSynth.render(codes) for codes in utterances])
+    print("render     {:7.1f}x real time - {:.1f}x making the filters".format(seconds / warm, seconds / cold))
+    pool = multiprocessing.Pool(args.jobs)
+    pool.map(formantSynth.render, utterances)
+    pooled = timed(lambda: pool.map(formantSynth.render, utterances))
+    pool.close()
+    pool.join()
+    print("pool       {:7.1f}x real time - {} processes".format(seconds / pooled, args.jobs or multiprocessing.cpu_count()))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak benchmark - gap between allophones, normal and pipelined
+#
+#   usage: benchGap.py [-h] [-n COUNT] [--spi SECONDS] [--fast SECONDS]
+#
+# Speaks the same allophones on four simulated boards - driven normally and
+# in pipelined mode, each polling SBY at 10ms, the default normally, and at
+# --fast, 0.5ms unless given, the default pipelined - and
+# reports the gap between one allophone finishing and the next starting:
+#   traced - from the driver seeing SBY high to its ALD pulse (retroSpeak.traceGaps)
+#   chip   - from SBY really going high on the simulated chip to the ALD pulse
+# and the SPI transactions needed for each allophone.
+# Comparing the modes at the same poll interval shows what writing the address
+# early is worth on its own, and comparing the poll intervals what polling
+# faster is worth, and what it costs in SPI transactions.
+# Allophones take their datasheet durations, so each run takes a while.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import time
+
+os.environ['RETROSPEAK_SIMULATE'] = '1'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import retroSpeak
+import simBoard
+import allophones
+
+def mean(gaps):
+    return sum(gaps)/len(gaps)*1000
+
+def summary(gaps):
+    gaps = sorted(gaps)
+    return "mean {:7.3f}  median {:7.3f}  max {:7.3f}".format(
+        mean(gaps), gaps[len(gaps)//2]*1000, gaps[-1]*1000)
+
+def chipGaps(device):
+    # Gaps between consecutive allophones from the simulated board's log
+    events = [e for e in simBoard.events() if e[1] == device]
+    return [events[n+1][0] - events[n][3] for n in range(len(events)-1)]
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Measure the gap between allophones')
+    parser.add_argument('-n','--count', action="store", default=60, dest='count', type=int, help='Allophones to speak in each mode')
+    parser.add_argument('--spi', action="store", default=0.0001, dest='spi', type=float, help='Time each SPI transaction takes in seconds')
+    parser.add_argument('--fast', action="store", default=0.0005, dest='fast', type=float, help='Faster SBY poll interval to compare in seconds')
+    args = parser.parse_args()
+
+    simBoard.setSpiDelay(args.spi)
+    speech = ' '.join(allophones.allophoneNames[n % 64] for n in range(5, 5+args.count))
+
+    print("Gaps in ms over {} allophones, SPI transaction {}us".format(args.count, args.spi*1000000))
+    runs = ((0, False, 0.01), (1, True, 0.01), (2, False, args.fast), (3, True, args.fast))
+    chip = {}
+    for device, pipelined, interval in runs:
+        board = retroSpeak.retroSpeak(base=100+16*device, device=device, pipelined=pipelined, pollInterval=interval)
+        time.sleep(0.1)
+        simBoard.clearEvents()
+        board.enableTrace()
+        board.speakAndWait(speech)
+        chip[pipelined, interval] = mean(chipGaps(device))
+        name = 'pipelined' if pipelined else 'normal'
+        print("{:9} poll {:6.2f}ms  traced {}".format(name, interval*1000, summary(board.traceGaps())))
+        print("{:25}  chip   {}".format('', summary(chipGaps(device))))
+        print("{:25}  SPI transactions per allophone {:.1f}".format('', simBoard.spiTransactions(device) / float(args.count)))
+    for interval in (0.01, args.fast):
+        print("Writing the address early saves {:.3f}ms a gap on the chip polling every {:.2f}ms".format(
+            chip[False, interval] - chip[True, interval], interval*1000))
+    for pipelined in (False, True):
+        print("Polling every {:.2f}ms rather than 10ms saves {:.3f}ms a gap on the chip {}".format(
+            args.fast*1000, chip[pipelined, 0.01] - chip[pipelined, args.fast], 'pipelined' if pipelined else 'normally'))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak benchmark - memory used by the text to speech tables
+#
+#   usage: benchMemory.py [-h]
+#
+# Reports the resident set size of a new interpreter after importing
+#   library  - the standard library modules retroTTS imports, and nothing else
+#   source   - those, and the plain source tables, vocabulary.py and
+#              en_US_rules.py
+#   retroTTS - retroTTS, with its tables - rule tries, context matchers,
+#              phrase trie and vocabulary - loaded from the rule table cache,
+#              which is built first if it is out of date
+# and what the tables cost over the library alone each way.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import subprocess
+
+os.environ['RETROSPEAK_SIMULATE'] = '1'
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+
+report = ("import sys, gc\n"
+          "sys.path.insert(0, {!r})\n"
+          "{}\n"
+          "gc.collect()\n"
+          "print([int(line.split()[1]) for line in open('/proc/self/status') if line.startswith('VmRSS')][0])\n")
+
+# Prints the standard library modules retroTTS imports, one a line
+libraryModules = ("import sys, os\n"
+                  "sys.path.insert(0, {0!r})\n"
+                  "before = set(sys.modules)\n"
+                  "import retroTTS\n"
+                  "root = os.path.realpath({0!r})\n"
+                  "for name, module in sorted(sys.modules.items()):\n"
+                  "    path = getattr(module, '__file__', None)\n"
+                  "    if module is not None and name not in before and '.' not in name and \\\n"
+                  "       not (path and os.path.dirname(os.path.realpath(path)) == root):\n"
+                  "        print(name)\n")
+
+def residentSize(imports):
+    # kB resident after running imports in a new interpreter
+    return int(subprocess.check_output([sys.executable, '-c', report.format(root, imports)]))
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Measure memory used by the text to speech tables')
+    args = parser.parse_args()
+
+    import ruleCache
+    if ruleCache.load() is None:
+        subprocess.check_call([sys.executable, os.path.join(root, 'ruleCache.py')])
+
+    modules = subprocess.check_output([sys.executable, '-c', libraryModules.format(root)]).decode('ascii').split()
+    library = 'import ' + ', '.join(modules)
+    base = residentSize(library)
+    source = residentSize(library + '\nimport vocabulary, en_US_rules')
+    tables = residentSize('import retroTTS')
+    print("RSS after importing")
+    print("library   {:6} kB".format(base))
+    print("source    {:6} kB  tables {:5} kB".format(source, source - base))
+    print("retroTTS  {:6} kB  tables {:5} kB".format(tables, tables - base))
@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak benchmark - many threads speaking at once
+#
+#   usage: benchProducers.py [-h] [-p PRODUCERS] [-u UTTERANCES] [-l LONGEST]
+#                            [--time-scale SCALE] [--policy POLICY] [-o RESULTS]
+#
+# Runs the retroSpeak driver on a simulated board and has more and more
+# producer threads - 1, 2, 4, 8 and 16 unless -p is given - each submit
+# utterances as fast as they can, of 1 to LONGEST allophones and priority 0 to
+# 3 at random. Each number of producers is run twice, with
+#   speak     - speakCodes, which waits for room in the queue
+#   trySpeak  - trySpeakCodes, which never waits, with the overflow policy
+#               --policy - lowest unless given
+# and reports
+#   enqueue   - milliseconds a submission took, percentiles
+#   lock      - times the queue's lock was taken, the percentage of those
+#               another thread had it, and the total milliseconds waited
+#   blocked   - speak submissions that waited for room in the queue
+#   rejected  - trySpeak submissions refused
+#   dropped   - utterances queued, then thrown out to make room
+#   complete  - milliseconds from submission until the last allophone was
+#               spoken, percentiles, for utterances spoken in full
+#
+# By default allophones take no time on the chip, so the queue fills as fast
+# as the producers can fill it and the driver is all there is. --time-scale
+# makes them take that times their datasheet duration.
+#
+# The queue is instrumented by swapping its lock for one that counts, and
+# wrapping the function the speaker thread takes allophones off it with, to
+# see when each utterance is finished. -o writes the results to a JSON file.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import itertools
+import threading
+
+os.environ['RETROSPEAK_SIMULATE'] = '1'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import retroSpeak
+import simBoard
+import allophones
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return None
+    return dict(('p{}'.format(p), values[min(len(values)-1, int(len(values)*p/100.0))] * 1000) for p in (50, 90, 99, 100))
+
+class countingLock():
+    # A lock counting how often it is taken, and how often and how long
+    # threads wait for it
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.waited = 0.0
+
+    def acquire(self, blocking=True):
+        if self._lock.acquire(False):
+            if blocking:
+                self.acquisitions += 1
+            return True
+        if not blocking:
+            return False
+        start = time.time()
+        self._lock.acquire()
+        self.waited += time.time() - start
+        self.contended += 1
+        self.acquisitions += 1
+        return True
+
+    def release(self):
+        self._lock.release()
+
+    __enter__ = acquire
+
+    def __exit__(self, *args):
+        self.release()
+
+class countingCondition():
+    # A condition counting the waits of each thread
+
+    def __init__(self, lock):
+        self._condition = threading.Condition(lock)
+        self.waits = {}
+
+    def wait(self, timeout=None):
+        ident = threading.current_thread().ident
+        self.waits[ident] = self.waits.get(ident, 0) + 1
+        return self._condition.wait(timeout)
+
+    def __getattr__(self, name):
+        return getattr(self._condition, name)
+
+    def __enter__(self):
+        return self._condition.__enter__()
+
+    def __exit__(self, *args):
+        return self._condition.__exit__(*args)
+
+class numbering():
+    # Utterance numbers, remembering the last one each thread was given
+    def __init__(self):
+        self._count = itertools.count(1)
+        self._last = threading.local()
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        self._last.number = next(self._count)
+        return self._last.number
+
+    __next__ = next
+
+    def last(self):
+        return self._last.number
+
+class instrumentedSpeak(retroSpeak.retroSpeak):
+    # A board with its queue instrumented before the speaker thread uses it
+    # timeScale is the simulated board's, to tell when allophones finish
+
+    def __init__(self, timeScale=0.0, *args, **kwargs):
+        self.timeScale = timeScale
+        self._instrumented = threading.Event()
+        retroSpeak.retroSpeak.__init__(self, *args, **kwargs)
+        self._instrumented.wait()
+
+    def speaker(self):
+        q = self._speaking
+        self.lock = q.mutex = countingLock()
+        q.not_empty = threading.Condition(q.mutex)
+        self.notFull = q.not_full = countingCondition(q.mutex)
+        q.all_tasks_done = threading.Condition(q.mutex)
+        self._utterances = numbering()
+        # Allophones taken off the queue by utterance, and when the last was
+        self.taken = {}
+        self.finished = {}
+        get = q._get
+        def taken():
+            item = get()
+            allophone, utterance = item[:2]
+            self.taken[utterance] = self.taken.get(utterance, 0) + 1
+            self.finished[utterance] = time.time() + allophones.codeDuration(allophone, self._clock) * self.timeScale
+            return item
+        q._get = taken
+        self._instrumented.set()
+        retroSpeak.retroSpeak.speaker(self)
+
+    def clearCounts(self):
+        # Start counting again for the next run
+        self.lock.reset()
+        self.notFull.waits.clear()
+        self.taken.clear()
+        self.finished.clear()
+
+def producer(board, mode, count, longest, seed, start, submissions):
+    # Submit count utterances, recording (utterance, length, priority, start,
+    # enqueue time, queued, blocked) for each
+    chance = random.Random(seed)
+    waits = board.notFull.waits
+    ident = threading.current_thread().ident
+    start.wait()
+    for n in range(count):
+        length = chance.randint(1, longest)
+        priority = chance.randint(0, 3)
+        codes = [5 + chance.randint(0, 58) for a in range(length)]
+        before = waits.get(ident, 0)
+        sent = time.time()
+        if mode == 'speak':
+            board.speakCodes(codes)
+            queued = True
+        else:
+            queued = board.trySpeakCodes(codes, priority)
+        enqueued = time.time() - sent
+        submissions.append((board._utterances.last(), length, priority, sent, enqueued, queued, waits.get(ident, 0) > before))
+
+def run(board, producers, mode, count, longest):
+    board.clearCounts()
+    submissions = []
+    start = threading.Event()
+    threads = [threading.Thread(target=producer, args=(board, mode, count, longest, n, start, submissions)) for n in range(producers)]
+    for thread in threads:
+        thread.start()
+    began = time.time()
+    start.set()
+    for thread in threads:
+        thread.join()
+    while board.isSpeaking():
+        time.sleep(0.001)
+    elapsed = time.time() - began
+    complete = [board.finished[u] - sent for u, length, p, sent, e, queued, b in submissions
+                if queued and board.taken.get(u, 0) == length]
+    return { 'submissions':len(submissions),
+             'seconds':elapsed,
+             'enqueueMs':percentiles([e for u, l, p, s, e, q, b in submissions]),
+             'lockAcquisitions':board.lock.acquisitions,
+             'lockContended':board.lock.contended * 100.0 / max(1, board.lock.acquisitions),
+             'lockWaitMs':board.lock.waited * 1000,
+             'blocked':sum(1 for u, l, p, s, e, q, b in submissions if b),
+             'rejected':sum(1 for u, l, p, s, e, q, b in submissions if not q),
+             'dropped':sum(1 for u, l, p, s, e, q, b in submissions if q and board.taken.get(u, 0) < l),
+             'completeMs':percentiles(complete) }
+
+def show(mode, producers, result):
+    enqueue = result['enqueueMs']
+    complete = result['completeMs'] or dict.fromkeys(enqueue, 0.0)
+    print("{:8} {:4} {:8.3f} {:8.3f} {:8.3f} {:9} {:6.1f}% {:8.1f} {:7} {:7} {:7} {:9.1f} {:9.1f} {:9.1f}".format(
+        mode, producers, enqueue['p50'], enqueue['p90'], enqueue['p99'],
+        result['lockAcquisitions'], result['lockContended'], result['lockWaitMs'],
+        result['blocked'], result['rejected'], result['dropped'],
+        complete['p50'], complete['p90'], complete['p99']))
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark retroSpeak with many producer threads')
+    parser.add_argument('-p','--producers', action="store", default='1,2,4,8,16', dest='producers', help='Numbers of producer threads, separated by commas')
+    parser.add_argument('-u','--utterances', action="store", default=100, dest='count', type=int, help='Utterances each producer submits')
+    parser.add_argument('-l','--longest', action="store", default=40, dest='longest', type=int, help='Most allophones in an utterance')
+    parser.add_argument('--time-scale', action="store", default=0.0, dest='scale', type=float, metavar='SCALE', help='Allophones take SCALE times their datasheet duration')
+    parser.add_argument('--policy', action="store", default=retroSpeak.retroSpeak.DROP_LOWEST, dest='policy', choices=(retroSpeak.retroSpeak.REJECT_NEW, retroSpeak.retroSpeak.DROP_OLDEST, retroSpeak.retroSpeak.DROP_LOWEST), help='Overflow policy for trySpeak')
+    parser.add_argument('-o','--output', action="store", default=None, dest='output', metavar='RESULTS', help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    simBoard.setTimeScale(args.scale)
+    board = instrumentedSpeak(args.scale)
+    board.setOverflowPolicy(args.policy)
+    counts = [int(n) for n in args.producers.split(',')]
+
+    print("{:8} {:>4} {:>26} {:>33} {:>23} {:>29}".format('', '', 'enqueue ms', 'lock', '', 'complete ms'))
+    print("{:8} {:>4} {:>8} {:>8} {:>8} {:>9} {:>7} {:>8} {:>7} {:>7} {:>7} {:>9} {:>9} {:>9}".format(
+        'mode', 'thr', 'p50', 'p90', 'p99', 'taken', 'waited', 'ms', 'blocked', 'reject', 'dropped', 'p50', 'p90', 'p99'))
+    results = []
+    for mode in ('speak', 'trySpeak'):
+        for producers in counts:
+            result = run(board, producers, mode, args.count, args.longest)
+            show(mode, producers, result)
+            result.update({'mode':mode, 'producers':producers})
+            results.append(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({ 'time':time.strftime('%Y-%m-%dT%H:%M:%S'), 'python':platform.python_version(),
+                        'utterances':args.count, 'longest':args.longest, 'timeScale':args.scale,
+                        'policy':args.policy, 'results':results }, f, indent=2, sort_keys=True)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak benchmark - number and telemetry readout
+#
+#   usage: benchReadout.py [-h] [-n NUMBER]
+#
+# Times readout.py reading sensor values to allophone codes
+#   memo hit   - the same reading again, from the memo
+#   integer    - whole numbers, not remembered
+#   reading    - decimals and negative numbers with a unit, not remembered
+# against translating a reading written out in words with retroTTS.textToCodes.
+# The text is the same sentence each time, as words retroTTS has seen before,
+# so it is the best case for textToCodes.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import random
+import timeit
+
+os.environ['RETROSPEAK_SIMULATE'] = '1'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import readout
+import retroTTS
+
+def perReading(run, values):
+    start = timeit.default_timer()
+    run(values)
+    return (timeit.default_timer() - start) / len(values) * 1000000
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark the number readout')
+    parser.add_argument('-n','--number', action="store", default=20000, dest='number', type=int, help='Readings to time')
+    args = parser.parse_args()
+
+    random.seed(42)
+    integers = [random.randint(0, readout.largest) for n in range(args.number)]
+    readings = [(round(random.uniform(-40, 60), 1), random.choice(['C', 'V', '%', 'km/h'])) for n in range(args.number)]
+    fresh = readout.numberReader(memo=0)
+
+    def hits(values):
+        for n in range(len(values)):
+            readout.readingCodes(21.5, 'C')
+    def integer(values):
+        for value in values:
+            fresh.reading(value)
+    def reading(values):
+        for value, unit in values:
+            fresh.reading(value, unit)
+    def text(values):
+        for n in range(len(values)):
+            retroTTS.textToCodes('minus twelve point five degrees celsius'.split())
+
+    print("us per reading")
+    print("memo hit   {:7.2f}".format(perReading(hits, integers)))
+    print("integer    {:7.2f}".format(perReading(integer, integers)))
+    print("reading    {:7.2f}".format(perReading(reading, readings)))
+    print("text       {:7.2f}".format(perReading(text, readings[:2000])))
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak benchmark - shared memory speech ring against a pipe
+#
+#   usage: benchRing.py [-h] [-n COUNT] [-l LENGTH]
+#
+# Runs the retroSpeak driver on a simulated board with allophones that take no
+# time to speak, and feeds it from a separate producer process, first through
+# a speechRing and then through a multiprocessing Pipe.
+#
+# Latency is from the producer sending a one allophone utterance to the ALD
+# pulse that starts it on the chip, one utterance at a time.
+# Throughput is how many allophones a second get from the producer to the chip
+# when the producer sends utterances as fast as it can.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import multiprocessing
+
+os.environ['RETROSPEAK_SIMULATE'] = '1'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import retroSpeak
+import simBoard
+import allophones
+from speechRing import speechRing
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values)-1, int(len(values)*p/100.0))]
+
+def ringProducer(path, count, length, sent, done):
+    ring = speechRing(path)
+    # Latency - one utterance at a time
+    for n in range(count):
+        sent.value = time.time()
+        ring.append([allophones.allophoneCodes['PA1']])
+        done.wait()
+        done.clear()
+    # Throughput - as fast as the ring takes them
+    codes = bytearray([allophones.allophoneCodes['PA1']] * length)
+    for n in range(count):
+        while not ring.append(codes):
+            time.sleep(0.0005)
+
+def pipeProducer(conn, count, length, sent, done):
+    for n in range(count):
+        sent.value = time.time()
+        conn.send([allophones.allophoneCodes['PA1']])
+        done.wait()
+        done.clear()
+    codes = [allophones.allophoneCodes['PA1']] * length
+    for n in range(count):
+        conn.send(codes)
+
+def pipeConsumer(conn, speech):
+    try:
+        while True:
+            speech.speakCodes(conn.recv())
+    except EOFError:
+        pass
+
+def run(name, speech, start, count, length, sent, done):
+    # Time the producer through both phases and report
+    latencies = []
+    spoken = [0]
+    def onAllophone(a):
+        spoken[0] += 1
+        if spoken[0] <= count:
+            latencies.append(time.time() - sent.value)
+            done.set()
+    speech.setCallbackAllophone(onAllophone)
+    start()
+    while spoken[0] < count:
+        time.sleep(0.001)
+    began = time.time()
+    total = count + count * length
+    while spoken[0] < total:
+        time.sleep(0.001)
+    elapsed = time.time() - began
+    speech.setCallbackAllophone(None)
+    print("{:5}  latency ms  median {:.3f}  p95 {:.3f}  max {:.3f}   throughput {:.0f} allophones/s".format(
+        name, percentile(latencies, 50)*1000, percentile(latencies, 95)*1000, max(latencies)*1000,
+        count * length / elapsed))
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark the speech ring against a pipe')
+    parser.add_argument('-n','--count', action="store", default=500, dest='count', type=int, help='Utterances to send in each test')
+    parser.add_argument('-l','--length', action="store", default=20, dest='length', type=int, help='Allophones in each throughput utterance')
+    args = parser.parse_args()
+
+    simBoard.setTimeScale(0)
+    sent = multiprocessing.Value('d', 0.0, lock=False)
+    done = multiprocessing.Event()
+    speech = retroSpeak.retroSpeak()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.ring')
+    ring = speechRing(path)
+    producer = multiprocessing.Process(target=ringProducer, args=(path, args.count, args.length, sent, done))
+    def startRing():
+        ring.attach(speech)
+        producer.start()
+    run('ring', speech, startRing, args.count, args.length, sent, done)
+    producer.join()
+    ring.close()
+    os.unlink(path)
+    os.unlink(path + '.bell')
+
+    receiver, sender = multiprocessing.Pipe(False)
+    producer = multiprocessing.Process(target=pipeProducer, args=(sender, args.count, args.length, sent, done))
+    def startPipe():
+        consumer = threading.Thread(target=pipeConsumer, args=(receiver, speech))
+        consumer.daemon = True
+        consumer.start()
+        producer.start()
+    run('pipe', speech, startPipe, args.count, args.length, sent, done)
+    producer.join()
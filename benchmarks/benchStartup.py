@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak benchmark - start up time with and without the rule table cache
+#
+#   usage: benchStartup.py [-h] [-r REPEAT]
+#
+# Times whole runs of retroTTS.py --silent on a short sentence on the
+# simulated board, with the rule table cache (ruleCache.py) and with it turned
+# off, and the time to get the tables alone - loading the cache against
+# compiling the rules. The cache is built first if it is out of date.
+# speakTime.py --silent is timed too - it only needs the vocabulary, which it
+# imports without the cache.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import time
+import subprocess
+
+os.environ['RETROSPEAK_SIMULATE'] = '1'
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+
+def best(run, repeat):
+    times = []
+    for n in range(repeat):
+        start = time.time()
+        run()
+        times.append(time.time() - start)
+    return min(times)
+
+def command(script, cache):
+    # Run a script in a new interpreter, with or without the cache
+    environment = dict(os.environ)
+    if not cache:
+        environment['RETROSPEAK_RULE_CACHE'] = ''
+    def run():
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call([sys.executable, os.path.join(root, script[0])] + script[1:],
+                                  env=environment, stdout=devnull)
+    return run
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark start up time')
+    parser.add_argument('-r','--repeat', action="store", default=10, dest='repeat', type=int, help='Best of this many runs')
+    args = parser.parse_args()
+
+    import ruleCache
+    if ruleCache.load() is None:
+        subprocess.check_call([sys.executable, os.path.join(root, 'ruleCache.py')])
+
+    print("Best of {} runs, ms".format(args.repeat))
+    script = ['retroTTS.py', '--silent', 'the', 'quick', 'brown', 'fox']
+    cached = best(command(script, True), args.repeat)
+    compiled = best(command(script, False), args.repeat)
+    print("{:12} cache {:7.1f}   no cache {:7.1f}   x{:.2f}".format(script[0], cached*1000, compiled*1000, compiled / cached))
+    print("{:12}       {:7.1f}".format('speakTime.py', best(command(['speakTime.py', '--silent'], False), args.repeat)*1000))
+
+    os.environ['RETROSPEAK_RULE_CACHE'] = ''
+    import retroTTS
+    from en_US_rules import Rules
+    cached = best(lambda: ruleCache.load(), args.repeat)
+    compiled = best(lambda: (retroTTS.compileRules(Rules), retroTTS.rulesFingerprint(Rules)), args.repeat)
+    print("{:12} cache {:7.1f}   no cache {:7.1f}   x{:.2f}".format('tables', cached*1000, compiled*1000, compiled / cached))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak benchmark - text to speech rule engine speed
+#
+#   usage: benchTTS.py [-h] [-r REPEAT] [wordlist]
+#
+# Translates every word in a wordlist (one word per line, default the bundled
+# benchmarks/data/words.txt) with the rule tries used by retroTTS.translateWord,
+# and with the reference linear scan of the rules. Reports words per second
+# for each, and checks they give the same phonemes for every word.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import time
+
+os.environ['RETROSPEAK_SIMULATE'] = '1'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import retroTTS
+
+def wordsPerSecond(translate, words, repeat):
+    best = None
+    for n in range(repeat):
+        start = time.time()
+        for word in words:
+            translate(word)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return len(words) / best
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark the text to speech rule engine')
+    parser.add_argument('-r','--repeat', action="store", default=3, dest='repeat', type=int, help='Best of this many runs')
+    parser.add_argument('wordlist', nargs='?', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'words.txt'), help='File with one word per line')
+    args = parser.parse_args()
+
+    words = [line.strip().upper() for line in open(args.wordlist) if line.strip()]
+    print("{} words from {}".format(len(words), args.wordlist))
+
+    different = [word for word in words if retroTTS.translateWord(word) != retroTTS.translateWordLinear(word)]
+    if different:
+        print("Different phonemes for {} words, first: {}".format(len(different), different[0]))
+        sys.exit(1)
+
+    linear = wordsPerSecond(retroTTS.translateWordLinear, words, args.repeat)
+    trie = wordsPerSecond(retroTTS.translateWord, words, args.repeat)
+    print("linear  {:8.0f} words/s".format(linear))
+    print("trie    {:8.0f} words/s  x{:.2f}".format(trie, trie / linear))
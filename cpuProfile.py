@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak CPU profiler
+# Finds where the time goes in a running program - translating text, the
+# speaker threads, or callbacks they call - by sampling the stacks of the
+# threads doing retroSpeak work, and writes them as folded stacks for a flame
+# graph (flamegraph.pl, speedscope, ...).
+#
+# It is off unless turned on, by
+#   RETROSPEAK_PROFILE=PATH   profile from the start, and write to PATH when
+#                             the program exits and on SIGUSR2
+#   signals                   with installSignals() - as retroSpeakDaemon
+#                             does - SIGUSR1 starts and stops profiling and
+#                             SIGUSR2 writes what has been sampled so far
+# or from code:
+#   cpuProfile.start()
+#   ... speak ...
+#   cpuProfile.write('speech.folded')
+#   cpuProfile.stop()
+# and then
+#   flamegraph.pl speech.folded > speech.svg
+#
+# Only threads tagged with a subsystem are sampled. retroTTS tags translation
+# with the words being translated, and retroSpeak tags each speaker thread
+# with the board and utterance it is speaking, so each stack starts
+#   translate;when the tide;retroTTS:textToCodes;retroTTS:translateWordCodes;...
+#   speaker;board 0 utterance 12;retroSpeak:speaker;...
+# Callbacks appear under the speaker frame that called them. Translation in
+# other processes - translateMany and translateBatch - isn't seen, and nor is
+# time in one long call to C code, which holds the interpreter lock so the
+# sampler can't run.
+#
+# Samples where a thread was sleeping or waiting - the line it was on calls
+# sleep, wait or acquire - are left out, so the flame graph is of CPU time.
+# RETROSPEAK_PROFILE_WAITS=1, or start(waits=True), keeps them with a
+# [waiting] frame at the top.
+#
+# When profiling is off the hooks cost a test of cpuProfile.enabled for each
+# translation and each allophone spoken.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import atexit
+import functools
+import linecache
+import threading
+
+# Threads doing retroSpeak work - thread id to (subsystem, label)
+_tags = {}
+# Sample counts by folded stack
+_counts = {}
+_lock = threading.Lock()
+# Waiting lines seen - (file name, line number) to True or False
+_waitingLines = {}
+
+enabled = False
+_sampler = None
+_waits = False
+
+defaultPath = os.environ.get('RETROSPEAK_PROFILE')
+
+def tag(subsystem, label=None):
+    # Mark this thread's samples with a subsystem and label, such as the
+    # utterance - the previous tag is returned, for restore
+    ident = threading.current_thread().ident
+    previous = _tags.get(ident)
+    _tags[ident] = (subsystem, label)
+    return previous
+
+def restore(previous):
+    # Put back a tag returned by tag - None stops sampling this thread
+    ident = threading.current_thread().ident
+    if previous is None:
+        _tags.pop(ident, None)
+    else:
+        _tags[ident] = previous
+
+def label(words, count=3):
+    # A short label from a list of words, for tag
+    return ' '.join(words[:count]).replace(';', ',')
+
+def profiled(subsystem, labeller=None):
+    # Decorator tagging a function's thread with subsystem while it runs, and
+    # a label made by labeller from its first argument
+    def decorate(function):
+        @functools.wraps(function)
+        def tagged(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            previous = tag(subsystem, labeller(args[0]) if labeller is not None and args else None)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                restore(previous)
+        return tagged
+    return decorate
+
+def _waiting(code, line):
+    key = (code.co_filename, line)
+    waiting = _waitingLines.get(key)
+    if waiting is None:
+        text = linecache.getline(code.co_filename, line)
+        waiting = _waitingLines[key] = any(call in text for call in ('sleep(', 'wait(', 'acquire('))
+    return waiting
+
+def _stack(frame):
+    # Frames from the thread's start to frame, as module:function
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        if module != 'cpuProfile':
+            names.append('{}:{}'.format(module, code.co_name))
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+def _sample():
+    frames = sys._current_frames()
+    me = threading.current_thread().ident
+    for ident, (subsystem, name) in list(_tags.items()):
+        frame = frames.get(ident)
+        if frame is None or ident == me:
+            if frame is None:
+                # Thread has finished
+                _tags.pop(ident, None)
+            continue
+        waiting = _waiting(frame.f_code, frame.f_lineno)
+        if waiting and not _waits:
+            continue
+        stack = [subsystem] + ([str(name)] if name is not None else []) + _stack(frame)
+        if waiting:
+            stack.append('[waiting]')
+        key = ';'.join(stack)
+        with _lock:
+            _counts[key] = _counts.get(key, 0) + 1
+
+def _sampleLoop(interval, stopped):
+    while not stopped.wait(interval):
+        _sample()
+
+def start(interval=0.005, waits=None):
+    # Start sampling every interval seconds - nothing happens if it already is
+    global enabled, _sampler, _waits
+    if _sampler is not None:
+        return
+    if waits is not None:
+        _waits = waits
+    stopped = threading.Event()
+    thread = threading.Thread(target=_sampleLoop, args=(interval, stopped))
+    thread.daemon = True
+    _sampler = (thread, stopped)
+    enabled = True
+    thread.start()
+
+def stop():
+    # Stop sampling, keeping the samples
+    global enabled, _sampler
+    enabled = False
+    if _sampler is not None:
+        thread, stopped = _sampler
+        _sampler = None
+        stopped.set()
+        if thread is not threading.current_thread():
+            thread.join()
+    _tags.clear()
+
+def reset():
+    # Throw away the samples
+    with _lock:
+        _counts.clear()
+
+def samples():
+    # A copy of the sample counts by folded stack
+    with _lock:
+        return dict(_counts)
+
+def write(path=None):
+    # Write the samples as folded stacks - a stack and a count on each line -
+    # to path, or RETROSPEAK_PROFILE
+    # Written to a new file which then replaces path, so a flame graph is never
+    # made from half a file. Returns the number of samples
+    path = path or defaultPath
+    counts = samples()
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as f:
+        for stack, count in sorted(counts.items()):
+            f.write('{} {}\n'.format(stack, count))
+    os.rename(temporary, path)
+    return sum(counts.values())
+
+def installSignals(path=None):
+    # SIGUSR1 starts and stops profiling, SIGUSR2 writes to path - from the
+    # main thread only, as Python can only set signal handlers there
+    import signal
+    path = path or defaultPath or '/tmp/retroSpeak.folded'
+    def toggle(signum, frame):
+        if enabled:
+            stop()
+        else:
+            start()
+    signal.signal(signal.SIGUSR1, toggle)
+    signal.signal(signal.SIGUSR2, lambda signum, frame: write(path))
+
+def _exit():
+    # Stop the sampler before the interpreter shuts down under it
+    stop()
+    write()
+
+if defaultPath:
+    start(waits=os.environ.get('RETROSPEAK_PROFILE_WAITS') == '1')
+    atexit.register(_exit)
+    try:
+        installSignals()
+    except ValueError:
+        # Imported from a thread other than the main thread
+        pass
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Summarise a retroSpeak CPU profile')
+    parser.add_argument('-n','--top', action="store", default=20, dest='top', type=int, help='Number of functions to list')
+    parser.add_argument('profile', help='Folded stacks written by cpuProfile')
+    args = parser.parse_args()
+
+    subsystems = {}
+    functions = {}
+    total = 0
+    for line in open(args.profile):
+        stack, count = line.rsplit(' ', 1)
+        count = int(count)
+        frames = stack.split(';')
+        total += count
+        subsystems[frames[0]] = subsystems.get(frames[0], 0) + count
+        for function in set(f for f in frames if ':' in f):
+            functions[function] = functions.get(function, 0) + count
+    print("{} samples".format(total))
+    for subsystem, count in sorted(subsystems.items(), key=lambda s: -s[1]):
+        print("{:40} {:6} {:5.1f}%".format(subsystem, count, count * 100.0 / total))
+    print("")
+    print("Functions, with the samples in them and what they call:")
+    for function, count in sorted(functions.items(), key=lambda f: -f[1])[:args.top]:
+        print("{:40} {:6} {:5.1f}%".format(function, count, count * 100.0 / total))
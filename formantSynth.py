@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak approximate formant synthesizer
+# Renders allophones to 16 bit PCM with a small formant synthesizer that
+# shares the SP0256's timing and filter structure, so speech can be heard and
+# timed without a board. It isn't an SP0256-AL2 emulator - it doesn't have
+# the chip's allophone data, so it doesn't sound like the chip.
+#
+#   usage: formantSynth.py [-h] [-c MHZ] [-j JOBS] [--text] [-o DIRECTORY] [INPUT]
+#
+# Each line of INPUT (default stdin) is an utterance - allophones separated by
+# spaces, or with --text, English translated with retroTTS. Utterance n is
+# written to DIRECTORY/NNNN.wav, spread over a pool of processes.
+#
+# What it shares with the SP0256: one sample every 312 clock cycles - 10kHz
+# at the standard 3.12MHz - each an excitation, a pulse at the pitch period
+# when voiced or pseudo random noise when not, through six two pole filter
+# sections in cascade, with the filter and amplitudes changing every frame,
+# and the datasheet duration of each allophone.
+#
+# What it doesn't: the sounds. The AL2's allophone ROM - the filter
+# coefficients and amplitudes the chip uses - isn't reproduced. The formant
+# tables below are invented in its place, from textbook formant values for
+# English vowels and rough noise shapes for fricatives and bursts, and the
+# output has never been compared with a real chip. Each allophone is a few
+# segments, each with the amplitude of voicing and of noise and the first
+# three formants - steady for vowels, gliding for diphthongs, closure then
+# burst for stops. The formants set the first three filter sections, and the
+# other three are fixed, as for most formant synthesizers. Use it to hear
+# what retroTTS makes of some text, or for timing, not as reference audio.
+#
+# The samples don't depend on the clock - the filter works in samples - so a
+# faster clock makes the same samples at a higher rate. Speech is higher and
+# quicker, as from the chip. The WAV sample rate is clock / 312.
+#
+# Rendering uses NumPy if it is there. The filter is run a frame at a time,
+# in direct form: the output for a frame is its excitation convolved with the
+# impulse response of that frame's filter, plus the response to the last 12
+# outputs - two small matrix products, cached for each set of formants.
+# Without NumPy, renderReference runs the same filter a sample at a time.
+# benchmarks/benchFormantSynth.py measures both against real time.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import math
+import wave
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import allophones
+
+# Clock cycles for each sample
+cyclesPerSample = 312
+# Samples in each frame - allophones are whole frames
+frameLength = 50
+# Pitch period in samples - 100Hz at 3.12MHz
+pitchPeriod = 100
+# Filter poles
+order = 12
+
+# Voicing pulse height - the same power as noise of amplitude 1
+_pulse = math.sqrt(pitchPeriod)
+# Output for an excitation of power 1
+_scale = 3000.0
+# Samples of impulse response to measure a filter's gain over
+_responseLength = 400
+
+# Formants F1-F3 in Hz at 3.12MHz, and their bandwidths
+# Invented approximations, not the AL2's ROM - see the top of this file
+_bandwidths = (60.0, 90.0, 150.0)
+# The fixed sections - F4 to F6 and their bandwidths
+_fixed = ((3300.0, 250.0), (3750.0, 300.0), (4200.0, 350.0))
+
+_formants = { 'IY':(270, 2290, 3010), 'IH':(390, 1990, 2550), 'EH':(530, 1840, 2480),
+              'AE':(660, 1720, 2410), 'AA':(730, 1090, 2440), 'AO':(570, 840, 2410),
+              'UH':(440, 1020, 2240), 'UW':(300, 870, 2240), 'AX':(500, 1500, 2500),
+              'ER':(490, 1350, 1690), 'LL':(360, 1300, 2700), 'RR':(420, 1300, 1600),
+              'WW':(300, 610, 2200), 'YY':(260, 2070, 3020), 'MM':(480, 1270, 2130),
+              'NN':(480, 1340, 2470), 'NG':(480, 2000, 2800),
+              # Noise shaping for fricatives and bursts
+              'SS':(2500, 3900, 4600), 'SH':(1800, 2600, 3500), 'FF':(1000, 2000, 4000),
+              'TH':(1400, 2600, 4000), 'LB':(700, 1200, 2500), 'AB':(1800, 2800, 3800),
+              'VB':(1500, 2200, 3000) }
+
+def _segment(share, voice, noise, start, end=None):
+    # Part of an allophone - share of its duration, amplitudes of voicing and
+    # noise, and the formants at the start and end, by name from _formants
+    return (share, voice, noise, start, end or start)
+
+def _vowel(start, end=None):
+    return [_segment(1.0, 1.0, 0.0, start, end)]
+
+def _stop(burst, voiced, after='AX'):
+    # Closure, burst, then voicing or aspiration into the next sound
+    return [_segment(0.5, 0.1 if voiced else 0.0, 0.0, 'AX'),
+            _segment(0.2, 0.0, 0.8, burst),
+            _segment(0.3, 0.6 if voiced else 0.0, 0.0 if voiced else 0.3, after)]
+
+def _fricative(shape, noise, voiced=False):
+    return [_segment(1.0, 0.5 if voiced else 0.0, noise, shape)]
+
+_silence = [_segment(1.0, 0.0, 0.0, 'AX')]
+
+# The segments of each allophone
+segments = { 'PA1':_silence, 'PA2':_silence, 'PA3':_silence, 'PA4':_silence, 'PA5':_silence,
+             'IY':_vowel('IY'), 'IH':_vowel('IH'), 'EH':_vowel('EH'), 'AE':_vowel('AE'),
+             'AA':_vowel('AA'), 'AO':_vowel('AO'), 'UH':_vowel('UH'), 'AX':_vowel('AX'),
+             'UW1':_vowel('UW'), 'UW2':_vowel('YY', 'UW'), 'ER1':_vowel('ER'), 'ER2':_vowel('ER'),
+             'OY':_vowel('AO', 'IY'), 'AY':_vowel('AA', 'IY'), 'EY':_vowel('EH', 'IY'),
+             'AW':_vowel('AA', 'UW'), 'OW':_vowel('AO', 'UW'), 'YR':_vowel('IY', 'ER'),
+             'AR':_vowel('AA', 'ER'), 'OR':_vowel('AO', 'ER'), 'XR':_vowel('EH', 'ER'),
+             'EL':_vowel('AX', 'LL'),
+             'WW':_vowel('WW', 'AX'), 'YY1':_vowel('YY', 'AX'), 'YY2':_vowel('YY', 'IY'),
+             'RR1':_vowel('RR', 'AX'), 'RR2':_vowel('RR'), 'LL':_vowel('LL'),
+             'WH':[_segment(0.5, 0.0, 0.4, 'WW'), _segment(0.5, 1.0, 0.0, 'WW', 'AX')],
+             'MM':[_segment(1.0, 0.5, 0.0, 'MM')], 'NN1':[_segment(1.0, 0.5, 0.0, 'NN')],
+             'NN2':[_segment(1.0, 0.5, 0.0, 'NN')], 'NG':[_segment(1.0, 0.5, 0.0, 'NG')],
+             'SS':_fricative('SS', 0.6), 'SH':_fricative('SH', 0.6), 'FF':_fricative('FF', 0.3),
+             'TH':_fricative('TH', 0.3), 'ZZ':_fricative('SS', 0.4, True), 'ZH':_fricative('SH', 0.4, True),
+             'VV':_fricative('FF', 0.2, True), 'DH1':_fricative('TH', 0.2, True), 'DH2':_fricative('TH', 0.2, True),
+             'HH1':[_segment(1.0, 0.0, 0.4, 'AX')], 'HH2':[_segment(1.0, 0.0, 0.4, 'IY')],
+             'CH':[_segment(0.4, 0.0, 0.0, 'AX'), _segment(0.6, 0.0, 0.6, 'SH')],
+             'JH':[_segment(0.4, 0.1, 0.0, 'AX'), _segment(0.6, 0.5, 0.4, 'SH')],
+             'PP':_stop('LB', False), 'BB1':_stop('LB', True), 'BB2':_stop('LB', True),
+             'TT1':_stop('AB', False), 'TT2':_stop('AB', False), 'DD1':_stop('AB', True), 'DD2':_stop('AB', True),
+             'KK1':_stop('VB', False, 'IY'), 'KK2':_stop('VB', False), 'KK3':_stop('VB', False, 'UW'),
+             'GG1':_stop('VB', True, 'UW'), 'GG2':_stop('VB', True, 'IY'), 'GG3':_stop('VB', True) }
+
+def sampleRate(clock=allophones.defaultClock):
+    # Samples a second at a clock speed in MHz
+    return clock * 1000000.0 / cyclesPerSample
+
+def frames(allophone):
+    # The frames of an allophone - a list of (voicing, noise, formants)
+    count = allophones.allophoneDurations[allophone] * 10 // frameLength
+    result = []
+    done = 0.0
+    for share, voice, noise, start, end in segments[allophone]:
+        first = int(round(done * count))
+        done += share
+        last = int(round(done * count))
+        start, end = _formants[start], _formants[end]
+        for n in range(last - first):
+            t = n / float(max(last - first - 1, 1))
+            result.append((voice, noise, tuple(int(round(a + (b - a) * t)) for a, b in zip(start, end))))
+    return result
+
+def coefficients(formants):
+    # Direct form filter for a set of formants at 10kHz - (gain, a) where
+    # y[n] = gain*x[n] - a[0]*y[n-1] - ... - a[11]*y[n-12]
+    # The gain makes the energy of the impulse response 1, so the loudness
+    # is set by the excitation alone
+    polynomial = [1.0]
+    rate = sampleRate()
+    for f, bw in list(zip(formants, _bandwidths)) + list(_fixed):
+        r = math.exp(-math.pi * bw / rate)
+        b = 2 * r * math.cos(2 * math.pi * f / rate)
+        c = -r * r
+        section = [1.0, -b, -c]
+        polynomial = [sum(polynomial[i] * section[k - i] for i in range(len(polynomial)) if 0 <= k - i < 3)
+                      for k in range(len(polynomial) + 2)]
+    a = polynomial[1:]
+    past = [0.0] * order
+    energy = 0.0
+    x = 1.0
+    for n in range(_responseLength):
+        y = x - sum(a[k] * past[k] for k in range(order))
+        energy += y * y
+        past.insert(0, y)
+        past.pop()
+        x = 0.0
+    return 1.0 / math.sqrt(energy), a
+
+_noise = None
+
+def noise():
+    # The noise source - a 15 bit maximal length LFSR, as +1 and -1
+    global _noise
+    if _noise is None:
+        bits = array.array('b')
+        state = 1
+        for n in range((1 << 15) - 1):
+            bit = (state ^ (state >> 1)) & 1
+            state = (state >> 1) | (bit << 14)
+            bits.append(1 if bit else -1)
+        _noise = bits
+    return _noise
+
+def _excitation(codes):
+    # Per frame (voicing, noise, formants) for an utterance, and the total samples
+    names = allophones.allophoneNames
+    utterance = []
+    for code in codes:
+        utterance.extend(frames(names[code & 0x3F]))
+    return utterance, len(utterance) * frameLength
+
+def renderReference(codes):
+    # Samples for allophone codes as an array('h'), a sample at a time
+    utterance, length = _excitation(codes)
+    source = noise()
+    samples = array.array('h')
+    past = [0.0] * order
+    filters = {}
+    n = 0
+    for voice, noiseLevel, formants in utterance:
+        if formants not in filters:
+            filters[formants] = coefficients(formants)
+        gain, a = filters[formants]
+        for i in range(frameLength):
+            x = noiseLevel * source[n % len(source)]
+            if n % pitchPeriod == 0:
+                x += voice * _pulse
+            y = gain * x - sum(a[k] * past[k] for k in range(order))
+            past.insert(0, y)
+            past.pop()
+            samples.append(max(-32768, min(32767, int(math.floor(y * _scale + 0.5)))))
+            n += 1
+    return samples
+
+class _frameFilter():
+    # For one set of formants, over one frame
+    #   response - the first frameLength samples of the impulse response
+    #   history  - frameLength x order, the output from the last order outputs
+    def __init__(self, formants):
+        gain, a = coefficients(formants)
+        a = numpy.array(a)
+        # Column 0 is the impulse, then one column for each past output
+        y = numpy.zeros((frameLength + order, order + 1))
+        for k in range(order):
+            y[order - 1 - k, k + 1] = 1.0
+        y[order, 0] = gain
+        for n in range(order, frameLength + order):
+            y[n] -= a.dot(y[n-1:n-order-1 if n > order else None:-1])
+        self.response = y[order:, 0].copy()
+        self.history = y[order:, 1:].copy()
+
+_filters = {}
+
+def render(codes):
+    # Samples for allophone codes as 16 bit little-endian PCM bytes
+    if numpy is None:
+        samples = renderReference(codes)
+        if sys.byteorder != 'little':
+            samples.byteswap()
+        return samples.tostring()
+    utterance, length = _excitation(codes)
+    if not utterance:
+        return b''
+    levels = numpy.array([(voice, noiseLevel) for voice, noiseLevel, formants in utterance]).repeat(frameLength, axis=0)
+    source = numpy.frombuffer(noise(), dtype=numpy.int8).astype(numpy.float64)
+    x = levels[:, 1] * numpy.resize(source, length)
+    x[::pitchPeriod] += levels[::pitchPeriod, 0] * _pulse
+    y = numpy.empty(length)
+    past = numpy.zeros(order)
+    for i, (voice, noiseLevel, formants) in enumerate(utterance):
+        f = _filters.get(formants)
+        if f is None:
+            f = _filters[formants] = _frameFilter(formants)
+        start = i * frameLength
+        frame = numpy.convolve(x[start:start+frameLength], f.response)[:frameLength] + f.history.dot(past)
+        y[start:start+frameLength] = frame
+        past = frame[:-order-1:-1]
+    pcm = numpy.clip(numpy.floor(y * _scale + 0.5), -32768, 32767).astype('<i2')
+    return pcm.tobytes() if hasattr(pcm, 'tobytes') else pcm.tostring()
+
+def writeWav(output, pcm, clock=allophones.defaultClock):
+    # Write PCM from render to a WAV file - a path or a file object
+    w = wave.open(output, 'wb')
+    w.setnchannels(1)
+    w.setsampwidth(2)
+    w.setframerate(int(round(sampleRate(clock))))
+    w.writeframes(pcm)
+    w.close()
+
+def renderWav(output, codes, clock=allophones.defaultClock):
+    # Render allophone codes to a WAV file, returning the seconds of audio
+    pcm = render(codes)
+    writeWav(output, pcm, clock)
+    return len(pcm) // 2 / sampleRate(clock)
+
+def _renderJob(job):
+    path, codes, clock = job
+    return renderWav(path, codes, clock)
+
+
+if __name__ == '__main__':
+    import time
+    import argparse
+    import multiprocessing
+
+    def clockSpeed(freq):
+        freq = float(freq)
+        if freq < 1.0 or freq > 5.1:
+            raise argparse.ArgumentTypeError("%r not in range [1.0, 5.1]"%(freq,))
+        return freq
+
+    parser = argparse.ArgumentParser(description='Render allophones to WAV files with an approximate formant synthesizer',
+        epilog="The formant tables are invented, not the SP0256-AL2's allophone ROM, so the output doesn't sound like the chip and isn't reference audio.")
+    parser.add_argument('-c','--clock', action="store", default='3.12', dest='mhz', type=clockSpeed, help='Clock speed in MHz - range 1.0 to 5.1')
+    parser.add_argument('-j','--jobs', action="store", default=None, dest='jobs', type=int, help='Processes - default is one for each CPU')
+    parser.add_argument('--text', action="store_const", const=True, default=False, dest='text', help='Input is English text, not allophones')
+    parser.add_argument('-o','--output', action="store", default='.', dest='output', metavar='DIRECTORY', help='Directory for the WAV files')
+    parser.add_argument('input', nargs='?', default='-', help='File with an utterance on each line - default is stdin')
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == '-' else open(args.input)
+    lines = [line for line in source if line.strip()]
+    if args.text:
+        import retroTTS
+        utterances = [retroTTS.textToCodes(line.split()) for line in lines]
+    else:
+        utterances = [allophones.encode(line) for line in lines]
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    jobs = [(os.path.join(args.output, '{:04}.wav'.format(n)), codes, args.mhz) for n, codes in enumerate(utterances)]
+
+    start = time.time()
+    if args.jobs == 1:
+        seconds = [_renderJob(job) for job in jobs]
+    else:
+        pool = multiprocessing.Pool(args.jobs)
+        seconds = pool.map(_renderJob, jobs, chunksize=max(1, len(jobs) // (4 * (args.jobs or multiprocessing.cpu_count()))))
+        pool.close()
+        pool.join()
+    elapsed = time.time() - start
+    sys.stderr.write("{} utterances, {:.1f}s of audio in {:.2f}s - {:.0f}x real time\n".format(
+        len(jobs), sum(seconds), elapsed, sum(seconds) / max(elapsed, 1e-9)))
@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak pronunciation lexicon
+# A compiled, memory mapped word list for large pronouncing dictionaries.
+#
+#   usage: lexicon.py compile [--cmudict] INPUT OUTPUT
+#          lexicon.py lookup LEXICON WORD [WORD ...]
+#
+# The input is a text file with a word and its SP0256 allophones on each line:
+#   HELLO  HH1 EH LL AX OW
+# or with --cmudict, a file in the CMU Pronouncing Dictionary format:
+#   HELLO  HH AH0 L OW1
+# Lines starting with ;;; are comments. Only the first pronunciation of a
+# word is kept.
+#
+# The compiled file is looked up through a minimal perfect hash, so finding a
+# word is one hash of the word and a couple of reads however big the lexicon
+# is. The file is memory mapped rather than read in, so only the pages
+# actually used are loaded, and they are shared between processes.
+#
+# File layout - all numbers little-endian:
+#   0   4 bytes  magic 'RSLX'
+#   4   uint32   version
+#   8   uint32   number of words, n
+#   12  uint32   offset of the displacement table - n int32
+#   16  uint32   offset of the entry table - n uint32 offsets of entries
+#   20  uint32   offset of the entries
+# Each entry is a byte with the length of the word, the upper case word, a
+# byte with the number of allophones, then the allophone codes packed 6 bits
+# each, least significant bits first.
+#
+# The hash is CRC32 with its bits mixed - see _hash. A word's bucket is
+# hash(word) % n. A negative displacement d for the bucket means the word is
+# in slot -d-1, otherwise it is in slot hash(word, d) % n. The word is stored in the entry, so words
+# not in the lexicon are spotted.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import mmap
+import zlib
+import array
+import struct
+
+import allophones
+
+_magic = b'RSLX'
+_version = 2
+_header = struct.Struct('<4sIIIII')
+
+def _hash(word, seed=0):
+    # CRC32 seeded with seed, then mixed. CRC32 alone changes the hashes of
+    # two words the same length in the same way for every seed, so two that
+    # clash for one displacement would clash for them all
+    h = zlib.crc32(word, seed) & 0xffffffff
+    h = (h >> 16 ^ h) * 0x45d9f3b & 0xffffffff
+    return h >> 16 ^ h
+
+def _key(word):
+    word = word.upper()
+    if not isinstance(word, bytes):
+        word = word.encode('utf-8')
+    return word
+
+def packCodes(codes):
+    # Pack allophone codes 0-63 into bytes, 6 bits each
+    packed = bytearray()
+    bits = 0
+    count = 0
+    for code in codes:
+        bits |= (code & 0x3F) << count
+        count += 6
+        while count >= 8:
+            packed.append(bits & 0xFF)
+            bits >>= 8
+            count -= 8
+    if count:
+        packed.append(bits)
+    return packed
+
+def unpackCodes(packed, count):
+    # Unpack count allophone codes from bytes packed by packCodes
+    codes = array.array('B')
+    bits = 0
+    have = 0
+    packed = iter(bytearray(packed))
+    for n in range(count):
+        if have < 6:
+            bits |= next(packed) << have
+            have += 8
+        codes.append(bits & 0x3F)
+        bits >>= 6
+        have -= 6
+    return codes
+
+def perfectHash(keys):
+    # Build a minimal perfect hash for a list of distinct keys
+    # Returns (displacements, slots) where slots[n] is the key in slot n
+    # Buckets with the most keys are placed first, searching for a
+    # displacement that puts all their keys in free slots
+    size = len(keys)
+    buckets = [[] for n in range(size)]
+    for key in keys:
+        buckets[_hash(key) % size].append(key)
+    displacements = [0] * size
+    slots = [None] * size
+    buckets.sort(key=len, reverse=True)
+    for bucket in buckets:
+        if len(bucket) <= 1:
+            break
+        d = 1
+        while True:
+            placed = [_hash(key, d) % size for key in bucket]
+            if len(set(placed)) == len(placed) and all(slots[slot] is None for slot in placed):
+                break
+            d += 1
+        displacements[_hash(bucket[0]) % size] = d
+        for key, slot in zip(bucket, placed):
+            slots[slot] = key
+    # Buckets with one key go straight into the free slots
+    free = [n for n in range(size) if slots[n] is None]
+    for bucket in buckets:
+        if len(bucket) == 1:
+            slot = free.pop()
+            displacements[_hash(bucket[0]) % size] = -slot-1
+            slots[slot] = bucket[0]
+    return displacements, slots
+
+def compileLexicon(words, path):
+    # Write a compiled lexicon file from a dictionary of word to allophone string
+    entries = {}
+    for word, speech in words.items():
+        codes = allophones.encode(speech)
+        if len(codes) > 255:
+            raise ValueError("Too many allophones for {}".format(word))
+        entries[_key(word)] = codes
+    keys = sorted(entries)
+    if not keys:
+        raise ValueError("No words to compile")
+    displacements, slots = perfectHash(keys)
+    n = len(keys)
+    tableOffset = _header.size
+    indexOffset = tableOffset + 4*n
+    dataOffset = indexOffset + 4*n
+    index = array.array('I')
+    data = bytearray()
+    for key in slots:
+        index.append(dataOffset + len(data))
+        codes = entries[key]
+        data += bytearray([len(key)]) + key + bytearray([len(codes)]) + packCodes(codes)
+    with open(path, 'wb') as f:
+        f.write(_header.pack(_magic, _version, n, tableOffset, indexOffset, dataOffset))
+        f.write(struct.pack('<{}i'.format(n), *displacements))
+        f.write(struct.pack('<{}I'.format(n), *index))
+        f.write(data)
+    return n
+
+def readWordList(path):
+    # Read a text file of words and allophones, one word per line
+    words = {}
+    for line in open(path):
+        fields = line.split()
+        if fields and not line.startswith(';;;'):
+            words.setdefault(fields[0].upper(), ' '.join(fields[1:]))
+    return words
+
+# CMU Pronouncing Dictionary phonemes to the NRL phonemes used by retroTTS
+cmuToNRL = { 'B':'b', 'D':'d', 'F':'f', 'G':'g', 'HH':'h', 'JH':'j', 'K':'k', 'L':'l',
+             'M':'m', 'N':'n', 'P':'p', 'R':'r', 'S':'s', 'T':'t', 'V':'v', 'W':'w',
+             'Y':'y', 'Z':'z' }
+
+def readCMUDict(path):
+    # Read a file in CMU Pronouncing Dictionary format, converting the
+    # phonemes to SP0256 allophones the same way retroTTS does
+    from retroTTS import IPAtoSP0256
+    words = {}
+    for line in open(path):
+        fields = line.split()
+        if not fields or line.startswith(';;;') or fields[0].endswith(')'):
+            # Comments and alternative pronunciations - WORD(2)
+            continue
+        phonemes = [cmuToNRL.get(p.rstrip('012'), p.rstrip('012')) for p in fields[1:]]
+        words.setdefault(fields[0].upper(), ' '.join(IPAtoSP0256(phonemes)))
+    return words
+
+
+class pronunciationLexicon():
+    # A compiled lexicon file, memory mapped
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._size, self._table, self._index, self._data = _header.unpack_from(self._map, 0)
+        if magic != _magic or version != _version:
+            raise ValueError("{} isn't a version {} lexicon".format(path, _version))
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, word):
+        return self._entry(_key(word)) is not None
+
+    def lookupCodes(self, word):
+        # Returns the allophone codes for a word as an array, or None
+        position = self._entry(_key(word))
+        if position is None:
+            return None
+        count = ord(self._map[position:position+1])
+        return unpackCodes(self._map[position+1:position+1+(count*6+7)//8], count)
+
+    def lookup(self, word):
+        # Returns the allophones for a word as a string separated by spaces, or None
+        codes = self.lookupCodes(word)
+        if codes is None:
+            return None
+        return ' '.join(allophones.decode(codes))
+
+    def close(self):
+        self._map.close()
+
+    def _entry(self, key):
+        # Position of the allophone count in the word's entry, or None
+        slot = _hash(key) % self._size
+        (d,) = struct.unpack_from('<i', self._map, self._table + 4*slot)
+        if d < 0:
+            slot = -d-1
+        else:
+            slot = _hash(key, d) % self._size
+        (position,) = struct.unpack_from('<I', self._map, self._index + 4*slot)
+        length = ord(self._map[position:position+1])
+        if self._map[position+1:position+1+length] != key:
+            return None
+        return position+1+length
+
+
+if __name__ == '__main__':
+    import time
+    import argparse
+    parser = argparse.ArgumentParser(description='Compile and look up retroSpeak pronunciation lexicons')
+    commands = parser.add_subparsers(dest='command')
+    compiler = commands.add_parser('compile', help='Compile a word list')
+    compiler.add_argument('--cmudict', action="store_const", const=True, default=False, dest='cmudict', help='Input is in CMU Pronouncing Dictionary format')
+    compiler.add_argument('input', help='Word list')
+    compiler.add_argument('output', help='Compiled lexicon')
+    finder = commands.add_parser('lookup', help='Look up words')
+    finder.add_argument('lexicon', help='Compiled lexicon')
+    finder.add_argument('words', nargs='+', help='Words to look up')
+    args = parser.parse_args()
+
+    if args.command == 'compile':
+        start = time.time()
+        words = readCMUDict(args.input) if args.cmudict else readWordList(args.input)
+        count = compileLexicon(words, args.output)
+        print("{} words compiled in {:.1f}s".format(count, time.time()-start))
+    else:
+        lexicon = pronunciationLexicon(args.lexicon)
+        for word in args.words:
+            print("{}: {}".format(word, lexicon.lookup(word)))
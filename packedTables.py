@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak packed tables
+# Allophone sequences kept as address codes, one byte each, one after another
+# in a single array - a speechTable - with an array of where each sequence
+# starts. A sequence added more than once is only kept once.
+#
+# retroTTS keeps the allophones of the vocabulary and phrases in one, so the
+# phrase trie holds sequence numbers and textToCodes copies codes straight out
+# of the table.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+from array import array
+
+import allophones
+
+_names = allophones.allophoneNames
+
+class speechTable():
+    # Allophone sequences packed into one array of address codes
+
+    def __init__(self, codes=None, offsets=None):
+        self.codes = codes if codes is not None else array('B')
+        self.offsets = offsets if offsets is not None else array('I', [0])
+        self._added = None
+        self._speech = {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def add(self, speech):
+        # Add a string of allophones, returning its sequence number
+        # The same allophones added again give the same sequence number
+        codes = allophones.encode(speech)
+        if self._added is None:
+            self._added = dict((self.sequence(n).tostring(), n) for n in range(len(self)))
+        key = codes.tostring()
+        if key not in self._added:
+            self.codes.extend(codes)
+            self.offsets.append(len(self.codes))
+            self._added[key] = len(self) - 1
+        return self._added[key]
+
+    def sequence(self, n):
+        # The address codes of sequence n, as an array
+        return self.codes[self.offsets[n]:self.offsets[n+1]]
+
+    def speech(self, n):
+        # The allophones of sequence n, as a string separated by spaces
+        # Each string is made once and kept
+        text = self._speech.get(n)
+        if text is None:
+            text = self._speech[n] = ' '.join([_names[c] for c in self.codes[self.offsets[n]:self.offsets[n+1]]])
+        return text
+
+    def source(self):
+        return 'speechTable({!r}, {!r})'.format(self.codes, self.offsets)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak number readout
+# Speaks numbers and sensor readings - integers up to 999,999,999, decimals,
+# negative numbers and common units - built from the words in vocabulary.py
+#
+#   readout.readingCodes(21.5, 'C')     # allophone codes for retroSpeak.speakCodes
+#   readout.readingAllophones(-3, 'C')  # 'MM AY NN1 AX SS PA2 TH RR1 IY ...'
+#   readout.readingAllophones(1204)     # one thousand two hundred and four
+#
+# Decimals are read digit by digit after 'point'. With decimals=None a float
+# is read with up to six decimal places, dropping zeros at the end, and
+# decimals=n reads exactly n places, rounding as '%.nf' does.
+# Units are singular only when the number said is exactly one - 'one volt',
+# but 'one point zero volts'.
+#
+# Every word's allophones are turned into codes once, when the module is
+# imported, so a reading is just joining arrays. The most recent readings are
+# kept too, so reading the same value again is a dictionary lookup. The
+# arrays returned are shared - don't change them.
+#
+# Words in a number are separated by PA2, as in vocabulary.daysOfMonth, and
+# the unit by PA4.
+#
+#   usage: readout.py [-u UNIT] [-d DECIMALS] VALUE [VALUE ...]
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import threading
+from array import array
+from collections import OrderedDict
+
+import allophones
+from vocabulary import vocabulary, numbers
+
+# Units - the words for one of them, and for any other amount
+# Any other unit is read as words from the vocabulary
+units = { '%':('percent', 'percent'),
+          'A':('amp', 'amps'),
+          'C':('degree celsius', 'degrees celsius'),
+          'deg':('degree', 'degrees'),
+          'h':('hour', 'hours'),
+          'hPa':('millibar', 'millibars'),
+          'Hz':('hertz', 'hertz'),
+          'km':('kilometre', 'kilometres'),
+          'km/h':('kilometre per hour', 'kilometres per hour'),
+          'kn':('knot', 'knots'),
+          'lx':('lux', 'lux'),
+          'm':('metre', 'metres'),
+          'mbar':('millibar', 'millibars'),
+          'min':('minute', 'minutes'),
+          's':('second', 'seconds'),
+          'V':('volt', 'volts'),
+          'W':('watt', 'watts') }
+
+# Largest integer part that can be read
+largest = 999999999
+
+_digits = ['zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine']
+
+class numberReader():
+    # Reads numbers as allophone codes, remembering the last memo readings
+
+    def __init__(self, memo=256):
+        self._memo = memo
+        self._readings = OrderedDict()
+        self._lock = threading.Lock()
+        self._codes = dict((word, allophones.encode(speech)) for word, speech in vocabulary.items())
+        self._numbers = dict((n, allophones.encode(speech)) for n, speech in numbers.items())
+        self._numbers[0] = self._codes['zero']
+        self._pause = allophones.allophoneCodes['PA2']
+        self._unitPause = allophones.allophoneCodes['PA4']
+        self.hits = 0
+        self.misses = 0
+
+    def reading(self, value, unit=None, decimals=None):
+        # Allophone codes for a value, and a unit if given, as an array
+        key = (value, unit, decimals)
+        with self._lock:
+            codes = self._readings.pop(key, None)
+            if codes is not None:
+                self._readings[key] = codes
+                self.hits += 1
+                return codes
+        codes = self._read(value, unit, decimals)
+        with self._lock:
+            self.misses += 1
+            self._readings[key] = codes
+            if len(self._readings) > self._memo:
+                self._readings.popitem(last=False)
+        return codes
+
+    def allophones(self, value, unit=None, decimals=None):
+        # As reading, but as a string of allophones separated by spaces
+        return ' '.join(allophones.decode(self.reading(value, unit, decimals)))
+
+    def integer(self, n, out):
+        # Append the codes for an integer 0 to largest to out
+        if n < 0 or n > largest:
+            raise ValueError("Can't read {}".format(n))
+        if n == 0:
+            self._word(self._numbers[0], out)
+            return out
+        millions, n = divmod(n, 1000000)
+        thousands, n = divmod(n, 1000)
+        if millions:
+            self._hundreds(millions, out)
+            self._word(self._numbers[1000000], out)
+        if thousands:
+            self._hundreds(thousands, out)
+            self._word(self._numbers[1000], out)
+        if n:
+            if n < 100 and (millions or thousands):
+                self._word(self._codes['and'], out)
+            self._hundreds(n, out)
+        return out
+
+    def _hundreds(self, n, out):
+        # Codes for 1 to 999
+        hundreds, n = divmod(n, 100)
+        if hundreds:
+            self._word(self._numbers[hundreds], out)
+            self._word(self._numbers[100], out)
+            if n:
+                self._word(self._codes['and'], out)
+        if n > 20 and n % 10:
+            self._word(self._numbers[n - n % 10], out)
+            self._word(self._numbers[n % 10], out)
+        elif n:
+            self._word(self._numbers[n], out)
+
+    def _word(self, codes, out):
+        if out:
+            out.append(self._pause)
+        out.extend(codes)
+
+    def _read(self, value, unit, decimals):
+        if decimals is None:
+            if isinstance(value, float):
+                text = ('%.6f' % value).rstrip('0').rstrip('.')
+            else:
+                text = str(int(value))
+        else:
+            text = '%.*f' % (decimals, value)
+        negative = text.startswith('-')
+        whole, point, fraction = text.lstrip('-').partition('.')
+        out = array('B')
+        if negative and (int(whole) or fraction.strip('0')):
+            self._word(self._codes['minus'], out)
+        self.integer(int(whole), out)
+        if point:
+            self._word(self._codes['point'], out)
+            for digit in fraction:
+                self._word(self._codes[_digits[int(digit)]], out)
+        if unit is not None:
+            # Singular only when what is said is exactly one - not one point
+            # zero, or a value that only rounds to one
+            words = units.get(unit, (unit, unit))[0 if whole == '1' and not point else 1]
+            out.append(self._unitPause)
+            for n, word in enumerate(words.split()):
+                if n:
+                    out.append(self._pause)
+                out.extend(self._codes[word.lower()])
+        return out
+
+# Reader used by the functions below
+reader = numberReader()
+
+def readingCodes( value, unit=None, decimals=None ):
+    # Allophone codes for a value and unit, ready for retroSpeak.speakCodes
+    return reader.reading(value, unit, decimals)
+
+def readingAllophones( value, unit=None, decimals=None ):
+    # Allophones for a value and unit as a string, for retroSpeak.speak
+    return reader.allophones(value, unit, decimals)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Print the allophones for numbers')
+    parser.add_argument('-u','--unit', action="store", default=None, dest='unit', help='Unit - one of {}, or words from the vocabulary'.format(', '.join(sorted(units))))
+    parser.add_argument('-d','--decimals', action="store", default=None, dest='decimals', type=int, help='Decimal places to read')
+    parser.add_argument('values', nargs='+', help='Numbers to read')
+    args = parser.parse_args()
+
+    for value in args.values:
+        value = float(value) if '.' in value or 'e' in value.lower() else int(value)
+        print("{}: {}".format(value, readingAllophones(value, args.unit, args.decimals)))
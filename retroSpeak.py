@@ -5,6 +5,7 @@
 # SP0256-AL2
 #
 # Requires WiringPi2 and WiringPi2-Python
+# Set RETROSPEAK_SIMULATE=1 in the environment to use simulated boards instead
 #
 # The SP0256 is connected to pins on the MCP23S17
 # The clock for the SP0256 is generated using a programmable oscillator LTC6903
@@ -23,6 +24,22 @@
 #
 # retroSpeak plays the list of allophones in a separate thread - so your program 
 # can do other things while it is speaking.
+# In pipelined mode (pipelined=True) the next allophone's address is written
+# while the current one is playing, to keep the gap between allophones short.
+# Both modes poll SBY every pollInterval seconds - polling faster shortens the
+# gap too, but every poll is a SPI transaction on a bus the boards share.
+# Normal mode polls all through an allophone, so it polls every 10ms unless
+# given. Pipelined mode sleeps through most of the allophone first, so it can
+# afford to poll every 0.5ms unless given. See benchmarks/benchGap.py for what
+# each is worth.
+#
+# speak() waits for room in the queue if it is full. trySpeak() never waits - it
+# queues the whole utterance or nothing, and can drop older or lower priority
+# speech to make room. See setOverflowPolicy()
+#
+# Canned messages compiled with utterances.py can be spoken by name or number
+# with loadBundle() and speakEntry(), and can pause and change the clock speed
+# part way through.
 #
 # Callbacks can be used to do something when an allophone is started, or when speech
 # is started or finished. Look at the code at the end for an example. It should
@@ -61,16 +78,27 @@
 #
 #******************** 
 
+import os
 import array
 import math
 import time
 import threading
 import Queue
 import atexit
+import itertools
+from collections import OrderedDict, deque
 from inspect import isfunction
 
-import wiringpi2 as wiringpi
-from wiringpi2 import GPIO
+if os.environ.get('RETROSPEAK_SIMULATE'):
+    # Simulated boards - see simBoard.py
+    import simBoard as wiringpi
+    from simBoard import GPIO
+else:
+    import wiringpi2 as wiringpi
+    from wiringpi2 import GPIO
+
+import allophones
+import cpuProfile
 
 class retroSpeak():
 
@@ -78,20 +106,25 @@ class retroSpeak():
     _SP0256channel=0
     _LTC6903channel=1
 
-    # Allophone lookup table from datasheet
-    _allophones = { 'PA1':0, 'PA2':1, 'PA3':2, 'PA4':3, 'PA5':4, 'OY':5, 'AY':6, 'EH':7, 
-             'KK3':8, 'PP':9, 'JH':10, 'NN1':11, 'IH':12, 'TT2':13, 'RR1':14, 'AX':15, 
-             'MM':16, 'TT1':17, 'DH1':18, 'IY':19, 'EY':20, 'DD1':21, 'UW1':22, 'AO':23, 
-             'AA':24, 'YY2':25, 'AE':26, 'HH1':27, 'BB1':28, 'TH':29, 'UH':30, 'UW2':31, 
-             'AW':32, 'DD2':33, 'GG3':34, 'VV':35, 'GG1':36, 'SH':37, 'ZH':38, 'RR2':39, 
-             'FF':40, 'KK2':41, 'KK1':42, 'ZZ':43, 'NG':44, 'LL':45, 'WW':46, 'XR':47, 
-             'WH':48, 'YY1':49, 'CH':50, 'ER1':51, 'ER2':52, 'OW':53, 'DH2':54, 'SS':55, 
-             'NN2':56, 'HH2':57, 'OR':58, 'AR':59, 'YR':60, 'GG2':61, 'EL':62, 'BB2':63 };
-
-    # A queue of allophone numbers to speak in the background
-    _speaking = Queue.Queue(500)
+    # Allophone lookup table from datasheet, and address code to name
+    _allophones = allophones.allophoneCodes
+    _names = allophones.allophoneNames
+
+    # A queue of allophones to speak in the background
+    # Each entry is (allophone address code, utterance number, priority)
+    # Names are turned into codes as they are queued, so the speaker threads
+    # write codes straight to the address lines
+    # A code can instead be ('pause', seconds) or ('clock', MHz) - see speakEntry
+    _queueSize = 500
+    _speaking = None
     _isSpeaking = False
 
+    # Overflow policies for trySpeak when the queue is full
+    REJECT_NEW = 'reject'   # refuse the new utterance
+    DROP_OLDEST = 'oldest'  # drop queued utterances, oldest first
+    DROP_LOWEST = 'lowest'  # drop queued utterances of lower priority, lowest first
+    _overflowPolicy = REJECT_NEW
+
     # Device number of the MCP23S17 - set with jumpers on the PCB
     _deviceNum = 0
 
@@ -111,7 +144,27 @@ class retroSpeak():
     _onAllophone = None
     _onStop = None
 
-    def __init__(self, setupSys=True, base=100, device=0, clock=3.12):
+    # Pipelined mode - see _pipelinedSpeaker
+    _pipelined = False
+    # Seconds between reads of SBY while an allophone plays, normally and
+    # pipelined
+    _pollInterval = 0.01
+    _pipelinedPollInterval = 0.0005
+    # In pipelined mode, sleep for this fraction of an allophone's datasheet
+    # duration before polling SBY
+    _pollFrom = 0.75
+
+    # Recent ALD pulses and SBY going high, when tracing
+    _trace = None
+
+    # Times stopSpeaking has been called - an allophone pipelined mode staged
+    # before the last stop isn't spoken
+    _stops = 0
+
+    # Utterance bundle loaded by loadBundle
+    _bundle = None
+
+    def __init__(self, setupSys=True, base=100, device=0, clock=3.12, pipelined=False, pollInterval=None):
         if setupSys:
             # give option of using a different wiringpi setup elsewhere
             wiringpi.wiringPiSetupSys()
@@ -121,6 +174,13 @@ class retroSpeak():
         elif device<0: 
             device=0
         self._deviceNum = int(device)
+        # Each board has its own queue of allophones
+        self._speaking = Queue.Queue(self._queueSize)
+        self._utterances = itertools.count(1)
+        self._pipelined = pipelined
+        if pollInterval is None:
+            pollInterval = self._pipelinedPollInterval if pipelined else self._pollInterval
+        self._pollInterval = pollInterval
         wiringpi.mcp23s17Setup(base,self._SP0256channel,self._deviceNum)
         wiringpi.wiringPiSPISetup(self._LTC6903channel,1000000)
         self._ADDR = base
@@ -146,6 +206,8 @@ class retroSpeak():
 
     def speaker(self):
         # Thread to speak allophones in the background
+        if self._pipelined:
+            self._pipelinedSpeaker()
         while True:
             if not self._speaking.empty():
                 if not(self._isSpeaking):
@@ -153,8 +215,17 @@ class retroSpeak():
                     self._isSpeaking = True
                     if self._onStart != None:
                         self._onStart()
-                allophone = self._speaking.get()
-                a = self._allophones[allophone]
+                try:
+                    a, utterance, priority = self._speaking.get_nowait()
+                except Queue.Empty:
+                    # Queue cleared by stopSpeaking
+                    continue
+                if cpuProfile.enabled:
+                    cpuProfile.tag('speaker', 'board {} utterance {}'.format(self._deviceNum, utterance))
+                if type(a) is tuple:
+                    self._control(a)
+                    self._speaking.task_done()
+                    continue
                 # Switch on voice chip
                 wiringpi.digitalWrite(self._ALD,True)
                 wiringpi.digitalWrite(self._RESET,True)
@@ -164,22 +235,134 @@ class retroSpeak():
                     wiringpi.digitalWrite(self._ADDR+b,a>>b & 1)
                 # A low pulse on ALD (Address Load) starts the speech
                 wiringpi.digitalWrite(self._ALD,False)
+                if self._trace is not None:
+                    self._trace.append((time.time(), 'ald', self._names[a]))
                 wiringpi.digitalWrite(self._ALD,True)
                 if self._onAllophone != None:
                     # Allophone callback
-                    self._onAllophone(allophone)
+                    self._onAllophone(self._names[a])
                 # And wait for SBY standby to go high - it is low when
                 # chip is outputting speech - or 2 seconds in case things went wrong
                 startTime = wiringpi.millis()
                 while ((wiringpi.millis()-startTime) < 2000) and ( not wiringpi.digitalRead(self._SBY)):
                     # Let's delay to save polling constantly
-                    time.sleep(0.01)
+                    time.sleep(self._pollInterval)
+                if self._trace is not None:
+                    self._trace.append((time.time(), 'sby', self._names[a]))
+                self._speaking.task_done()
             else:
                 if self._isSpeaking:
                     # Just finished speaking a sequence so check for stopped callback
                     if self._onStop != None:
                         self._onStop()
+                    if self._trace is not None:
+                        self._trace.append((time.time(), 'stop', None))
                 self._isSpeaking = False
+                self._waitForSpeech()
+
+    def _pipelinedSpeaker(self):
+        # Speaker thread for pipelined mode
+        # The SP0256 only reads A1-A6 on the ALD pulse, so the next allophone's
+        # address is put on them while the current one is still playing. When
+        # SBY goes high the only thing left to do is pulse ALD.
+        address = None  # Allophone number on A1-A6
+        staged = None   # Next allophone to speak - already on A1-A6
+        stagedUtterance = None
+        stagedStops = 0 # stopSpeaking calls before it was staged
+        while True:
+            if staged is not None and stagedStops != self._stops:
+                # Staged before stopSpeaking cleared the queue, so drop it too
+                staged = None
+                self._speaking.task_done()
+            if staged is None:
+                if self._speaking.empty():
+                    if self._isSpeaking:
+                        # Just finished speaking a sequence so check for stopped callback
+                        if self._onStop != None:
+                            self._onStop()
+                        if self._trace is not None:
+                            self._trace.append((time.time(), 'stop', None))
+                    self._isSpeaking = False
+                    self._waitForSpeech()
+                    continue
+                if not(self._isSpeaking):
+                    # Only just started speaking
+                    self._isSpeaking = True
+                    if self._onStart != None:
+                        self._onStart()
+                    # Switch on voice chip
+                    wiringpi.digitalWrite(self._ALD,True)
+                    wiringpi.digitalWrite(self._RESET,True)
+                stagedStops = self._stops
+                try:
+                    staged, stagedUtterance = self._speaking.get_nowait()[:2]
+                except Queue.Empty:
+                    # Queue cleared by stopSpeaking
+                    continue
+                if type(staged) is not tuple:
+                    address = self._writeAddress(staged, address)
+            if type(staged) is tuple:
+                # The allophone before has finished, so pause or change the clock now
+                self._control(staged)
+                self._speaking.task_done()
+                staged = None
+                continue
+            allophone = staged
+            staged = None
+            if cpuProfile.enabled:
+                cpuProfile.tag('speaker', 'board {} utterance {}'.format(self._deviceNum, stagedUtterance))
+            # A low pulse on ALD (Address Load) starts the speech
+            wiringpi.digitalWrite(self._ALD,False)
+            started = time.time()
+            if self._trace is not None:
+                self._trace.append((started, 'ald', self._names[allophone]))
+            wiringpi.digitalWrite(self._ALD,True)
+            if self._onAllophone != None:
+                # Allophone callback
+                self._onAllophone(self._names[allophone])
+            # Put the next allophone on the address lines while this one plays
+            stagedStops = self._stops
+            try:
+                staged, stagedUtterance = self._speaking.get_nowait()[:2]
+                if type(staged) is not tuple:
+                    address = self._writeAddress(staged, address)
+            except Queue.Empty:
+                pass
+            # Sleep through most of the allophone, then watch SBY closely
+            # - or 2 seconds in case things went wrong
+            remaining = started + allophones.codeDuration(allophone, self._clock) * self._pollFrom - time.time()
+            if remaining > 0:
+                time.sleep(remaining)
+            startTime = wiringpi.millis()
+            while ((wiringpi.millis()-startTime) < 2000) and ( not wiringpi.digitalRead(self._SBY)):
+                time.sleep(self._pollInterval)
+            if self._trace is not None:
+                self._trace.append((time.time(), 'sby', self._names[allophone]))
+            self._speaking.task_done()
+
+    def _control(self, item):
+        # Carry out a ('pause', seconds) or ('clock', MHz) from the queue
+        command, value = item
+        if command == 'pause':
+            time.sleep(value)
+        elif command == 'clock':
+            self.setClock(value)
+
+    def _writeAddress(self, a, previous=None):
+        # Put an allophone number on the address lines A1-A6
+        # Only the lines that differ from the previous number are written
+        for b in range(0,6):
+            bit = a>>b & 1
+            if previous is None or bit != (previous>>b & 1):
+                wiringpi.digitalWrite(self._ADDR+b,bit)
+        return a
+
+    def _waitForSpeech(self):
+        # Wait until there is something in the speaking queue
+        q = self._speaking
+        with q.not_empty:
+            while not len(q.queue):
+                q.not_empty.wait()
 
     def listAllophones(self):
         # returns the allophones as a list
@@ -194,27 +377,175 @@ class retroSpeak():
 
     def stopSpeaking(self):
         # Clear queue and wait for current allophone to finish
-        self._speaking.queue.clear()
+        q = self._speaking
+        with q.mutex:
+            # Cleared allophones will never be spoken, so count them done
+            q.unfinished_tasks -= len(q.queue)
+            q.queue.clear()
+            self._stops += 1
+            if not q.unfinished_tasks:
+                q.all_tasks_done.notify_all()
+            q.not_full.notify_all()
         while self.isSpeaking():
             time.sleep(0.02)
 
     def speak( self, speech ):
         # Convert valid allophones to numbers and add to queue
         # Speech should be a string of allophones separated by spaces 
+        utterance = next(self._utterances)
         for allophone in speech.upper().split():
             #print( allophone ),
             # Ignore strings not in allophone table
             if allophone in self._allophones:
                 # put the speaking queue
-                self._speaking.put(allophone)
+                self._speaking.put((self._allophones[allophone], utterance, 0))
             #else:
             #    print( "Invalid allophone: {}".format(allophone) )
 
     def speakList( self, allophones ):
         # Add list of allophones to speaking queue
+        utterance = next(self._utterances)
         for allophone in allophones:
             if allophone.upper() in self._allophones:
-                self._speaking.put(allophone.upper())
+                self._speaking.put((self._allophones[allophone.upper()], utterance, 0))
+
+    def speakCodes( self, codes ):
+        # Add a sequence of allophone address codes 0-63 to the speaking queue
+        # e.g. an array from allophones.encode or retroTTS.textToCodes
+        # Every code is valid, so they are queued as they are
+        utterance = next(self._utterances)
+        put = self._speaking.put
+        for code in codes:
+            put((code & 0x3F, utterance, 0))
+
+    def loadBundle( self, path ):
+        # Memory map an utterance bundle made by utterances.py for speakEntry
+        import utterances
+        self._bundle = utterances.utteranceBundle(path)
+        return self._bundle
+
+    def speakEntry( self, entry, bundle=None ):
+        # Add an entry from an utterance bundle to the speaking queue, by name
+        # or number - from the bundle given, or the one loaded by loadBundle
+        if bundle is None:
+            bundle = self._bundle
+        offset, length, nameLength, flags = bundle.entry(entry)
+        if flags:
+            # Pauses or clock changes to decode
+            utterance = next(self._utterances)
+            put = self._speaking.put
+            for item in bundle.items(entry):
+                put((item, utterance, 0))
+        else:
+            self.speakCodes(bundle.ops(entry))
+
+    def trySpeakCodes( self, codes, priority=0 ):
+        # As trySpeak, but with a sequence of allophone address codes
+        return self._trySubmit([code & 0x3F for code in codes], priority)
+
+    def trySpeak( self, speech, priority=0 ):
+        # Queue a string of allophones without blocking
+        # Either the whole utterance is queued and True returned, or nothing is
+        # queued and False returned. When the queue is full room is made
+        # according to the overflow policy - see setOverflowPolicy
+        # Higher priority utterances can push out lower ones with DROP_LOWEST
+        codes = self._allophones
+        return self._trySubmit([codes[a] for a in speech.upper().split() if a in codes], priority)
+
+    def trySpeakList( self, allophones, priority=0 ):
+        # As trySpeak, but with a list of allophones
+        codes = self._allophones
+        return self._trySubmit([codes[a.upper()] for a in allophones if a.upper() in codes], priority)
+
+    def _trySubmit( self, codes, priority ):
+        # Add a whole utterance of allophone codes to the queue, or nothing at all
+        # Works on the queue under its own lock, so the speaker thread and
+        # other producers see either all of the utterance or none of it
+        q = self._speaking
+        if len(codes) > q.maxsize:
+            # Would never fit
+            return False
+        utterance = next(self._utterances)
+        with q.mutex:
+            needed = len(codes) - (q.maxsize - len(q.queue))
+            if needed > 0:
+                victims = self._overflowVictims(needed, priority)
+                if victims is None:
+                    return False
+                # Rebuild the queue once without them, rather than removing
+                # items one by one from the middle
+                kept = deque(i for i in q.queue if i[1] not in victims)
+                dropped = len(q.queue) - len(kept)
+                q.queue = kept
+                # Dropped allophones will never be spoken, so count them done
+                # for anyone in q.join()
+                q.unfinished_tasks -= dropped
+                if not q.unfinished_tasks:
+                    q.all_tasks_done.notify_all()
+            q.queue.extend((code, utterance, priority) for code in codes)
+            q.unfinished_tasks += len(codes)
+            q.not_empty.notify()
+            if len(q.queue) < q.maxsize:
+                # Dropping may have left room for a speak() waiting to put
+                q.not_full.notify_all()
+        return True
+
+    def _overflowVictims( self, needed, priority ):
+        # Choose queued utterances to drop to free at least needed places
+        # Returns a set of utterance numbers, or None if the new utterance
+        # should be rejected. Must be called holding the queue mutex
+        if self._overflowPolicy == self.REJECT_NEW:
+            return None
+        # Size and priority of each queued utterance, oldest first
+        queued = OrderedDict()
+        for allophone, utterance, p in self._speaking.queue:
+            if utterance in queued:
+                queued[utterance][0] += 1
+            else:
+                queued[utterance] = [1, p]
+        candidates = list(queued.items())
+        if self._overflowPolicy == self.DROP_LOWEST:
+            # Only strictly lower priorities can be dropped, lowest and oldest first
+            candidates = [c for c in candidates if c[1][1] < priority]
+            candidates.sort(key=lambda c: c[1][1])
+        victims = set()
+        for utterance, (size, p) in candidates:
+            victims.add(utterance)
+            needed -= size
+            if needed <= 0:
+                return victims
+        return None
+
+    def setOverflowPolicy( self, policy ):
+        # Set what trySpeak does when the queue is full
+        # REJECT_NEW, DROP_OLDEST or DROP_LOWEST
+        if policy not in (self.REJECT_NEW, self.DROP_OLDEST, self.DROP_LOWEST):
+            raise ValueError("Unknown overflow policy: {}".format(policy))
+        self._overflowPolicy = policy
+
+    def capacity(self):
+        # Number of allophones that can be queued without blocking or dropping
+        return self._speaking.maxsize - self._speaking.qsize()
+
+    def capacitySeconds(self):
+        # Estimated seconds of speech that can be queued without blocking or
+        # dropping, based on the mean allophone duration at the current clock
+        return self.capacity() * allophones.meanDuration * allophones.defaultClock / (self._clock * 1000.0)
+
+    def queuedSeconds(self):
+        # Estimated seconds until the queued allophones have been spoken
+        with self._speaking.mutex:
+            queued = [item[0] for item in self._speaking.queue]
+        seconds = 0.0
+        clock = self._clock
+        for allophone in queued:
+            if type(allophone) is not tuple:
+                seconds += allophones.codeDuration(allophone, clock)
+            elif allophone[0] == 'pause':
+                seconds += allophone[1]
+            else:
+                clock = allophone[1]
+        return seconds
 
     def speakAndWait(self,speech):
         # Speak allophones, but wait until they're spoken
@@ -290,6 +621,38 @@ class retroSpeak():
         # return current clock speed
         return self._clock
 
+    # Tracing
+
+    def enableTrace(self, size=10000):
+        # Record the time of each ALD pulse, and when SBY was seen going high
+        # Only the last size events are kept
+        self._trace = deque(maxlen=size)
+
+    def disableTrace(self):
+        self._trace = None
+
+    def trace(self):
+        # Returns a list of (time, event, allophone)
+        # event is 'ald' or 'sby', or 'stop' with no allophone at the end of speech
+        if self._trace is None:
+            return []
+        return list(self._trace)
+
+    def traceGaps(self):
+        # Returns the gaps in seconds between SBY going high at the end of one
+        # allophone and the ALD pulse starting the next
+        gaps = []
+        standby = None
+        for t, event, allophone in self.trace():
+            if event == 'sby':
+                standby = t
+            elif event == 'stop':
+                standby = None
+            elif standby is not None:
+                gaps.append(t - standby)
+                standby = None
+        return gaps
+
     # Set up callbacks
 
     def setCallbackStart(self,callback):
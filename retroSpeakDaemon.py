@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak daemon
+# A resident process that owns the retroSpeak boards and the text to speech
+# tables, so scripts don't have to start up the board and translator each time
+# they want to say something. Only one process can drive a board at a time, so
+# the daemon also stops scripts fighting over it.
+#
+#   usage: retroSpeakDaemon.py [-h] [-s SOCKET] [-c MHZ] [--cache-size BYTES]
+#                              [--cache-file FILE] [-l FILE]
+#
+# Requests are sent over a Unix domain socket. Each message in either direction
+# is a 4 byte big-endian length followed by that many bytes of JSON.
+#
+# Requests are JSON objects with a 'cmd' and its arguments:
+#   {"cmd":"speak", "allophones":"HH1 EH LL OW", "board":0, "wait":false}
+#   {"cmd":"text", "text":"hello world", "board":0, "wait":false}
+#   {"cmd":"clock", "clock":3.12, "board":0}
+#   {"cmd":"stop", "board":0}
+#   {"cmd":"wait", "board":0}
+#   {"cmd":"stats"}
+# "clock" and "priority" can be added to speak and text requests. Speech is
+# queued with trySpeak if "priority" is given, and "queued" in the reply
+# says whether it was accepted.
+#
+# Replies are {"ok":true, ...} or {"ok":false, "error":"..."}
+#
+# retroSpeakClient in this module sends requests to the daemon. It doesn't need
+# the hardware libraries, so it is quick to import.
+#
+# kill -USR1 starts and stops CPU profiling, and kill -USR2 writes the profile
+# to RETROSPEAK_PROFILE, or /tmp/retroSpeak.folded - see cpuProfile.py
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import json
+import errno
+import socket
+import struct
+import threading
+import unicodedata
+
+# Where the daemon listens unless told otherwise
+defaultSocket = os.environ.get('RETROSPEAK_SOCKET', '/tmp/retroSpeak.sock')
+
+# Frame header - length of the JSON that follows
+_header = struct.Struct('!I')
+# Refuse silly sized frames rather than trying to read them
+_maxFrame = 1 << 20
+
+
+def sendFrame(sock, message):
+    # Send a message as a length prefixed JSON frame
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(_header.pack(len(data)) + data)
+
+def recvFrame(sock):
+    # Receive a length prefixed JSON frame
+    # Returns None if the other end closed the connection
+    header = _recvExactly(sock, _header.size)
+    if header is None:
+        return None
+    (length,) = _header.unpack(header)
+    if length > _maxFrame:
+        raise ValueError("Frame too large: {} bytes".format(length))
+    data = _recvExactly(sock, length)
+    if data is None:
+        return None
+    return json.loads(data.decode('utf-8'))
+
+def _recvExactly(sock, size):
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+class retroSpeakClient():
+    # Talks to a running retroSpeakDaemon
+    # The connection is kept open between requests
+
+    def __init__(self, path=defaultSocket):
+        self._path = path
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def request(self, message):
+        # Send a request and return the reply
+        # Raises IOError if the daemon reports an error
+        with self._lock:
+            if self._sock is None:
+                self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self._sock.connect(self._path)
+            sendFrame(self._sock, message)
+            reply = recvFrame(self._sock)
+        if reply is None:
+            self.close()
+            raise IOError("retroSpeak daemon closed the connection")
+        if not reply.get('ok'):
+            raise IOError(reply.get('error', 'retroSpeak daemon error'))
+        return reply
+
+    def speak(self, allophones, board=0, clock=None, wait=False, priority=None):
+        # Speak a string of allophones separated by spaces
+        return self.request(self._speech('speak', 'allophones', allophones, board, clock, wait, priority))
+
+    def speakText(self, text, board=0, clock=None, wait=False, priority=None):
+        # Translate text to allophones in the daemon and speak it
+        # The reply has the allophones used under 'allophones'
+        return self.request(self._speech('text', 'text', text, board, clock, wait, priority))
+
+    def setClock(self, clock, board=0):
+        return self.request({'cmd':'clock', 'clock':clock, 'board':board})
+
+    def stopSpeaking(self, board=0):
+        return self.request({'cmd':'stop', 'board':board})
+
+    def wait(self, board=0):
+        # Wait until the board has finished speaking
+        return self.request({'cmd':'wait', 'board':board})
+
+    def stats(self):
+        # Word cache counters from the daemon
+        return self.request({'cmd':'stats'})
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _speech(self, cmd, key, value, board, clock, wait, priority):
+        message = {'cmd':cmd, key:value, 'board':board, 'wait':wait}
+        if clock is not None:
+            message['clock'] = clock
+        if priority is not None:
+            message['priority'] = priority
+        return message
+
+
+class retroSpeakDaemon():
+    # Owns the retroSpeak boards and answers requests from clients
+    # Boards are opened the first time a request uses them
+
+    def __init__(self, path=defaultSocket, clock=3.12, cacheSize=1<<20, cacheFile=None, lexicon=None):
+        # Import here so clients don't need the hardware libraries
+        import retroSpeak
+        import retroTTS
+        # Translated words are cached - see retroTTS.enableWordCache
+        if cacheSize:
+            retroTTS.enableWordCache(cacheSize, cacheFile)
+        if lexicon:
+            retroTTS.useLexicon(lexicon)
+        self._retroSpeak = retroSpeak
+        self._tts = retroTTS
+        self._path = path
+        self._clock = clock
+        self._boards = {}
+        self._boardsLock = threading.Lock()
+        self._server = None
+
+    def board(self, device):
+        # Return the retroSpeak instance for a device number, opening it if needed
+        device = int(device)
+        if device < 0 or device > 3:
+            raise ValueError("Board must be 0-3")
+        with self._boardsLock:
+            if device not in self._boards:
+                # wiringpi only needs setting up once, and each stacked
+                # board needs its own range of pin numbers
+                self._boards[device] = self._retroSpeak.retroSpeak(setupSys=not(self._boards),
+                    base=100+16*device, device=device, clock=self._clock)
+            return self._boards[device]
+
+    def handle(self, message):
+        # Carry out a request and return the reply
+        # Only commands for a board open it
+        cmd = message.get('cmd')
+        reply = {'ok':True}
+        if cmd == 'stats':
+            if self._tts.wordCache is not None:
+                reply['wordCache'] = self._tts.wordCache.stats()
+            return reply
+        if cmd not in ('speak', 'text', 'clock', 'stop', 'wait'):
+            return {'ok':False, 'error':"Unknown command: {}".format(cmd)}
+        speech = self.board(message.get('board', 0))
+        if cmd in ('speak', 'text'):
+            if cmd == 'text':
+                # JSON text is unicode - the rules only know ASCII, so accents
+                # are taken off letters and anything else left out
+                text = unicodedata.normalize('NFKD', message['text']).encode('ascii', 'ignore')
+                allophones = self._tts.textToAllophones(text.split())
+                reply['allophones'] = allophones
+            else:
+                allophones = message['allophones']
+            if 'clock' in message and message['clock'] != speech.clockSpeed():
+                speech.setClock(float(message['clock']))
+            if 'priority' in message:
+                reply['queued'] = speech.trySpeak(allophones, int(message['priority']))
+            else:
+                speech.speak(allophones)
+            if message.get('wait'):
+                speech.wait()
+        elif cmd == 'clock':
+            speech.setClock(float(message['clock']))
+        elif cmd == 'stop':
+            speech.stopSpeaking()
+        elif cmd == 'wait':
+            speech.wait()
+        return reply
+
+    def serve(self):
+        # Listen for clients until the process is stopped
+        # Each connection gets its own thread
+        import SocketServer
+        daemon = self
+
+        class Handler(SocketServer.BaseRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        message = recvFrame(self.request)
+                    except ValueError as e:
+                        sendFrame(self.request, {'ok':False, 'error':str(e)})
+                        return
+                    if message is None:
+                        return
+                    try:
+                        reply = daemon.handle(message)
+                    except Exception as e:
+                        reply = {'ok':False, 'error':str(e)}
+                    sendFrame(self.request, reply)
+
+        if os.path.exists(self._path):
+            # Left over from a previous run, unless another daemon answers
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self._path)
+            except socket.error as e:
+                if e.errno != errno.ECONNREFUSED:
+                    raise
+                os.unlink(self._path)
+            else:
+                raise IOError("A retroSpeak daemon is already listening on {}".format(self._path))
+            finally:
+                probe.close()
+        SocketServer.ThreadingUnixStreamServer.daemon_threads = True
+        self._server = SocketServer.ThreadingUnixStreamServer(self._path, Handler)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            os.unlink(self._path)
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+
+if __name__ == '__main__':
+    import argparse
+    import signal
+    import sys
+
+    def clockSpeed(freq):
+        freq = float(freq)
+        if freq < 1.0 or freq > 5.1:
+            raise argparse.ArgumentTypeError("%r not in range [1.0, 5.1]"%(freq,))
+        return freq
+
+    parser = argparse.ArgumentParser(description='retroSpeak speech daemon')
+    parser.add_argument('-s','--socket', action="store", default=defaultSocket, dest='socket', help='Unix socket to listen on - default is {}'.format(defaultSocket))
+    parser.add_argument('-c','--clock', action="store", default='3.12', dest='mhz', type=clockSpeed, help='Initial clock speed in MHz - range 1.0 to 5.1')
+    parser.add_argument('--cache-size', action="store", default=1<<20, dest='cacheSize', type=int, metavar='BYTES', help='Memory for caching translated words - 0 to turn off')
+    parser.add_argument('--cache-file', action="store", default=None, dest='cacheFile', metavar='FILE', help='Load the word cache from FILE at start, and save it there on exit')
+    parser.add_argument('-l','--lexicon', action="store", default=None, dest='lexicon', metavar='FILE', help='Look words up in a compiled lexicon before using the rules')
+    args = parser.parse_args()
+
+    daemon = retroSpeakDaemon(args.socket, args.mhz, args.cacheSize, args.cacheFile, args.lexicon)
+    # Open the default board now so the first request doesn't wait for it
+    daemon.board(0)
+    # Tidy up the socket when stopped by kill or the init system
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # Profile on SIGUSR1 and SIGUSR2
+    import cpuProfile
+    cpuProfile.installSignals()
+    try:
+        daemon.serve()
+    except KeyboardInterrupt:
+        pass
+    except IOError as e:
+        sys.exit(str(e))
@@ -11,6 +11,16 @@
 # Ensure retroSpeak.py, en_US_rules.py and vocabulary.py are in the path or 
 # same directory as this script
 #
+# It can also be imported to translate text without a board:
+#
+#   import retroTTS
+#   retroTTS.textToAllophones('hello world'.split())
+#   retroTTS.textToCodes('hello world'.split())
+#
+# Both take a list of words - a string would be translated letter by letter.
+#
+# retroSpeak, and so wiringpi2, is only imported when main() is asked to speak.
+#
 # Jason Lane 2015
 #
 # English to Phoneme text to speech
@@ -79,11 +89,23 @@
 # 
 
 
+import os
+import sys
+import json
+import array
+import time
+import atexit
+import struct
+import hashlib
 import argparse
+import threading
+import Queue
+from collections import OrderedDict, deque
 
-import retroSpeak
-from en_US_rules import Rules
-from vocabulary import *
+import allophones
+import cpuProfile
+import ruleCache
+import packedTables
 
 # Parts of rules
 leftPart  = 0
@@ -97,22 +119,396 @@ def isVowel(c):
 def isConsonant(c):
     return c.isupper() and not isVowel(c)
 
+def compileRules( rules, numbered=False, matchers=None, output=None ):
+    # Compile each letter's rules into a prefix trie on the text to match
+    # A node is (rules, child nodes by next letter), where rules are all the
+    # rules whose match text ends at this node or before it on the way from
+    # the root - so the deepest node the word reaches has every rule whose
+    # match text is there. They are kept in the same order as the letter's list
+    # as (length of match text, left matcher, right matcher, phonemes)
+    # Each rule is one tuple shared by every node it is in, and a node with no
+    # children has None for them, to keep the tries small
+    # An empty context has None for its matcher
+    # If numbered is True, each rule starts with its position in the letter's list
+    # matchers is a dictionary of (pattern, right) to matcher, from compileContexts
+    # unless it is given
+    # If output is given, the phonemes are output(phonemes) - see ruleCodes
+    if matchers is None:
+        matchers = compileContexts(rules)
+    tries = {}
+    for letter, letterRules in rules.items():
+        root = ([], {})
+        for n, rule in enumerate(letterRules):
+            node = root
+            for c in rule[matchPart]:
+                node = node[1].setdefault(c, ([], {}))
+            node[0].append((n, len(rule[matchPart]), matchers[rule[leftPart], False], matchers[rule[rightPart], True],
+                            rule[outPart] if output is None else output(rule[outPart])))
+        tries[letter] = _mergeRules(root, [], 0 if numbered else 1, {})
+    return tries
+
+def _mergeRules( node, above, start, shared ):
+    # Add the rules from the nodes above to each node, in rule list order
+    # shared has the one tuple used for each rule
+    merged = sorted(above + node[0])
+    children = dict((c, _mergeRules(child, merged, start, shared)) for c, child in node[1].items())
+    return (tuple(shared.setdefault(rule, rule[start:]) for rule in merged), children or None)
+
+def _sharedRulesSource( tries, name ):
+    # The tries for the cache source, with each rule written once in a list
+    # called name, and the source of the list - so the rules are shared when
+    # the cache is loaded, as they are by compileRules
+    rules = {}
+    def share(node):
+        entries = tuple(_sourceName('{}[{}]'.format(name, rules.setdefault(rule, len(rules)))) for rule in node[0])
+        children = node[1] and dict((c, share(child)) for c, child in node[1].items())
+        return (entries, children)
+    shared = dict((letter, share(root)) for letter, root in tries.items())
+    ordered = sorted(rules, key=rules.get)
+    return shared, '{} = {!r}'.format(name, ordered)
+
+# Letter classes used in context patterns
+_classes = { 'VOWELS':frozenset('AEIOU'), 'CONSONANTS':frozenset('BCDFGHJKLMNPQRSTVWXYZ'),
+             'VOICED':frozenset('BDVGJLMNRWZ'), 'FRONT':frozenset('EIY') }
+
+def compileContexts( rules ):
+    # Compile every left and right context pattern in the rules to a function
+    # Returns a dictionary of (pattern, right) to function, or None for an
+    # empty pattern. The functions are generated as Python source and compiled
+    # together. They take the padded word and the position of the first letter
+    # of the context - the letter after the match for right contexts, or the
+    # letter before it for left contexts, which are matched right to left.
+    # They match exactly as lrMatch does
+    names, source = _contextsSource(rules)
+    namespace = dict(_classes)
+    exec(compile('\n'.join(source), '<retroTTS contexts>', 'exec'), namespace)
+    return dict((key, namespace[name] if name else None) for key, name in names.items())
+
+def _contextsSource( rules ):
+    # Names and Python source lines of the functions for compileContexts
+    patterns = set()
+    for letterRules in rules.values():
+        for rule in letterRules:
+            patterns.add((rule[leftPart], False))
+            patterns.add((rule[rightPart], True))
+    names = {}
+    source = []
+    for n, (pattern, right) in enumerate(sorted(patterns)):
+        if pattern == '':
+            names[pattern, right] = None
+        else:
+            names[pattern, right] = 'match{}'.format(n)
+            source.extend(_contextSource(names[pattern, right], pattern, right))
+    return names, source
+
+def _contextSource( name, pattern, right ):
+    # Python source lines for a function matching one context pattern
+    # Left patterns are read backwards from the match, as lrMatch reverses them
+    step = '+ 1' if right else '- 1'
+    lines = ['def {}(w, i):'.format(name)]
+    if not right:
+        pattern = pattern[::-1]
+    literal = ''
+    for p in pattern + '\0':
+        if p.isalpha() or p=="'" or p==" ":
+            # Simple text or space - checked together with any following it
+            literal = literal + p
+            continue
+        if literal:
+            if len(literal) == 1 and literal != ' ':
+                # Left of the word index -1 wraps round to the padding space
+                # at the end, so only a space needs the bounds checking below
+                lines.append('    if w[i] != {!r}: return False'.format(literal))
+                lines.append('    i = i {}'.format(step))
+            elif right:
+                lines.append('    if not w.startswith({!r}, i): return False'.format(literal))
+                lines.append('    i = i + {}'.format(len(literal)))
+            else:
+                lines.append('    if not w.endswith({!r}, 0, i + 1): return False'.format(literal[::-1]))
+                lines.append('    i = i - {}'.format(len(literal)))
+            literal = ''
+        if p=='\0':
+            break
+        elif p=='#':
+            # One or more vowels
+            lines.append('    if w[i] not in VOWELS: return False')
+            lines.append('    i = i {}'.format(step))
+            lines.append('    while w[i] in VOWELS: i = i {}'.format(step))
+        elif p==':':
+            # zero or more consonant
+            lines.append('    while w[i] in CONSONANTS: i = i {}'.format(step))
+        elif p=='^':
+            # One consonant
+            lines.append('    if w[i] not in CONSONANTS: return False')
+            lines.append('    i = i {}'.format(step))
+        elif p=='.':
+            #  B, D, V, G, J, L, M, N, R, W, Z
+            lines.append('    if w[i] not in VOICED: return False')
+            lines.append('    i = i {}'.format(step))
+        elif p=='+':
+            # E, I or Y (front vowel)
+            lines.append('    if w[i] not in FRONT: return False')
+            lines.append('    i = i {}'.format(step))
+        elif right and p=='%':
+            # ER, E, ES, ED, ING, ELY (a suffix) - with the same steps as lrMatch
+            lines.append("    if w.startswith('ING', i) or w.startswith('ERY', i): i = i + 4")
+            lines.append("    elif w.startswith('ER', i) or w.startswith('ES', i) or w.startswith('ED', i): i = i + 3")
+            lines.append("    elif w[i] == 'E': i = i + 2")
+            lines.append("    else: return False")
+        else:
+            lines.append('    print("Bad char in {} pattern: {!r}")'.format('right' if right else 'left', p))
+            lines.append('    return False')
+            return lines
+    lines.append('    return True')
+    return lines
+
+def rulesFingerprint( rules ):
+    # A hash of a rule table, to tell when it has changed
+    rules = sorted((letter, list(letterRules)) for letter, letterRules in rules.items())
+    return hashlib.sha1(repr(rules).encode('utf-8')).hexdigest()
+
+def setRules( rules ):
+    # Use a different rule table - in the same form as en_US_rules.Rules
+    # Cached translations from the old rules are dropped
+    global Rules, RuleTries, CodeTries, RulesFingerprint
+    matchers = compileContexts(rules)
+    RuleTries = compileRules(rules, matchers=matchers)
+    CodeTries = compileRules(rules, matchers=matchers, output=ruleCodes)
+    Rules = rules
+    RulesFingerprint = rulesFingerprint(rules)
+    if ruleProfiler is not None:
+        setRuleProfiler(ruleProfiler)
+
+
+class pronunciationCache():
+    # Least recently used cache of translateWord results
+    # Keyed by the word as given to translateWord, which is upper case.
+    # Entries are dropped, least recently used first, to keep the estimated
+    # memory used under budget bytes. The cache empties itself if the rule
+    # table changes.
+
+    # Rough bytes used by the cache for each entry on top of the word and phonemes
+    _entryOverhead = 100
+
+    def __init__(self, budget=1<<20):
+        self._budget = budget
+        self._entries = OrderedDict()
+        self._size = 0
+        self._fingerprint = RulesFingerprint
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, word):
+        # Return the cached phonemes for a word as a tuple, or None
+        with self._lock:
+            if self._fingerprint != RulesFingerprint:
+                self._clear()
+            phonemes = self._entries.pop(word, None)
+            if phonemes is None:
+                self.misses += 1
+                return None
+            # Back to the most recently used end
+            self._entries[word] = phonemes
+            self.hits += 1
+            return phonemes
+
+    def put(self, word, phonemes):
+        phonemes = tuple(phonemes)
+        size = self._entrySize(word, phonemes)
+        if size > self._budget:
+            return
+        with self._lock:
+            if self._fingerprint != RulesFingerprint:
+                self._clear()
+            if word in self._entries:
+                self._size -= self._entrySize(word, self._entries.pop(word))
+            self._entries[word] = phonemes
+            self._size += size
+            while self._size > self._budget:
+                oldWord, oldPhonemes = self._entries.popitem(last=False)
+                self._size -= self._entrySize(oldWord, oldPhonemes)
+                self.evictions += 1
+
+    def invalidate(self):
+        # Empty the cache
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        # Returns a dictionary of the counters and size
+        return {'hits':self.hits, 'misses':self.misses, 'evictions':self.evictions,
+                'entries':len(self._entries), 'bytes':self._size, 'budget':self._budget}
+
+    def save(self, path):
+        # Write the cache to a file, least recently used first
+        with self._lock:
+            snapshot = {'rules':self._fingerprint, 'words':list(self._entries.items())}
+        with open(path + '.tmp', 'w') as f:
+            json.dump(snapshot, f)
+        os.rename(path + '.tmp', path)
+
+    def load(self, path):
+        # Fill the cache from a file written by save
+        # Nothing is loaded if the file is missing or from different rules
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (IOError, ValueError):
+            return
+        if snapshot.get('rules') != RulesFingerprint:
+            return
+        for word, phonemes in snapshot['words']:
+            self.put(str(word), [str(p) for p in phonemes])
+
+    def _clear(self):
+        self._entries.clear()
+        self._size = 0
+        self._fingerprint = RulesFingerprint
+
+    def _entrySize(self, word, phonemes):
+        return sys.getsizeof(word) + sys.getsizeof(phonemes) + self._entryOverhead
+
+# Cache used by translateWord - see enableWordCache
+wordCache = None
+
+def enableWordCache( budget=1<<20, snapshot=None ):
+    # Cache translated words, using about budget bytes at most
+    # If snapshot is a file name, the cache is loaded from it now and saved to
+    # it when the program finishes
+    global wordCache
+    wordCache = pronunciationCache(budget)
+    if snapshot:
+        wordCache.load(snapshot)
+        atexit.register(wordCache.save, snapshot)
+    return wordCache
+
+def disableWordCache():
+    global wordCache
+    wordCache = None
+
+# Rule profiler - see setRuleProfiler
+ruleProfiler = None
+_profiledTries = None
+
+def setRuleProfiler( profiler ):
+    # Report every rule tried by translateWord to a profiler - see ruleProfile.py
+    # None turns profiling off. The word cache isn't used while profiling
+    global ruleProfiler, _profiledTries
+    _profiledTries = compileRules(Rules, numbered=True) if profiler is not None else None
+    ruleProfiler = profiler
+
 def translateWord(word):
     # Return a list of IPA phonemes that make up the word
+    if ruleProfiler is not None:
+        return _translate(word, _findRuleProfiled, _profiledTries)
+    cache = wordCache
+    if cache is None:
+        return _translate(word, findRuleTrie, RuleTries)
+    phonemes = cache.get(word)
+    if phonemes is None:
+        phonemes = _translate(word, findRuleTrie, RuleTries)
+        cache.put(word, phonemes)
+        return phonemes
+    return list(phonemes)
+
+def translateWordCodes(word, out):
+    # Translate a word straight to SP0256 allophone codes, appended to out,
+    # an array('B'). The same allophones as IPAtoSP0256(translateWord(word))
+    # The rules give codes directly - see ruleCodes - so no phoneme strings are made
+    if ruleProfiler is not None or wordCache is not None:
+        codes = PhonemeCodes
+        for phoneme in translateWord(word):
+            out.extend(codes.get(phoneme, ()))
+        return out
+    word = ' ' + word + ' '
+    index = 1
+    end = len(word)-1
+    while index < end:
+        letter = word[index]
+        # Anything without rules of its own - digits, accented letters - goes
+        # to the punctuation rules
+        index,codes = findRuleTrie(word, index, CodeTries[letter if letter in CodeTries else 'punctuation'])
+        if codes:
+            out.extend(codes)
+    return out
+
+def translateWordLinear(word):
+    # As translateWord, but scanning each letter's list of rules in turn
+    # Slower - kept as the reference the rule tries must agree with
+    return _translate(word, findRule, Rules)
+
+def _translate(word, find, rules):
     phonemes = ''
     word = ' ' + word + ' ' # Add padding spaces either side of word
     index=1 # start on first letter of word - after added space
     while index < len(word)-1:
         #print "Index: {} Letter:{}".format(index,word[index])
-        if word[index].isupper():
-            letterRules = Rules[word[index]]
+        if word[index] in rules:
+            letterRules = rules[word[index]]
         else:
-            letterRules = Rules['punctuation']
-        index,phoneme = findRule(word,index,letterRules)
+            letterRules = rules['punctuation']
+        index,phoneme = find(word,index,letterRules)
         if phoneme != '':
             phonemes = phonemes + ' ' + phoneme
     return phonemes.split()
-    
+
+def _noRule( word, index ):
+    # Report a letter no rule matches - unicode is shown escaped, as stdout
+    # may only take ASCII
+    letter = word[index]
+    if isinstance(word, unicode):
+        letter = letter.encode('ascii', 'backslashreplace')
+        word = word.encode('ascii', 'backslashreplace')
+    print("Error: Can't find rule for '{}' in '{}'".format(letter,word))
+
+def findRuleTrie( word, index, trie ):
+    # As findRule, but with the letter's rules compiled into a trie
+    # Walking the trie along the word finds just the rules whose match text is
+    # there, so only those have their left and right patterns checked
+    node = trie
+    children = node[1]
+    position = index
+    while children and position < len(word):
+        child = children.get(word[position])
+        if child is None:
+            break
+        node = child
+        children = node[1]
+        position = position+1
+    for length, left, right, phoneme in node[0]:
+        if (left is None or left(word, index-1)) and (right is None or right(word, index+length)):
+            return index+length,phoneme
+    # Rule not Found
+    _noRule(word, index)
+    return index+1,''
+
+def _findRuleProfiled( word, index, trie ):
+    # As findRuleTrie, telling the profiler about every rule tried
+    profiler = ruleProfiler
+    letter = word[index] if word[index] in Rules else 'punctuation'
+    node = trie
+    children = node[1]
+    position = index
+    while children and position < len(word):
+        child = children.get(word[position])
+        if child is None:
+            break
+        node = child
+        children = node[1]
+        position = position+1
+    for n, length, left, right, phoneme in node[0]:
+        start = profiler.timer()
+        matched = (left is None or left(word, index-1)) and (right is None or right(word, index+length))
+        profiler.tried(letter, n, matched, profiler.timer() - start)
+        if matched:
+            return index+length,phoneme
+    # Rule not Found
+    profiler.notFound(letter)
+    _noRule(word, index)
+    return index+1,''
+
 def findRule( word, index, rules ):
     # Find the matching rule for the character in the word
     # index is the position of the character to check
@@ -133,7 +529,7 @@ def findRule( word, index, rules ):
             if lrMatch(leftRule, leftWord) and lrMatch(rightRule, rightWord,right=True):
                 return remainder,rule[outPart]
     # Rule not Found        
-    print("Error: Can't find rule for '{}' in '{}'".format(word[index],word))
+    _noRule(word, index)
     return index+1,''
             
 def lrMatch( pattern, context, right=False ):
@@ -220,6 +616,11 @@ NRLIPAtoSPO256 = { 'AA':'AA', 'AE':'AE', 'AH':'AX AX', 'AO':'AO', 'AW':'AW',  'A
                    'SH':'SH', 't':'TT1', 'TH':'TH',  'UH':'UH',  'UW':'UW2','v':'VV',
                    'w':'WW', 'WH':'WH', 'y':'YY1', 'z':'ZZ', 'ZH':'ZH', 'PAUSE':'PA4' };
 
+def ruleCodes( phonemes ):
+    # SP0256 allophone codes for a string of IPA phonemes from a rule, as a tuple
+    codes = allophones.allophoneCodes
+    return tuple(codes[a] for phoneme in phonemes.split() for a in NRLIPAtoSPO256.get(phoneme, '').split())
+
 def IPAtoSP0256( phonemes ):
     # convert a list of IPA phonemes into SP0256 phonemes
     sp0256 = []
@@ -229,37 +630,369 @@ def IPAtoSP0256( phonemes ):
     return sp0256
 
 
+def compilePhrases( words, phrases, table ):
+    # Index the vocabulary and phrases in a trie of lower case words
+    # A node is (sequence number of the phrase ending there in table, a
+    # packedTables.speechTable, or None, child nodes by next word or None)
+    # Words in the vocabulary are phrases one word long
+    root = [None, {}]
+    for phrase, allophones in list(words.items()) + list(phrases.items()):
+        node = root
+        for word in phrase.split():
+            node = node[1].setdefault(word, [None, {}])
+        node[0] = table.add(allophones)
+    return _freezePhrases(root)
+
+def _freezePhrases( node ):
+    # Nodes as tuples, and None for no children - most words end a phrase
+    # and go no further, and an empty dictionary for each is most of the trie
+    children = dict((word, _freezePhrases(child)) for word, child in node[1].items())
+    return (node[0], children or None)
+
+def setPhrases( phrases ):
+    # Use a different set of phrases - in the same form as vocabulary.phrases
+    global PhraseTrie
+    PhraseTrie = compilePhrases(vocabulary, phrases, Speech)
+
+def matchPhrase( text, index ):
+    # Find the longest phrase starting at text[index] in a list of words
+    # Returns its allophones and the index of the word after it, or None and
+    # index if there isn't one
+    found, end = _matchPhrase(text, index)
+    if found is None:
+        return None, index
+    return Speech.speech(found), end
+
+def _matchPhrase( text, index ):
+    # As matchPhrase, returning the phrase's sequence number in Speech
+    found = None
+    end = index
+    node = PhraseTrie
+    for n in range(index, len(text)):
+        children = node[1]
+        if children is None:
+            break
+        node = children.get(text[n].lower())
+        if node is None:
+            break
+        if node[0] is not None:
+            found = node[0]
+            end = n+1
+    return found, end
+
+class _sourceName():
+    # Stands in for a function, or a shared rule, in a table written out with repr
+    def __init__(self, name):
+        self.name = name
+    def __repr__(self):
+        return self.name
+
+def cacheSource():
+    # Python source for the rule table cache - see ruleCache.py
+    # Returns the source for the vocabulary, with the allophones of the words
+    # and phrases in one speechTable, and for the compiled rules with the IPA to
+    # SP0256 mapping and the phrase trie
+    import vocabulary as words
+    from en_US_rules import Rules as rules
+    names = sorted(name for name in vars(words) if not name.startswith('_'))
+    speech = packedTables.speechTable()
+    phrases = compilePhrases(words.vocabulary, words.phrases, speech)
+    vocabularySource = ['from array import array',
+                        'from packedTables import speechTable',
+                        'vocabularyNames = {!r}'.format(names),
+                        'Speech = {}'.format(speech.source())]
+    vocabularySource.extend('{} = {!r}'.format(name, getattr(words, name)) for name in names)
+    contexts, rulesSource = _contextsSource(rules)
+    matchers = dict((key, _sourceName(name) if name else None) for key, name in contexts.items())
+    rulesSource = ['from array import array'] + \
+                  ['{} = {!r}'.format(name, letters) for name, letters in sorted(_classes.items())] + rulesSource
+    rulesSource.append('Rules = {!r}'.format(rules))
+    for name, output, listName in (('RuleTries', None, '_rules'), ('CodeTries', ruleCodes, '_codeRules')):
+        tries, listSource = _sharedRulesSource(compileRules(rules, matchers=matchers, output=output), listName)
+        rulesSource.append(listSource)
+        rulesSource.append('{} = {!r}'.format(name, tries))
+    rulesSource.append('RulesFingerprint = {!r}'.format(rulesFingerprint(rules)))
+    rulesSource.append('NRLIPAtoSPO256 = {!r}'.format(NRLIPAtoSPO256))
+    rulesSource.append('PhraseTrie = {!r}'.format(phrases))
+    return '\n'.join(vocabularySource) + '\n', '\n'.join(rulesSource) + '\n'
+
+def buildRuleCache( path=ruleCache.defaultCache ):
+    # Write the rule table cache for the rules from en_US_rules
+    # Returns False if it can't be written
+    vocabularySource, rulesSource = cacheSource()
+    return ruleCache.save(vocabularySource, rulesSource, path)
+
+# Load the rules and vocabulary from the cache, or compile them and save the
+# cache for next time - in the user's cache directory, see ruleCache.py
+_tables = ruleCache.load()
+if _tables is None:
+    _source = cacheSource()
+    ruleCache.save(*_source)
+    _tables = ruleCache.run(*_source)
+    del _source
+for _name in ['Rules', 'RuleTries', 'CodeTries', 'RulesFingerprint', 'NRLIPAtoSPO256', 'Speech', 'PhraseTrie'] + _tables['vocabularyNames']:
+    globals()[_name] = _tables[_name]
+del _name, _tables
+
+# Allophone codes for each IPA phoneme
+PhonemeCodes = dict((phoneme, ruleCodes(phoneme)) for phoneme in NRLIPAtoSPO256)
+
+
+# Compiled pronunciation lexicon checked before the rules - see useLexicon
+lexicon = None
+
+def useLexicon( path ):
+    # Look words up in a compiled lexicon file before using the rules
+    # See lexicon.py for making one. None stops using a lexicon
+    global lexicon
+    if path is None:
+        lexicon = None
+    else:
+        from lexicon import pronunciationLexicon
+        lexicon = pronunciationLexicon(path)
+    return lexicon
+
+@cpuProfile.profiled('translate', cpuProfile.label)
+def textToAllophones( text ):
+    # Translate a list of words into a string of SP0256 allophones
+    # The longest phrase or vocabulary word that matches uses its allophones,
+    # then words in the lexicon if there is one, and others are translated with
+    # the rules. Each is followed by a PA4
+    parts = []
+    index = 0
+    while index < len(text):
+        allophones, index = matchPhrase(text, index)
+        if allophones is None:
+            word = text[index]
+            index = index+1
+            allophones = lexicon.lookup(word) if lexicon is not None else None
+            if allophones is None:
+                allophones = ' '.join(IPAtoSP0256( translateWord(word.upper()) ) )
+        parts.append(allophones)
+    return ''.join(' ' + allophones + ' PA4' for allophones in parts)
+
+@cpuProfile.profiled('translate', cpuProfile.label)
+def textToCodes( text, out=None ):
+    # As textToAllophones, text a list of words, but giving SP0256 allophone
+    # codes appended to out, an array('B') - a new one if out is None - ready
+    # for retroSpeak.speakCodes
+    if out is None:
+        out = array.array('B')
+    pause = allophones.allophoneCodes['PA4']
+    codes = Speech.codes
+    offsets = Speech.offsets
+    index = 0
+    while index < len(text):
+        found, end = _matchPhrase(text, index)
+        if found is not None:
+            out.extend(codes[offsets[found]:offsets[found+1]])
+        else:
+            word = text[index]
+            end = index+1
+            found = lexicon.lookupCodes(word) if lexicon is not None else None
+            if found is not None:
+                out.extend(found)
+            else:
+                translateWordCodes(word.upper(), out)
+        out.append(pause)
+        index = end
+    return out
+
+def _translateLine( line ):
+    return textToAllophones(line.split())
+
+def translateMany( texts, processes=None, chunksize=64 ):
+    # Translate many texts, each a string of words, spread over a pool of
+    # processes - one for each CPU unless processes is given
+    # Returns an iterator of allophone strings in the same order as the texts
+    if processes == 1:
+        return (_translateLine(text) for text in texts)
+    # Only imported here - it is slow to import, and most users never need it
+    import multiprocessing
+    pool = multiprocessing.Pool(processes)
+    return _poolResults(pool, pool.imap(_translateLine, texts, chunksize))
+
+def _poolResults( pool, results ):
+    # Pass on the results, then tidy up the pool
+    try:
+        for result in results:
+            yield result
+    finally:
+        pool.terminate()
+
+def translateBatch( source, output, binary=False, processes=None ):
+    # Translate each line of a file into a line of output
+    # Output is JSON Lines - {"text":..., "allophones":...} - or binary, where
+    # each line is a little-endian uint16 count of allophones followed by the
+    # allophone codes, one byte each
+    # Returns (lines, words, seconds taken)
+    start = time.time()
+    counts = [0, 0]
+    def lines():
+        for line in source:
+            line = line.rstrip('\r\n')
+            counts[0] += 1
+            counts[1] += len(line.split())
+            yield line
+    texts = deque()
+    def remember(iterable):
+        # Keep the text until its translation comes back, for JSON output
+        for text in iterable:
+            texts.append(text)
+            yield text
+    for allophoneString in translateMany(remember(lines()), processes):
+        text = texts.popleft()
+        if binary:
+            codes = allophones.encode(allophoneString)
+            output.write(struct.pack('<H', len(codes)) + codes.tostring())
+        else:
+            # Lines that aren't UTF-8 - latin-1, say - keep what can be read
+            output.write(json.dumps({'text':text.decode('utf-8', 'replace'), 'allophones':allophoneString.strip()}) + '\n')
+    return counts[0], counts[1], time.time() - start
+
+def readWords( source, size=4096 ):
+    # Generator of the words in a file, read a piece at a time
+    # Reads whatever is available rather than waiting for a whole buffer, so
+    # words typed or piped in come out straight away
+    fd = source.fileno()
+    partial = ''
+    while True:
+        data = os.read(fd, size)
+        if not data:
+            break
+        text = partial + data
+        words = text.split()
+        partial = ''
+        if words and not text[-1].isspace():
+            # Last word might carry on in the next piece
+            partial = words.pop()
+        for word in words:
+            yield word
+    if partial:
+        yield partial
+
+def readSentences( words, maxWords=40 ):
+    # Generator of lists of words, each a sentence
+    # Sentences end with a word ending in . ! or ?, or after maxWords words
+    sentence = []
+    for word in words:
+        sentence.append(word)
+        if word[-1] in '.!?' or len(sentence) >= maxWords:
+            yield sentence
+            sentence = []
+    if sentence:
+        yield sentence
+
+def speakStream( source, speak, lookahead=4 ):
+    # Translate a file as it is read, and pass the allophones for each sentence
+    # to speak - for example the speak method of a retroSpeak instance - while
+    # later sentences are still being read and translated
+    # Whole sentences are translated, so phrases are found as they are in the
+    # text given to textToAllophones. Translation runs at most lookahead
+    # sentences ahead of speak
+    translated = Queue.Queue(lookahead)
+    def translator():
+        try:
+            for sentence in readSentences(readWords(source)):
+                translated.put(textToAllophones(sentence))
+        finally:
+            translated.put(None)
+    thread = threading.Thread(target=translator, args=())
+    thread.daemon = True
+    thread.start()
+    while True:
+        allophoneString = translated.get()
+        if allophoneString is None:
+            break
+        speak(allophoneString)
+
+
 def clockSpeed(freq):
     freq = float(freq)
     if freq < 1.0 or freq > 5.1:
         raise argparse.ArgumentTypeError("%r not in range [1.0, 5.1]"%(freq,))
     return freq
 
-parser = argparse.ArgumentParser(description='Simple Text to Speech')
-parser.add_argument('-c','--clock', action="store", default='3.12', dest='mhz', type=clockSpeed, help='Clock speed in MHz - range 1.0 to 5.1')
-parser.add_argument('-b','--board', action="store", default=0, dest='board', type=int, choices=range(0,4), help='Select retroSpeak device 0-3 - default is 0')
-parser.add_argument('-v','--verbose', action="store_const", const=True, default=False, dest='verbose', help='Print allophones')
-parser.add_argument('-s','--silent', action="store_const", const=True, default=False, dest='silent', help='Do not speak. Print allophones.')
+def openBoard(mhz, board):
+    # A retroSpeak instance for the board - the driver is only imported here
+    import retroSpeak
+    return retroSpeak.retroSpeak(clock=mhz,device=board)
 
-parser.add_argument('text', metavar='text', nargs=argparse.REMAINDER, help='Text to speak')
+def main(argv=None):
+    # The retroTTS command - argv as sys.argv[1:], which it is if None
+    import retroSpeakDaemon
+    parser = argparse.ArgumentParser(description='Simple Text to Speech')
+    parser.add_argument('-c','--clock', action="store", default='3.12', dest='mhz', type=clockSpeed, help='Clock speed in MHz - range 1.0 to 5.1')
+    parser.add_argument('-b','--board', action="store", default=0, dest='board', type=int, choices=range(0,4), help='Select retroSpeak device 0-3 - default is 0')
+    parser.add_argument('-v','--verbose', action="store_const", const=True, default=False, dest='verbose', help='Print allophones')
+    parser.add_argument('-s','--silent', action="store_const", const=True, default=False, dest='silent', help='Do not speak. Print allophones.')
+    parser.add_argument('-l','--lexicon', action="store", default=None, dest='lexicon', metavar='FILE', help='Look words up in a compiled lexicon before using the rules')
+    parser.add_argument('--daemon', action="store", nargs='?', const=retroSpeakDaemon.defaultSocket, default=None, dest='daemon', metavar='SOCKET', help='Speak through a running retroSpeakDaemon instead of opening the board')
+    parser.add_argument('--batch', action="store", default=None, dest='batch', metavar='INPUT', help='Translate each line of INPUT (- for stdin) instead of speaking')
+    parser.add_argument('--output', action="store", default='-', dest='output', metavar='OUTPUT', help='File for --batch results - default is stdout')
+    parser.add_argument('--binary', action="store_const", const=True, default=False, dest='binary', help='Write --batch results as allophone codes instead of JSON Lines')
+    parser.add_argument('--stream', action="store", nargs='?', const='-', default=None, dest='stream', metavar='FILE', help='Speak FILE, or stdin, while it is still being read and translated')
+    parser.add_argument('-j','--jobs', action="store", default=None, dest='jobs', type=int, help='Processes for --batch - default is one for each CPU')
 
-args = parser.parse_args()
+    parser.add_argument('text', metavar='text', nargs=argparse.REMAINDER, help='Text to speak')
 
-phonemes = ''
-for word in args.text:
-    if word.lower() in vocabulary:
-        phonemes = phonemes + ' ' + vocabulary[word.lower()]
-    else:
-        phonemes = phonemes + ' ' + ' '.join(IPAtoSP0256( translateWord(word.upper()) ) )
-    phonemes = phonemes + ' PA4'
+    args = parser.parse_args(argv)
 
-if args.verbose or args.silent:
-    print phonemes
-
-if not(args.silent):
-    # Initialise retroSpeak board
-    speech = retroSpeak.retroSpeak(clock=args.mhz,device=args.board)
-    speech.speakAndWait(phonemes)
+    if args.batch:
+        if args.lexicon:
+            useLexicon(args.lexicon)
+        source = sys.stdin if args.batch == '-' else open(args.batch)
+        output = sys.stdout if args.output == '-' else open(args.output, 'wb' if args.binary else 'w')
+        lines, words, seconds = translateBatch(source, output, args.binary, args.jobs)
+        # Only close the files opened here - main() can be called again
+        if source is not sys.stdin:
+            source.close()
+        if output is sys.stdout:
+            output.flush()
+        else:
+            output.close()
+        sys.stderr.write("{} lines, {} words in {:.2f}s - {:.0f} words/s\n".format(lines, words, seconds, words / max(seconds, 1e-9)))
+    elif args.stream:
+        if args.lexicon:
+            useLexicon(args.lexicon)
+        source = sys.stdin if args.stream == '-' else open(args.stream)
+        if args.silent:
+            def speak(allophoneString):
+                sys.stdout.write(allophoneString)
+                sys.stdout.flush()
+        elif args.daemon:
+            client = retroSpeakDaemon.retroSpeakClient(args.daemon)
+            speak = lambda allophoneString: client.speak(allophoneString, board=args.board, clock=args.mhz)
+        else:
+            speech = openBoard(args.mhz, args.board)
+            speak = speech.speak
+        speakStream(source, speak)
+        if source is not sys.stdin:
+            source.close()
+        if args.silent:
+            print
+        elif args.daemon:
+            client.wait(board=args.board)
+        else:
+            speech.wait()
+    elif args.daemon and not(args.silent):
+        # The daemon owns the board and translates the text itself
+        client = retroSpeakDaemon.retroSpeakClient(args.daemon)
+        reply = client.speakText(' '.join(args.text), board=args.board, clock=args.mhz, wait=True)
+        if args.verbose:
+            print reply['allophones']
+    else:
+        if args.lexicon:
+            useLexicon(args.lexicon)
+        if args.verbose or args.silent:
+            print textToAllophones(args.text)
 
+        if not(args.silent):
+            # Initialise retroSpeak board
+            speech = openBoard(args.mhz, args.board)
+            speech.speakCodes(textToCodes(args.text))
+            speech.wait()
 
 
+if __name__ == '__main__':
+    main()
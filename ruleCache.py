@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak rule table cache
+# Saves the compiled text to speech tables so they can be loaded without
+# compiling anything - the rule tries and their context matchers, the IPA to
+# SP0256 mapping and the vocabulary.
+#
+#   usage: ruleCache.py [-h] [-f] [CACHE]
+#
+# builds the cache. retroTTS.py builds it the first time it is imported
+# anyway, so this is only needed to build it ahead of time, or somewhere
+# other than the default.
+#
+# The cache is a Python module, generated by retroTTS.cacheSource, compiled
+# to code objects and saved with marshal. Loading it is one read of the file,
+# then running the code objects, which build the tables directly.
+#
+# It is keyed by a hash of the files the tables are made from - retroTTS.py,
+# en_US_rules.py and vocabulary.py, and allophones.py and packedTables.py,
+# whose codes and speechTable the cache holds - so changing any of them means
+# the cache is built again.
+#
+# File layout - all numbers little-endian:
+#   0   4 bytes   magic 'RSRC'
+#   4   uint32    version
+#   8   4 bytes   Python's marshal magic - imp.get_magic()
+#   12  20 bytes  SHA1 of the source files
+#   32  uint32    length of the vocabulary section, n
+#   36  n bytes   vocabulary code object
+#   36+n          rules code object
+#
+# The default cache is retroTTS.cache in the user's cache directory -
+# $XDG_CACHE_HOME/retroSpeak, or ~/.cache/retroSpeak - so nothing is written
+# next to the source, which may be read only. The RETROSPEAK_RULE_CACHE
+# environment variable names another file. Set it empty to not use a cache
+# at all.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import imp
+import struct
+import marshal
+import hashlib
+
+defaultCache = os.environ.get('RETROSPEAK_RULE_CACHE',
+    os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                 'retroSpeak', 'retroTTS.cache'))
+
+# Source files the cache is made from
+sources = ('retroTTS', 'en_US_rules', 'vocabulary', 'allophones', 'packedTables')
+
+_magic = b'RSRC'
+_version = 1
+_header = struct.Struct('<4sI4s20sI')
+
+def sourceHash():
+    # SHA1 of the source files, or None if they can't all be found
+    digest = hashlib.sha1()
+    for name in sources:
+        try:
+            f, path, description = imp.find_module(name)
+        except ImportError:
+            return None
+        if f is None:
+            return None
+        with f:
+            if description[2] != imp.PY_SOURCE:
+                return None
+            digest.update(f.read())
+    return digest.digest()
+
+def save(vocabularySource, rulesSource, path=defaultCache):
+    # Compile and write the cache, replacing any old one in one step
+    # Returns False if it can't be written
+    if not path:
+        return False
+    digest = sourceHash()
+    if digest is None:
+        return False
+    vocabulary = marshal.dumps(compile(vocabularySource, '<retroSpeak vocabulary>', 'exec'))
+    rules = marshal.dumps(compile(rulesSource, '<retroSpeak rules>', 'exec'))
+    temporary = '{}.{}'.format(path, os.getpid())
+    try:
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(temporary, 'wb') as f:
+            f.write(_header.pack(_magic, _version, imp.get_magic(), digest, len(vocabulary)))
+            f.write(vocabulary)
+            f.write(rules)
+        os.rename(temporary, path)
+    except (IOError, OSError):
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        return False
+    return True
+
+def run(vocabularySource, rulesSource):
+    # Compile and run the cache source without saving it, returning a
+    # dictionary of the names it defines as load does
+    namespace = {}
+    exec(compile(vocabularySource, '<retroSpeak vocabulary>', 'exec'), namespace)
+    exec(compile(rulesSource, '<retroSpeak rules>', 'exec'), namespace)
+    return namespace
+
+def load(path=defaultCache, rules=True):
+    # Load the cache, returning a dictionary of the names it defines
+    # Without rules only the vocabulary is loaded
+    # Returns None if there isn't a cache, or it is out of date
+    if not path:
+        return None
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except IOError:
+        return None
+    if len(data) < _header.size:
+        return None
+    magic, version, pythonMagic, digest, length = _header.unpack_from(data)
+    if magic != _magic or version != _version or pythonMagic != imp.get_magic() or digest != sourceHash():
+        return None
+    namespace = {}
+    start = _header.size
+    exec(marshal.loads(data[start:start+length]), namespace)
+    if rules:
+        exec(marshal.loads(data[start+length:]), namespace)
+    return namespace
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Build the retroSpeak rule table cache')
+    parser.add_argument('-f','--force', action="store_const", const=True, default=False, dest='force', help='Build the cache even if it is up to date')
+    parser.add_argument('cache', nargs='?', default=defaultCache, help='Cache file - default is {}'.format(defaultCache))
+    args = parser.parse_args()
+
+    if not args.force and load(args.cache) is not None:
+        print("{} is up to date".format(args.cache))
+    else:
+        os.environ['RETROSPEAK_RULE_CACHE'] = ''
+        import retroTTS
+        if retroTTS.buildRuleCache(args.cache):
+            print("Built {}".format(args.cache))
+        else:
+            print("Can't write {}".format(args.cache))
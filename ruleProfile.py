@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak text to speech rule profiler
+# Finds which rules fire on a corpus of text, and reorders each letter's
+# rules so the ones that fire most are found sooner.
+#
+#   usage: ruleProfile.py report [-n TOP] CORPUS
+#          ruleProfile.py reorder CORPUS OUTPUT.py
+#
+# report translates every word in CORPUS with retroTTS and prints the letters
+# and rules that took the most work. For each rule it counts
+#   tried    - times its left and right patterns were checked
+#   fired    - times it matched and gave the phonemes
+#   time     - time spent checking its patterns
+# and for each letter the comparisons the original linear scan of the rules
+# would have made - a rule that fires costs one for itself and one for every
+# rule before it.
+#
+# reorder moves rules that fire more often ahead of rules that fire less
+# often, but only past rules that can't match the same text - so the new
+# table gives the same phonemes for every word, not just those in the corpus.
+# The corpus is translated again with the new table to check, and it is
+# written out as a Python module like en_US_rules.py, for retroTTS.setRules.
+#
+# Two rules for a letter can't match the same text if their match texts
+# differ before one of them ends, or if the first letters their left or right
+# patterns can match have nothing in common. Where one match text is a prefix
+# of the other, the longer one's next letter has to be one the shorter one's
+# right pattern can't start with.
+#
+# Profiling from code:
+#   profiler = ruleProfile.ruleProfiler()
+#   retroTTS.setRuleProfiler(profiler)
+#   ... translate ...
+#   retroTTS.setRuleProfiler(None)
+#   profiler.report()
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import sys
+import time
+
+import retroTTS
+
+class ruleProfiler():
+    # Counts for each rule tried by retroTTS.translateWord
+
+    timer = time.time
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # Counts by letter, each a dictionary of rule number to [tried, fired, time]
+        self.rules = {}
+        # Linear scan comparisons by letter
+        self.comparisons = {}
+        self.missing = {}
+
+    def tried(self, letter, n, matched, elapsed):
+        counts = self.rules.setdefault(letter, {}).setdefault(n, [0, 0, 0.0])
+        counts[0] += 1
+        counts[2] += elapsed
+        if matched:
+            counts[1] += 1
+            self.comparisons[letter] = self.comparisons.get(letter, 0) + n+1
+
+    def notFound(self, letter):
+        self.missing[letter] = self.missing.get(letter, 0) + 1
+
+    def fired(self, letter):
+        # Times each of a letter's rules fired, by rule number
+        return dict((n, counts[1]) for n, counts in self.rules.get(letter, {}).items())
+
+    def totals(self):
+        # (candidates tried, linear comparisons, time) over all letters
+        tried = sum(counts[0] for rules in self.rules.values() for counts in rules.values())
+        elapsed = sum(counts[2] for rules in self.rules.values() for counts in rules.values())
+        return tried, sum(self.comparisons.values()), elapsed
+
+    def report(self, rules=None, top=10, out=sys.stdout):
+        # Print the hottest letters and rules
+        # rules is the table profiled, for showing the rules themselves
+        rules = rules if rules is not None else retroTTS.Rules
+        tried, comparisons, elapsed = self.totals()
+        out.write("{} candidates tried, {} linear comparisons, {:.3f}s checking patterns\n".format(tried, comparisons, elapsed))
+        out.write("\nLetter       tried   fired  compared  per fire     ms\n")
+        letters = sorted(self.rules, key=lambda l: -self.comparisons.get(l, 0))
+        for letter in letters[:top]:
+            counts = self.rules[letter].values()
+            fired = sum(c[1] for c in counts)
+            out.write("{:11} {:7} {:7} {:9} {:9.1f} {:6.1f}\n".format(letter,
+                sum(c[0] for c in counts), fired, self.comparisons.get(letter, 0),
+                self.comparisons.get(letter, 0) / float(max(fired, 1)),
+                sum(c[2] for c in counts)*1000))
+        out.write("\nRule                                       tried   fired     ms\n")
+        hottest = sorted(((counts, letter, n) for letter in self.rules for n, counts in self.rules[letter].items()),
+                         key=lambda r: (-r[0][1], -r[0][0]))
+        for counts, letter, n in hottest[:top]:
+            left, match, right, phoneme = rules[letter][n]
+            out.write("{:11} {:3} {:28} {:7} {:7} {:6.1f}\n".format(letter, n,
+                "'{}' [{}] '{}'".format(left, match, right), counts[0], counts[1], counts[2]*1000))
+        for letter, count in sorted(self.missing.items()):
+            out.write("No rule for '{}' {} times\n".format(letter, count))
+
+def profile(words, rules=None):
+    # Profile translating a list of words, returning the profiler and the phonemes
+    if rules is not None:
+        retroTTS.setRules(rules)
+    profiler = ruleProfiler()
+    retroTTS.setRuleProfiler(profiler)
+    try:
+        phonemes = [retroTTS.translateWord(word) for word in words]
+    finally:
+        retroTTS.setRuleProfiler(None)
+    return profiler, phonemes
+
+def readCorpus(path):
+    # Words in a text file, upper case, split as retroTTS.textToAllophones does
+    words = []
+    for line in open(path):
+        words.extend(line.upper().split())
+    return words
+
+# First letters a pattern can match - None for any letter
+_vowels = frozenset('AEIOU')
+_consonants = frozenset('BCDFGHJKLMNPQRSTVWXYZ')
+_firstLetters = { '#':_vowels, '^':_consonants, '.':frozenset('BDVGJLMNRWZ'),
+                  '+':frozenset('EIY'), '%':frozenset('EI') }
+
+def firstLetters(pattern, right):
+    # The letters the first character a pattern checks can be
+    # A left pattern is checked backwards from its last character
+    if not right:
+        pattern = pattern[::-1]
+    letters = frozenset()
+    for p in pattern:
+        if p == ':':
+            # Zero or more consonants - or whatever comes after them
+            letters = letters | _consonants
+            continue
+        return letters | _firstLetters.get(p, frozenset(p))
+    return None
+
+def _disjoint(a, b):
+    return a is not None and b is not None and not (a & b)
+
+def canSwap(a, b):
+    # True if rules a and b for the same letter can never both match the same
+    # place in a word, so their order doesn't matter
+    leftA, matchA, rightA = a[0:3]
+    leftB, matchB, rightB = b[0:3]
+    if len(matchA) > len(matchB):
+        leftA, matchA, rightA, leftB, matchB, rightB = leftB, matchB, rightB, leftA, matchA, rightA
+    if not matchB.startswith(matchA):
+        return True
+    if _disjoint(firstLetters(leftA, False), firstLetters(leftB, False)):
+        return True
+    if len(matchA) == len(matchB):
+        return _disjoint(firstLetters(rightA, True), firstLetters(rightB, True))
+    # The longer match text goes on where the shorter one's right pattern starts
+    return _disjoint(firstLetters(rightA, True), frozenset(matchB[len(matchA)]))
+
+def reorder(rules, fired):
+    # Move each letter's rules ahead of rules that fire less often, as far as
+    # they can go without changing which rule fires for any word
+    # fired is a dictionary of letter to {rule number: times fired}
+    reordered = {}
+    for letter, letterRules in rules.items():
+        counts = fired.get(letter, {})
+        order = [(counts.get(n, 0), rule) for n, rule in enumerate(letterRules)]
+        moved = True
+        while moved:
+            moved = False
+            for n in range(1, len(order)):
+                if order[n][0] > order[n-1][0] and canSwap(order[n][1], order[n-1][1]):
+                    order[n-1], order[n] = order[n], order[n-1]
+                    moved = True
+        reordered[letter] = [rule for count, rule in order]
+    return reordered
+
+def writeRules(rules, path, source=''):
+    # Write a rule table as a Python module with a Rules dictionary
+    with open(path, 'w') as f:
+        f.write("#!/usr/bin/env python\n#\n# retroSpeak project\n#\n")
+        f.write("# English to Phoneme rules reordered by ruleProfile.py{}\n".format(
+            ' on ' + source if source else ''))
+        f.write("# Gives the same phonemes as the rules it was made from - see en_US_rules.py\n")
+        f.write("#\n# As this is based heavily on Public Domain work, this code is relased as public domain.\n#\n\n")
+        f.write("Rules = {\n")
+        letters = sorted(rules, key=lambda l: (l != 'punctuation', l))
+        for letter in letters:
+            f.write("    {!r}:[\n".format(letter))
+            f.write(',\n'.join("        ( {:16} {:16} {:16} {!r:8})".format(
+                repr(left)+',', repr(match)+',', repr(right)+',', phoneme)
+                for left, match, right, phoneme in rules[letter]))
+            f.write("\n        ]{}\n".format(',' if letter != letters[-1] else ' }'))
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Profile the text to speech rules')
+    commands = parser.add_subparsers(dest='command')
+    reporter = commands.add_parser('report', help='Report the hottest letters and rules')
+    reporter.add_argument('-n','--top', action="store", default=10, dest='top', type=int, help='Letters and rules to show')
+    reporter.add_argument('corpus', help='Text to translate')
+    reorderer = commands.add_parser('reorder', help='Write a reordered rule table')
+    reorderer.add_argument('corpus', help='Text to translate')
+    reorderer.add_argument('output', help='Python module to write')
+    args = parser.parse_args()
+
+    words = readCorpus(args.corpus)
+    original = retroTTS.Rules
+    profiler, phonemes = profile(words)
+    if args.command == 'report':
+        profiler.report(top=args.top)
+    else:
+        rules = reorder(original, dict((letter, profiler.fired(letter)) for letter in profiler.rules))
+        after, checked = profile(words, rules)
+        retroTTS.setRules(original)
+        if checked != phonemes:
+            print("Reordered rules give different phonemes - not written")
+            sys.exit(1)
+        moved = sum(1 for letter in rules for n, rule in enumerate(rules[letter]) if original[letter][n] != rule)
+        writeRules(rules, args.output, args.corpus)
+        before = profiler.totals()
+        now = after.totals()
+        print("{} words, {} rules moved".format(len(words), moved))
+        print("candidates tried    {:9} -> {:9}".format(before[0], now[0]))
+        print("linear comparisons  {:9} -> {:9}".format(before[1], now[1]))
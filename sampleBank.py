@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak sample bank
+# Speech made by joining recordings of each allophone from a real board - much
+# cheaper than synthesizing it, for machines without a board.
+#
+#   usage: sampleBank.py build [-c MHZ ...] [--synth] CAPTURES OUTPUT
+#          sampleBank.py render [-c MHZ] [--text] [-o WAV] BANK WORDS ...
+#
+# build makes a bank from captures - a directory for each clock speed, named
+# by the speed in kHz, each with a WAV file for each allophone, named by the
+# allophone:
+#   CAPTURES/3120/AA.wav  CAPTURES/3120/AE.wav  ...  CAPTURES/4000/ZZ.wav
+# mono, 16 bit, recorded from the start of the allophone to SBY going high.
+# With --synth the allophones are rendered by formantSynth.py instead, for
+# trying the bank out without a board - CAPTURES is then ignored. They won't
+# sound like the chip.
+#
+# render speaks allophones, or English with --text, into a WAV file or to
+# stdout (-o -), at one of the clock speeds in the bank.
+#
+# The bank is memory mapped and each allophone is a slice of it, so an
+# utterance is written a recording at a time, straight from the bank, without
+# copying it or holding it all in memory. Pauses - PA1 to PA5 and pauses in
+# utterance bundles - aren't recorded. They are written as silence of the
+# datasheet length at the clock speed.
+#
+# A renderer can also keep the last utterances it made, joined up, so ones
+# said again are written in one go - see sampleRenderer.
+#
+# File layout - all numbers little-endian:
+#   0   4 bytes  magic 'RSSB'
+#   4   uint32   version
+#   8   uint32   number of clock speeds, k
+#   12  k x      clock speed in kHz, sample rate in Hz, offset of its index
+#                - uint32 each
+# Each index is 64 entries, one for each allophone address code, of
+#   uint32   offset of the samples
+#   uint32   number of samples
+# Samples are signed 16 bit.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import mmap
+import wave
+import struct
+import threading
+from collections import OrderedDict
+
+import allophones
+
+_magic = b'RSSB'
+_version = 1
+_header = struct.Struct('<4sII')
+_clock = struct.Struct('<III')
+_entry = struct.Struct('<II')
+_allophoneCount = 64
+
+_pauses = frozenset(['PA1', 'PA2', 'PA3', 'PA4', 'PA5'])
+
+try:
+    _view = buffer
+except NameError:
+    _view = lambda data, offset, size: memoryview(data)[offset:offset+size]
+
+def _kHz(mhz):
+    return int(round(mhz * 1000))
+
+def readCapture(path):
+    # Samples of a capture as 16 bit little-endian bytes, and the sample rate
+    w = wave.open(path, 'rb')
+    if w.getnchannels() != 1 or w.getsampwidth() != 2:
+        raise ValueError("{} isn't mono 16 bit".format(path))
+    frames = w.readframes(w.getnframes())
+    rate = w.getframerate()
+    w.close()
+    return frames, rate
+
+def readCaptures(directory, clocks=None):
+    # {clock kHz: (sample rate, {allophone: samples})} from a capture directory
+    captures = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.isdigit() or (clocks is not None and int(name) not in clocks):
+            continue
+        recordings = {}
+        rates = set()
+        for allophone in allophones.allophoneNames:
+            if allophone in _pauses:
+                continue
+            samples, rate = readCapture(os.path.join(directory, name, allophone + '.wav'))
+            recordings[allophone] = samples
+            rates.add(rate)
+        if len(rates) != 1:
+            raise ValueError("Captures at {}kHz have different sample rates".format(name))
+        captures[int(name)] = (rates.pop(), recordings)
+    return captures
+
+def synthesizedCaptures(clocks):
+    # Captures rendered by the formant synthesizer, as from readCaptures
+    import formantSynth
+    recordings = dict((allophone, formantSynth.render(allophones.encode(allophone)))
+                      for allophone in allophones.allophoneNames if allophone not in _pauses)
+    return dict((clock, (int(round(formantSynth.sampleRate(clock / 1000.0))), recordings)) for clock in clocks)
+
+def buildBank(captures, path):
+    # Write a bank from captures as from readCaptures
+    clocks = sorted(captures)
+    if not clocks:
+        raise ValueError("No captures")
+    indexOffset = _header.size + _clock.size * len(clocks)
+    dataOffset = indexOffset + _entry.size * _allophoneCount * len(clocks)
+    table = bytearray()
+    indexes = bytearray()
+    data = bytearray()
+    for n, clock in enumerate(clocks):
+        rate, recordings = captures[clock]
+        table += _clock.pack(clock, rate, indexOffset + _entry.size * _allophoneCount * n)
+        for allophone in allophones.allophoneNames:
+            samples = recordings.get(allophone, b'')
+            indexes += _entry.pack(dataOffset + len(data), len(samples) // 2)
+            data += samples
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(_header.pack(_magic, _version, len(clocks)))
+        f.write(table)
+        f.write(indexes)
+        f.write(data)
+    os.rename(temporary, path)
+    return len(clocks)
+
+def wavHeader(samples, rate):
+    # Header of a mono 16 bit WAV file of a number of samples
+    size = samples * 2
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + size, b'WAVE', b'fmt ', 16,
+                       1, 1, rate, rate * 2, 2, 16, b'data', size)
+
+
+class sampleBank():
+    # A sample bank file, memory mapped
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = _header.unpack_from(self._map, 0)
+        if magic != _magic or version != _version:
+            raise ValueError("{} isn't a version {} sample bank".format(path, _version))
+        self._clocks = {}
+        for n in range(count):
+            clock, rate, index = _clock.unpack_from(self._map, _header.size + _clock.size * n)
+            entries = [_entry.unpack_from(self._map, index + _entry.size * code) for code in range(_allophoneCount)]
+            self._clocks[clock] = (rate, entries)
+        self._silence = {}
+
+    def clocks(self):
+        # Clock speeds in the bank, in MHz
+        return [clock / 1000.0 for clock in sorted(self._clocks)]
+
+    def sampleRate(self, clock=allophones.defaultClock):
+        return self._recordings(clock)[0]
+
+    def _recordings(self, clock):
+        recordings = self._clocks.get(_kHz(clock))
+        if recordings is None:
+            raise ValueError("No recordings at {}MHz - the bank has {}".format(clock, ', '.join(str(c) for c in self.clocks())))
+        return recordings
+
+    def _pause(self, seconds, rate):
+        # A view of seconds of silence
+        count = int(round(seconds * rate))
+        silence = self._silence.get(rate)
+        if silence is None or len(silence) < count * 2:
+            silence = self._silence[rate] = bytearray(max(count * 2, rate * 2))
+        return _view(silence, 0, count * 2)
+
+    def chunks(self, items, clock=allophones.defaultClock):
+        # Views of the bank for a list of allophone names, address codes, or
+        # ('pause', seconds) and ('clock', MHz) as in utterance bundles
+        # Returns (sample rate, list of views)
+        # A WAV file has one sample rate, so a clock change needs recordings
+        # at the same rate - as captures from one sound card are
+        rate, entries = self._recordings(clock)
+        views = []
+        for item in items:
+            if isinstance(item, tuple):
+                if item[0] == 'pause':
+                    views.append(self._pause(item[1], rate))
+                else:
+                    changed, entries = self._recordings(item[1])
+                    if changed != rate:
+                        raise ValueError("Recordings at {}MHz are at a different sample rate".format(item[1]))
+                    clock = item[1]
+                continue
+            name = item if not isinstance(item, int) else allophones.allophoneNames[item & 0x3F]
+            if name in _pauses:
+                views.append(self._pause(allophones.duration(name, clock), rate))
+            else:
+                offset, count = entries[allophones.allophoneCodes[name]]
+                views.append(_view(self._map, offset, count * 2))
+        return rate, views
+
+    def close(self):
+        self._map.close()
+
+
+class sampleRenderer():
+    # Renders utterances from a sample bank to WAV, remembering the last ones
+    # up to cacheSize bytes, by allophones and clock speed
+
+    def __init__(self, bank, cacheSize=1<<22):
+        self.bank = bank
+        self._cacheSize = cacheSize
+        self._cached = OrderedDict()
+        self._cachedSize = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, items, clock=allophones.defaultClock):
+        # (sample rate, list of chunks) for an utterance - codes, names or
+        # items as sampleBank.chunks takes
+        key = (tuple(items), _kHz(clock))
+        with self._lock:
+            cached = self._cached.pop(key, None)
+            if cached is not None:
+                self._cached[key] = cached
+                self.hits += 1
+                return cached[0], [cached[1]]
+            self.misses += 1
+        rate, views = self.bank.chunks(items, clock)
+        return rate, views
+
+    def remember(self, items, clock, rate, views):
+        # Keep an utterance joined up for next time, if it fits
+        size = sum(len(view) for view in views)
+        if size > self._cacheSize:
+            return
+        key = (tuple(items), _kHz(clock))
+        joined = b''.join(bytes(view) for view in views)
+        with self._lock:
+            if key in self._cached:
+                return
+            self._cached[key] = (rate, joined)
+            self._cachedSize += size
+            while self._cachedSize > self._cacheSize:
+                old, (oldRate, oldJoined) = self._cached.popitem(last=False)
+                self._cachedSize -= len(oldJoined)
+
+    def write(self, output, items, clock=allophones.defaultClock, cache=True):
+        # Write an utterance as a WAV file to a file object - a pipe will do,
+        # as the length is known before anything is written
+        # Returns the number of samples
+        rate, views = self.render(items, clock)
+        samples = sum(len(view) for view in views) // 2
+        output.write(wavHeader(samples, rate))
+        for view in views:
+            output.write(view)
+        if cache and len(views) > 1:
+            self.remember(items, clock, rate, views)
+        return samples
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Build and render from retroSpeak sample banks')
+    commands = parser.add_subparsers(dest='command')
+    builder = commands.add_parser('build', help='Build a bank from captures')
+    builder.add_argument('-c','--clock', action="append", default=None, dest='clocks', type=float, metavar='MHZ', help='Clock speed to include - default is all captured, or 3.12 with --synth')
+    builder.add_argument('--synth', action="store_const", const=True, default=False, dest='synth', help='Render the allophones with formantSynth.py instead of reading captures')
+    builder.add_argument('captures', help='Directory of captures')
+    builder.add_argument('output', help='Sample bank')
+    renderer = commands.add_parser('render', help='Render speech to a WAV file')
+    renderer.add_argument('-c','--clock', action="store", default=allophones.defaultClock, dest='mhz', type=float, help='Clock speed in MHz - one in the bank')
+    renderer.add_argument('--text', action="store_const", const=True, default=False, dest='text', help='Words are English text, not allophones')
+    renderer.add_argument('-o','--output', action="store", default='-', dest='output', metavar='WAV', help='WAV file - default is stdout')
+    renderer.add_argument('bank', help='Sample bank')
+    renderer.add_argument('words', nargs='+', help='Allophones, or text with --text')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        clocks = set(_kHz(clock) for clock in args.clocks) if args.clocks else None
+        if args.synth:
+            captures = synthesizedCaptures(clocks or [_kHz(allophones.defaultClock)])
+        else:
+            captures = readCaptures(args.captures, clocks)
+        count = buildBank(captures, args.output)
+        print("{} clock speeds in {}".format(count, args.output))
+    else:
+        bank = sampleBank(args.bank)
+        if args.text:
+            import retroTTS
+            codes = retroTTS.textToCodes(args.words)
+        else:
+            codes = allophones.encode(' '.join(args.words))
+        output = getattr(sys.stdout, 'buffer', sys.stdout) if args.output == '-' else open(args.output, 'wb')
+        sampleRenderer(bank).write(output, list(codes), args.mhz)
+        output.close()
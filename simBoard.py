@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak simulated board
+# A stand-in for wiringpi2 that simulates retroSpeak boards, so the real
+# retroSpeak driver code can be run and measured without the hardware.
+#
+# Set the environment variable RETROSPEAK_SIMULATE=1 before importing
+# retroSpeak and it will use this module instead of wiringpi2.
+#
+# Up to 4 boards can be simulated - one for each mcp23s17Setup call.
+# Each board has the pins laid out as on the PCB: A1-A6 on pins 0-5 of the
+# MCP23S17, ALD on 6, SBY on 7, RESET on 8, and the LTC6903 chip enable on 9.
+#
+# A low pulse on ALD starts the allophone on the address lines, and SBY then
+# reads low for the datasheet duration of that allophone at the clock set in
+# the simulated LTC6903. setTimeScale(0) makes every allophone finish straight
+# away, for measuring the driver rather than the chip.
+#
+# Every MCP23S17 pin read or write, and every LTC6903 write, counts as one
+# SPI transaction. setSpiDelay() makes each one take that long, like a real
+# SPI bus would.
+#
+# events() returns a log of (time, device, allophone code, time SBY goes high)
+# for every allophone started.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import time
+import threading
+
+import allophones
+
+class GPIO():
+    INPUT = 0
+    OUTPUT = 1
+
+# Pin offsets on the MCP23S17
+_ADDR = 0
+_ALD = 6
+_SBY = 7
+_RESET = 8
+_CLKCS = 9
+
+# Time each allophone takes as a multiple of the datasheet duration
+_timeScale = 1.0
+# Time each SPI transaction takes in seconds
+_spiDelay = 0.0
+
+_lock = threading.RLock()
+_started = time.time()
+_boards = []
+_events = []
+_spiCount = 0
+
+class _Board():
+    # State of one simulated retroSpeak board
+    def __init__(self, base, device):
+        self.base = base
+        self.device = device
+        self.pins = [0] * 16
+        self.pins[_ALD] = 1
+        self.clock = allophones.defaultClock
+        self.busyUntil = 0.0
+        self.spiCount = 0
+        self.overruns = 0
+
+def _spi(board=None):
+    # Count a SPI transaction, and take as long as one would
+    global _spiCount
+    _spiCount += 1
+    if board is not None:
+        board.spiCount += 1
+    if _spiDelay > 0:
+        # Sleep isn't accurate enough for microseconds
+        end = time.time() + _spiDelay
+        while time.time() < end:
+            pass
+
+def _board(pin):
+    for board in _boards:
+        if board.base <= pin < board.base + 16:
+            return board
+    raise ValueError("Pin {} isn't on a simulated board".format(pin))
+
+# wiringpi2 functions used by retroSpeak
+
+def wiringPiSetupSys():
+    pass
+
+def wiringPiSPISetup(channel, speed):
+    return channel
+
+def mcp23s17Setup(base, channel, device):
+    with _lock:
+        _boards.append(_Board(base, device))
+
+def pinMode(pin, mode):
+    pass
+
+def digitalWrite(pin, value):
+    value = 1 if value else 0
+    with _lock:
+        board = _board(pin)
+        _spi(board)
+        offset = pin - board.base
+        previous = board.pins[offset]
+        board.pins[offset] = value
+        now = time.time()
+        if offset == _RESET and not value:
+            # Reset stops the chip
+            board.busyUntil = 0.0
+        elif offset == _ALD and previous and not value and board.pins[_RESET]:
+            # Falling edge on ALD loads the address and starts speaking
+            if now < board.busyUntil:
+                board.overruns += 1
+            code = 0
+            for b in range(0,6):
+                code |= board.pins[_ADDR+b] << b
+            board.busyUntil = now + allophones.duration(allophones.allophoneNames[code], board.clock) * _timeScale
+            _events.append((now, board.device, code, board.busyUntil))
+
+def digitalRead(pin):
+    with _lock:
+        board = _board(pin)
+        _spi(board)
+        if pin - board.base == _SBY:
+            return 1 if time.time() >= board.busyUntil else 0
+        return board.pins[pin - board.base]
+
+def millis():
+    return int((time.time() - _started) * 1000)
+
+def wiringPiSPIDataRW(channel, data):
+    # Program the LTC6903 of every board with its chip enable low
+    code = bytearray(data)
+    buf = (code[0] << 8) | code[1]
+    octave = buf >> 12
+    dac = (buf >> 2) & 1023
+    clock = (2 ** octave) * 2078 / (2 - dac / 1024.0) / 1000000.0
+    with _lock:
+        _spi()
+        now = time.time()
+        for board in _boards:
+            if not board.pins[_CLKCS]:
+                # The rest of the current allophone plays at the new speed
+                if now < board.busyUntil:
+                    board.busyUntil = now + (board.busyUntil - now) * board.clock / clock
+                board.clock = clock
+    return len(data)
+
+# Simulation controls
+
+def setTimeScale(scale):
+    # Allophones take scale times their datasheet duration - 0 for no time at all
+    global _timeScale
+    _timeScale = scale
+
+def setSpiDelay(seconds):
+    # Each SPI transaction takes this many seconds
+    global _spiDelay
+    _spiDelay = seconds
+
+def spiTransactions(device=None):
+    # Number of SPI transactions so far - for all boards or for one device
+    with _lock:
+        if device is None:
+            return _spiCount
+        return sum(board.spiCount for board in _boards if board.device == device)
+
+def events():
+    # Log of (time, device, allophone code, time SBY goes high) for each allophone started
+    with _lock:
+        return list(_events)
+
+def clearEvents():
+    # Clear the event log and SPI counts
+    global _spiCount
+    with _lock:
+        del _events[:]
+        _spiCount = 0
+        for board in _boards:
+            board.spiCount = 0
+            board.overruns = 0
+
+def overruns(device=None):
+    # Number of times an allophone was started before the last one finished
+    with _lock:
+        return sum(board.overruns for board in _boards if device is None or board.device == device)
@@ -4,7 +4,8 @@
 # Ensure retroSpeak.py and vocabulary.py are in the path or same directory 
 # as this script
 #
-#   usage: speakTime.py [-h] [-c MHZ] [-t] [-d]
+#   usage: speakTime.py [-h] [-c MHZ] [-t] [-d] [-s] [-b BOARD] [--daemon [SOCKET]]
+#                       [-a] [-e MINUTES] [--align {start,time}] [-n COUNT]
 #
 #   Speaks the time and date using retroSpeak
 #
@@ -13,6 +14,23 @@
 #   -c MHZ, --clock MHZ  Clock speed in MHz - range 1.0 to 5.1
 #   -t, --time           Speak time only
 #   -d, --date           Speak time only
+#   -s, --silent         Do not speak. Print allophones.
+#   -b BOARD, --board BOARD
+#                        Select retroSpeak device 0-3 - default is 0
+#   --daemon [SOCKET]    Speak through a running retroSpeakDaemon
+#   -a, --announce       Stay running and announce on the minute
+#   -e MINUTES, --every MINUTES
+#                        Announce every this many minutes - default is 1
+#   --align {start,time} Start speaking on the minute, or start early so the
+#                        time itself is spoken on the minute
+#   -n COUNT, --count COUNT
+#                        Stop after this many announcements
+#
+# With --announce every time and date announcement is made into allophone
+# codes once, at start up, and the board is opened once and kept ready. Each
+# announcement is started on the minute - or earlier by the predicted time
+# 'the time is' takes to say with --align time - and the time from then to
+# the first ALD pulse is printed, with a summary at the end.
 #
 # (c) 2015 Jason Lane
 #
@@ -46,10 +64,13 @@
 #
 #******************** 
 
+import time
+import array
 import datetime
 import argparse
 
-import retroSpeak
+import retroSpeakDaemon
+import allophones
 from vocabulary import *
 
 def timeToSpeak(now):
@@ -81,43 +102,180 @@ def timeToSpeak(now):
         if minute % 10 > 0:
             minutes = minutes + ' PA4 ' + numbers[minute % 10]
     minutes += ' PA4 '
-    return 'PA5 ' + vocabulary['the'] + ' PA4 ' + vocabulary['time'] + ' PA4 ' + vocabulary['is'] +\
-                    ' PA4 ' + hours + minutes + ampm
+    return 'PA5 ' + phrases['the time is'] + ' PA4 ' + hours + minutes + ampm
 
 def dateToSpeak(now):
     # return allophones for the date
     weekday = daysOfWeek[now.weekday()]
-    month = vocabulary[now.strftime('%B').lower()]
-    day = daysOfMonth[now.day]
-    return 'PA5 ' + vocabulary['today'] + ' PA4 ' + vocabulary['is'] + ' PA4 ' +\
-        weekday + ' PA4 ' + vocabulary['the'] + ' PA4 ' + day + ' PA4 ' + \
+    return 'PA5 ' + phrases['today is'] + ' PA4 ' +\
+        weekday + ' PA4 ' + dayToSpeak(now.month, now.day)
+
+def dayToSpeak(month, day):
+    # return allophones for the day and month, after the day of the week
+    month = vocabulary[datetime.date(2000, month, 1).strftime('%B').lower()]
+    return vocabulary['the'] + ' PA4 ' + daysOfMonth[day] + ' PA4 ' + \
         vocabulary['of'] + ' PA4 ' + month + ' PA4 '
 
+class announcements():
+    # Every time and date announcement as allophone codes, made once
+    # The 1440 times of day and 366 days of the year are kept whole - dates
+    # are the day of the week joined to the day of the year when they are used
+
+    def __init__(self):
+        self._times = [allophones.encode(timeToSpeak(datetime.time(hour, minute)))
+                       for hour in range(24) for minute in range(60)]
+        self._weekdays = [allophones.encode('PA5 ' + phrases['today is'] + ' PA4 ' + weekday + ' PA4')
+                          for weekday in daysOfWeek]
+        # 2000 was a leap year, so this has every day there can be
+        first = datetime.date(2000, 1, 1)
+        self._days = {}
+        for n in range(366):
+            day = first + datetime.timedelta(n)
+            self._days[(day.month, day.day)] = allophones.encode(dayToSpeak(day.month, day.day))
+
+    def time(self, now):
+        return self._times[now.hour*60 + now.minute]
+
+    def date(self, now):
+        return self._weekdays[now.weekday()] + self._days[(now.month, now.day)]
+
+    def longest(self, clock):
+        # The predicted seconds the longest time and the longest date take
+        seconds = lambda codes: allophones.speechDuration(allophones.decode(codes), clock)
+        return (max(map(seconds, self._times)), max(map(seconds, self._weekdays)) + max(map(seconds, self._days.values())))
+
+def nextMinute(now, every):
+    # The next minute after now that is a whole number of every minutes into the day
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    minutes = (now.hour*60 + now.minute) // every * every + every
+    return midnight + datetime.timedelta(minutes=minutes)
+
+def sleepUntil(when):
+    # Sleep until time.time() reaches when - the last 2ms without sleeping
+    # Long sleeps can overrun by a millisecond or so a second, so sleep half
+    # the time left at a time until it is short
+    while True:
+        remaining = when - time.time()
+        if remaining <= 0.002:
+            break
+        time.sleep(remaining / 2 if remaining > 0.02 else remaining - 0.002)
+    while time.time() < when:
+        pass
+
+def firstAllophone(speech, after, timeout=2.0):
+    # The time of the first ALD pulse traced after a time, or None
+    giveUp = time.time() + timeout
+    while time.time() < giveUp:
+        for t, event, allophone in speech.trace():
+            if event == 'ald' and t >= after:
+                return t
+        time.sleep(0.001)
+    return None
+
+def announce(table, speakCodes, speech, every, lead, timeOnly, dateOnly, count, clock, jitter):
+    # Announce the time and date every every minutes, starting lead seconds
+    # before the minute, until count announcements have been made
+    # Appends the jitter of each announcement in seconds to jitter - from when
+    # it should have started to the first ALD pulse, or to speakCodes
+    # returning without a board to trace
+    longestTime, longestDate = table.longest(clock)
+    longest = lead
+    if not(dateOnly):
+        longest += longestTime
+    if not(timeOnly):
+        longest += longestDate
+    if longest > every*60:
+        print("Warning: announcements take up to {:.1f}s - longer than {} minutes".format(longest, every))
+    while count is None or len(jitter) < count:
+        minute = nextMinute(datetime.datetime.now(), every)
+        start = time.mktime(minute.timetuple()) - lead
+        if start < time.time():
+            # Too late to start this one early enough - wait for the next
+            sleepUntil(start + lead)
+            continue
+        codes = array.array('B')
+        if not(dateOnly):
+            codes += table.time(minute)
+        if not(timeOnly):
+            codes += table.date(minute)
+        sleepUntil(start)
+        if speech is not None and speech.isSpeaking():
+            print("{:%H:%M} still speaking - skipped".format(minute))
+            continue
+        speakCodes(codes)
+        spoken = firstAllophone(speech, start) if speech is not None else time.time()
+        if spoken is None:
+            print("{:%H:%M} no ALD pulse seen".format(minute))
+            continue
+        jitter.append(spoken - start)
+        print("{:%H:%M} {} {:+.2f} ms".format(minute, 'first ALD' if speech is not None else 'sent', jitter[-1]*1000))
+
 def clockSpeed(freq):
     freq = float(freq)
     if freq < 1.0 or freq > 5.1:
         raise argparse.ArgumentTypeError("%r not in range [1.0, 5.1]"%(freq,))
     return freq
 
-parser = argparse.ArgumentParser(description='Speaks the time and date using retroSpeak')
-parser.add_argument('-c','--clock', action="store", default='3.12', dest='mhz', type=clockSpeed, help='Clock speed in MHz - range 1.0 to 5.1')
-parser.add_argument('-t','--time', action="store_const", const=True, default=False, dest='timeOnly', help='Speak time only')
-parser.add_argument('-d','--date', action="store_const", const=True, default=False, dest='dateOnly', help='Speak time only')
-parser.add_argument('-b','--board', action="store", default=0, dest='board', type=int, choices=range(0,4), help='Select retroSpeak device 0-3 - default is 0')
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Speaks the time and date using retroSpeak')
+    parser.add_argument('-c','--clock', action="store", default='3.12', dest='mhz', type=clockSpeed, help='Clock speed in MHz - range 1.0 to 5.1')
+    parser.add_argument('-t','--time', action="store_const", const=True, default=False, dest='timeOnly', help='Speak time only')
+    parser.add_argument('-d','--date', action="store_const", const=True, default=False, dest='dateOnly', help='Speak time only')
+    parser.add_argument('-s','--silent', action="store_const", const=True, default=False, dest='silent', help='Do not speak. Print allophones.')
+    parser.add_argument('-b','--board', action="store", default=0, dest='board', type=int, choices=range(0,4), help='Select retroSpeak device 0-3 - default is 0')
+    parser.add_argument('--daemon', action="store", nargs='?', const=retroSpeakDaemon.defaultSocket, default=None, dest='daemon', metavar='SOCKET', help='Speak through a running retroSpeakDaemon instead of opening the board')
+    parser.add_argument('-a','--announce', action="store_const", const=True, default=False, dest='announce', help='Stay running and announce on the minute')
+    parser.add_argument('-e','--every', action="store", default=1, dest='every', type=int, metavar='MINUTES', help='Announce every this many minutes - default is 1')
+    parser.add_argument('--align', action="store", default='start', dest='align', choices=['start','time'], help='Start speaking on the minute, or early so the time is spoken on the minute')
+    parser.add_argument('-n','--count', action="store", default=None, dest='count', type=int, help='Stop after this many announcements')
 
 
-args = parser.parse_args()
+    args = parser.parse_args()
 
-# Initialise retroSpeak board
-speech = retroSpeak.retroSpeak(clock=args.mhz,device=args.board)
+    if args.dateOnly and args.timeOnly:
+        args.dateOnly = False
+        args.timeOnly = False
 
-now = datetime.datetime.now()
+    speech = None
+    if args.silent:
+        def speakAndWait(allophones):
+            print allophones
+        def speakCodes(codes):
+            print ' '.join(allophones.decode(codes))
+    elif args.daemon:
+        # The daemon already has the board set up
+        client = retroSpeakDaemon.retroSpeakClient(args.daemon)
+        speakAndWait = lambda allophones: client.speak(allophones, board=args.board, clock=args.mhz, wait=True)
+        speakCodes = lambda codes: client.speak(' '.join(allophones.decode(codes)), board=args.board, clock=args.mhz)
+    else:
+        # Initialise retroSpeak board
+        import retroSpeak
+        speech = retroSpeak.retroSpeak(clock=args.mhz,device=args.board)
+        speakAndWait = speech.speakAndWait
+        speakCodes = speech.speakCodes
 
-if args.dateOnly and args.timeOnly:
-    args.dateOnly = False
-    args.timeOnly = False
-# Speak the time and date
-if not(args.dateOnly):
-    speech.speakAndWait( timeToSpeak(now) )
-if not(args.timeOnly):
-    speech.speakAndWait( dateToSpeak(now) )
\ No newline at end of file
+    if args.announce:
+        table = announcements()
+        lead = 0.0
+        if args.align == 'time':
+            lead = allophones.speechDuration(('PA5 ' + phrases['the time is'] + ' PA4').split(), args.mhz)
+        if speech is not None:
+            speech.enableTrace(1000)
+        jitter = []
+        try:
+            announce(table, speakCodes, speech, max(args.every, 1), lead, args.timeOnly, args.dateOnly, args.count, args.mhz, jitter)
+        except KeyboardInterrupt:
+            pass
+        if speech is not None:
+            speech.wait()
+        if jitter:
+            jitter.sort()
+            print("{} announcements, jitter ms: mean {:.2f}  median {:.2f}  max {:.2f}".format(
+                len(jitter), sum(jitter)/len(jitter)*1000, jitter[len(jitter)//2]*1000, jitter[-1]*1000))
+    else:
+        now = datetime.datetime.now()
+        # Speak the time and date
+        if not(args.dateOnly):
+            speakAndWait( timeToSpeak(now) )
+        if not(args.timeOnly):
+            speakAndWait( dateToSpeak(now) )
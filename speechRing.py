@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak shared memory speech ring
+# Lets any number of local processes queue speech for a retroSpeak board
+# owned by another process, without a socket round trip or pickling.
+#
+# The ring is a memory mapped file - by default in /dev/shm so it never
+# touches the SD card. Producers append utterances of allophone address codes
+# and the process that owns the board drains them into retroSpeak.
+#
+# In the producer:
+#   ring = speechRing()
+#   ring.append(allophones.encode('HH1 EH LL AX OW'))
+#
+# In the process that owns the board:
+#   ring = speechRing()
+#   ring.attach(speech)   # speech is a retroSpeak instance
+#
+# File layout - all numbers little-endian:
+#   0   4 bytes  magic 'RSRB'
+#   4   uint32   version
+#   8   uint32   size of each slot's data area in bytes
+#   12  uint32   number of slots
+#   16  uint64   1 while the consumer is waiting for the doorbell
+#   64  slot headers, 64 bytes each:
+#       0   uint64   head - total bytes ever written
+#       8   uint64   tail - total bytes ever read
+#       16  uint64   utterances rejected because the slot was full
+#       24  uint64   process id of the producer that has the slot, 0 if none
+#   then the slots' data areas, one after another
+# Each utterance is a uint16 count of codes followed by one byte per code,
+# and can wrap around the end of its slot's data area.
+#
+# Each speechRing claims a slot of its own the first time it appends, under
+# an exclusive flock on the file - a slot whose process has gone is taken
+# over. After that only it changes the slot's head, and only the consumer
+# changes its tail, so appending takes no file lock and no system call.
+# Utterances from one producer are spoken in order; the consumer takes from
+# the slots in turn, so utterances from different producers may not be. A
+# process that forks should open a new speechRing in the child, rather than
+# append through the parent's.
+#
+# When the ring empties the consumer sleeps on a named pipe next to the ring
+# file (the doorbell). Producers only ring it if the consumer says it is
+# waiting, so speech sent while the consumer is busy costs the producer no
+# system calls.
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import errno
+import mmap
+import time
+import select
+import fcntl
+import struct
+import threading
+
+import allophones
+
+defaultRing = os.environ.get('RETROSPEAK_RING', '/dev/shm/retroSpeak.ring')
+
+_magic = b'RSRB'
+_version = 2
+_headerSize = 64
+_slotHeaderSize = 64
+_info = struct.Struct('<4sIII')
+_counter = struct.Struct('<Q')
+_getCounter = _counter.unpack_from
+_putCounter = _counter.pack_into
+_length = struct.Struct('<H')
+_WAITING = 16
+# Offsets within a slot header
+_HEAD = 0
+_TAIL = 8
+_REJECTED = 16
+_PID = 24
+
+class speechRing():
+
+    def __init__(self, path=defaultRing, size=16384, slots=8):
+        # Open the ring, creating it with slots producer slots of size bytes
+        # each if needed
+        self._path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        self._lock = threading.Lock()
+        self._bell = path + '.bell'
+        self._bellFd = None
+        self._consumer = None
+        self._stop = threading.Event()
+        # Offset of this producer's slot header, once claimed
+        self._slot = None
+        # Slot the consumer reads next
+        self._next = 0
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < _headerSize:
+                # New ring
+                os.ftruncate(self._fd, _headerSize + slots * (_slotHeaderSize + size))
+                os.write(self._fd, _info.pack(_magic, _version, size, slots))
+            self._map = mmap.mmap(self._fd, 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        magic, version, self._size, self._slots = _info.unpack_from(self._map, 0)
+        if magic != _magic or version != _version:
+            raise ValueError("{} isn't a version {} speech ring".format(path, _version))
+        # Every slot's head at once, for the consumer to find one with speech
+        self._heads = struct.Struct('<' + 'Q{}x'.format(_slotHeaderSize - _counter.size) * self._slots)
+        # Only the consumer moves the tails, so it keeps its own copy
+        self._tails = tuple(self._get(slot + _TAIL) for slot in self._slotOffsets())
+
+    def append(self, codes):
+        # Add an utterance of allophone codes to the ring
+        # Returns False without waiting if there isn't room for all of it
+        record = _length.pack(len(codes)) + bytes(bytearray(codes))
+        with self._lock:
+            if self._slot is None:
+                self._claim()
+            slot = self._slot
+            # Only this producer moves the head, so it needn't be read back
+            head = self._head
+            if len(record) > self._size - (head - _getCounter(self._map, slot + _TAIL)[0]):
+                self._put(slot + _REJECTED, self._get(slot + _REJECTED) + 1)
+                return False
+            self._write(slot, head, record)
+            # Publish the utterance only once it is all there
+            self._head = head + len(record)
+            _putCounter(self._map, slot + _HEAD, self._head)
+            if _getCounter(self._map, _WAITING)[0]:
+                self._ring()
+        return True
+
+    def appendSpeech(self, speech):
+        # Add a string of allophones separated by spaces
+        return self.append(allophones.encode(speech))
+
+    def read(self):
+        # Take the next utterance from the ring as a bytearray of codes, from
+        # each slot in turn. Returns None if the ring is empty. Only one
+        # process should read a ring
+        heads = self._heads.unpack_from(self._map, _headerSize)
+        tails = self._tails
+        if heads == tails:
+            return None
+        slots = self._slots
+        for n in range(self._next, self._next + slots):
+            n %= slots
+            tail = tails[n]
+            if heads[n] != tail:
+                self._next = (n + 1) % slots
+                slot = self._slotOffset(n)
+                (count,) = _length.unpack(bytes(self._read(slot, tail, _length.size)))
+                codes = self._read(slot, tail + _length.size, count)
+                tail += _length.size + count
+                self._tails = tails[:n] + (tail,) + tails[n+1:]
+                _putCounter(self._map, slot + _TAIL, tail)
+                return codes
+
+    def pending(self):
+        # Bytes waiting to be read
+        return sum(self._get(slot + _HEAD) - self._get(slot + _TAIL) for slot in self._slotOffsets())
+
+    def rejected(self):
+        # Number of utterances turned away because a slot was full
+        return sum(self._get(slot + _REJECTED) for slot in self._slotOffsets())
+
+    def attach(self, speech, interval=1.0, spin=0):
+        # Start a thread draining the ring into a retroSpeak instance
+        # When the ring is empty the thread keeps checking for spin seconds,
+        # then waits for the doorbell, checking anyway every interval seconds.
+        # Spinning only helps with a core to spare - on a single core Pi it
+        # takes the CPU from the producers it is waiting for - so it is off
+        # unless asked for.
+        # When the speaking queue is full the thread waits, and the ring fills up
+        if not os.path.exists(self._bell):
+            os.mkfifo(self._bell, 0o666)
+        bell = os.open(self._bell, os.O_RDONLY | os.O_NONBLOCK)
+        self._stop.clear()
+        def consumer():
+            try:
+                while not self._stop.is_set():
+                    codes = self.read()
+                    if codes is None and spin:
+                        giveUp = time.time() + spin
+                        while codes is None and time.time() < giveUp:
+                            # Let other threads run, but don't sleep
+                            time.sleep(0)
+                            codes = self.read()
+                    if codes is None:
+                        # Empty the doorbell before saying it is wanted
+                        try:
+                            os.read(bell, 4096)
+                        except OSError:
+                            pass
+                        self._put(_WAITING, 1)
+                        # Check again in case a producer missed the flag
+                        codes = self.read()
+                        if codes is None:
+                            select.select([bell], [], [], interval)
+                            codes = self.read()
+                        self._put(_WAITING, 0)
+                    if codes is not None:
+                        speech.speakCodes(codes)
+            finally:
+                os.close(bell)
+        self._consumer = threading.Thread(target=consumer, args=())
+        self._consumer.daemon = True
+        self._consumer.start()
+
+    def detach(self):
+        # Stop the thread started by attach
+        if self._consumer is not None:
+            self._stop.set()
+            self._ring()
+            self._consumer.join()
+            self._consumer = None
+
+    def close(self):
+        self.detach()
+        if self._slot is not None:
+            # Give the slot up - what is in it can still be read
+            self._put(self._slot + _PID, 0)
+        if self._bellFd is not None:
+            os.close(self._bellFd)
+        self._map.close()
+        os.close(self._fd)
+
+    def _claim(self):
+        # Take a slot for this producer - a free one, or one whose process has
+        # gone. Called holding self._lock
+        pid = os.getpid()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            for slot in self._slotOffsets():
+                owner = self._get(slot + _PID)
+                if owner and _running(owner):
+                    continue
+                self._put(slot + _PID, pid)
+                self._slot = slot
+                self._head = self._get(slot + _HEAD)
+                return
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        raise IOError("All {} slots of {} are in use".format(self._slots, self._path))
+
+    def _slotOffset(self, n):
+        return _headerSize + n * _slotHeaderSize
+
+    def _slotOffsets(self):
+        return [self._slotOffset(n) for n in range(self._slots)]
+
+    def _ring(self):
+        # Wake the consumer - nothing to do if there isn't one
+        try:
+            if self._bellFd is None:
+                self._bellFd = os.open(self._bell, os.O_WRONLY | os.O_NONBLOCK)
+            os.write(self._bellFd, b'!')
+        except OSError as e:
+            # ENXIO or ENOENT - no consumer, EAGAIN - already rung plenty
+            if e.errno == errno.EPIPE and self._bellFd is not None:
+                os.close(self._bellFd)
+                self._bellFd = None
+
+    def _get(self, offset):
+        return _getCounter(self._map, offset)[0]
+
+    def _put(self, offset, value):
+        _putCounter(self._map, offset, value)
+
+    def _data(self, slot):
+        # Offset of a slot's data area
+        return _headerSize + self._slots * _slotHeaderSize + (slot - _headerSize) // _slotHeaderSize * self._size
+
+    def _write(self, slot, position, data):
+        # Write data at a ring position, wrapping round the end of the slot's
+        # data area
+        base = self._data(slot)
+        start = position % self._size
+        first = min(len(data), self._size - start)
+        self._map[base+start:base+start+first] = data[:first]
+        if first < len(data):
+            self._map[base:base+len(data)-first] = data[first:]
+
+    def _read(self, slot, position, count):
+        base = self._data(slot)
+        start = position % self._size
+        first = min(count, self._size - start)
+        data = bytearray(self._map[base+start:base+start+first])
+        if first < count:
+            data += self._map[base:base+count-first]
+        return data
+
+def _running(pid):
+    # True if process pid is still running
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak tests - the shared memory speech ring
+#
+#   usage: python -m unittest discover tests
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from speechRing import speechRing
+
+class testSpeechRing(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.ring')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def open(self, **options):
+        ring = speechRing(self.path, **options)
+        self.addCleanup(ring.close)
+        return ring
+
+    def testRoundTrip(self):
+        ring = self.open()
+        self.assertEqual(ring.read(), None)
+        self.assertTrue(ring.append([1, 2, 3]))
+        self.assertTrue(ring.append(bytearray([4])))
+        self.assertTrue(ring.appendSpeech('HH1 EH LL AX OW'))
+        self.assertEqual(ring.read(), bytearray([1, 2, 3]))
+        self.assertEqual(ring.read(), bytearray([4]))
+        self.assertEqual(ring.read(), bytearray([27, 7, 45, 15, 53]))
+        self.assertEqual(ring.read(), None)
+        self.assertEqual(ring.pending(), 0)
+
+    def testWrapAround(self):
+        # Records of 2 + 5 bytes in a 16 byte slot start at every offset,
+        # and most wrap round the end of it
+        ring = self.open(size=16, slots=1)
+        for n in range(50):
+            codes = bytearray((n + m) % 64 for m in range(5))
+            self.assertTrue(ring.append(codes))
+            self.assertEqual(ring.read(), codes)
+        self.assertEqual(ring.pending(), 0)
+
+    def testFull(self):
+        ring = self.open(size=16, slots=1)
+        self.assertTrue(ring.append([1, 2, 3, 4, 5, 6]))
+        self.assertTrue(ring.append([7, 8, 9, 10, 11, 12]))
+        self.assertEqual(ring.pending(), 16)
+        # No room, and nothing is written
+        self.assertFalse(ring.append([13]))
+        self.assertEqual(ring.rejected(), 1)
+        self.assertEqual(ring.pending(), 16)
+        self.assertEqual(ring.read(), bytearray([1, 2, 3, 4, 5, 6]))
+        # Room again, wrapping round
+        self.assertTrue(ring.append([13]))
+        self.assertEqual(ring.read(), bytearray([7, 8, 9, 10, 11, 12]))
+        self.assertEqual(ring.read(), bytearray([13]))
+        self.assertEqual(ring.read(), None)
+
+    def testTooBig(self):
+        ring = self.open(size=16, slots=1)
+        self.assertFalse(ring.append(range(15)))
+        self.assertEqual(ring.rejected(), 1)
+        self.assertTrue(ring.append(range(14)))
+
+    def testProducers(self):
+        # Each producer has its own slot, read in turn, in order within it
+        consumer = self.open(size=64, slots=2)
+        first = speechRing(self.path)
+        second = self.open()
+        for n in range(3):
+            self.assertTrue(first.append([n]))
+        self.assertTrue(second.append([10]))
+        self.assertEqual([consumer.read() for n in range(5)],
+                         [bytearray([0]), bytearray([10]), bytearray([1]), bytearray([2]), None])
+        # Every slot is taken
+        third = self.open()
+        self.assertRaises(IOError, third.append, [20])
+        # Until a producer closes
+        first.close()
+        self.assertTrue(third.append([20]))
+        self.assertEqual(consumer.read(), bytearray([20]))
+
+    def testNotARing(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'RSRB' + b'\0' * 60)
+        self.assertRaises(ValueError, speechRing, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
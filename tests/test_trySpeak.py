@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak tests - trySpeak and the overflow policies, on a simulated board
+#
+#   usage: python -m unittest discover tests
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import unittest
+
+os.environ['RETROSPEAK_SIMULATE'] = '1'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import retroSpeak
+
+class heldBoard(retroSpeak.retroSpeak):
+    # A board with room for 10 allophones that never speaks them, so the
+    # queue stays as trySpeak left it
+    _queueSize = 10
+
+    def speaker(self):
+        pass
+
+class testTrySpeak(unittest.TestCase):
+
+    def setUp(self):
+        self.board = heldBoard()
+        self.addCleanup(self.board.stopSpeaking)
+
+    def queued(self):
+        # (code, priority) for each queued allophone, checking every one
+        # counts as an unfinished task
+        q = self.board._speaking
+        self.assertEqual(q.unfinished_tasks, len(q.queue))
+        return [(code, priority) for code, utterance, priority in q.queue]
+
+    def testRejectNew(self):
+        self.assertTrue(self.board.trySpeakCodes([1] * 4))
+        self.assertTrue(self.board.trySpeakCodes([2] * 4))
+        self.assertFalse(self.board.trySpeakCodes([3] * 4))
+        self.assertEqual(self.queued(), [(1, 0)] * 4 + [(2, 0)] * 4)
+        # What fits still goes in whole
+        self.assertTrue(self.board.trySpeakCodes([3] * 2))
+        self.assertEqual(self.board.capacity(), 0)
+        self.assertEqual(self.queued(), [(1, 0)] * 4 + [(2, 0)] * 4 + [(3, 0)] * 2)
+
+    def testDropOldest(self):
+        self.board.setOverflowPolicy(self.board.DROP_OLDEST)
+        for code in (1, 2, 3):
+            self.assertTrue(self.board.trySpeakCodes([code] * 3))
+        self.assertTrue(self.board.trySpeakCodes([4] * 5))
+        # 4 needed 4 more places, so 1 and 2 went, oldest first
+        self.assertEqual(self.queued(), [(3, 0)] * 3 + [(4, 0)] * 5)
+        self.assertTrue(self.board.trySpeakCodes([5] * 7))
+        self.assertEqual(self.queued(), [(5, 0)] * 7)
+
+    def testDropLowest(self):
+        self.board.setOverflowPolicy(self.board.DROP_LOWEST)
+        self.assertTrue(self.board.trySpeakCodes([1] * 4, priority=1))
+        self.assertTrue(self.board.trySpeakCodes([2] * 4, priority=0))
+        # Nothing lower than priority 0 to drop
+        self.assertFalse(self.board.trySpeakCodes([3] * 4, priority=0))
+        self.assertEqual(self.queued(), [(1, 1)] * 4 + [(2, 0)] * 4)
+        # The lowest goes first, even though it is newer
+        self.assertTrue(self.board.trySpeakCodes([3] * 4, priority=2))
+        self.assertEqual(self.queued(), [(1, 1)] * 4 + [(3, 2)] * 4)
+        # Dropping everything lower isn't enough, so nothing is dropped
+        self.assertFalse(self.board.trySpeakCodes([4] * 9, priority=2))
+        self.assertEqual(self.queued(), [(1, 1)] * 4 + [(3, 2)] * 4)
+
+    def testTooLong(self):
+        self.board.setOverflowPolicy(self.board.DROP_OLDEST)
+        self.assertTrue(self.board.trySpeakCodes([1] * 4))
+        self.assertFalse(self.board.trySpeakCodes([2] * 11))
+        self.assertEqual(self.queued(), [(1, 0)] * 4)
+
+    def testTrySpeak(self):
+        self.assertTrue(self.board.trySpeak('HH1 EH LL AX OW'))
+        self.assertTrue(self.board.trySpeakList(['hh1', 'eh', 'nothing']))
+        self.assertEqual([code for code, priority in self.queued()], [27, 7, 45, 15, 53, 27, 7])
+
+    def testStop(self):
+        self.board.trySpeakCodes([1] * 4)
+        self.board.stopSpeaking()
+        self.assertEqual(self.queued(), [])
+
+    def testPolicies(self):
+        self.assertRaises(ValueError, self.board.setOverflowPolicy, 'newest')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak tests - utterance bundles and pronunciation lexicons
+#
+#   usage: python -m unittest discover tests
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import allophones
+import lexicon
+import utterances
+
+class testBundles(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.bundle')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def compile(self, entries):
+        utterances.compileBundle(entries, self.path)
+        bundle = utterances.utteranceBundle(self.path)
+        self.addCleanup(bundle.close)
+        return bundle
+
+    def testRoundTrip(self):
+        hello = allophones.encode('HH1 EH LL AX OW')
+        door = bytearray(allophones.encode('DD2 AO ER1')) + utterances.pause(250) + \
+               utterances.clock(4.0) + bytearray(allophones.encode('OW PP EH NN1'))
+        bundle = self.compile([('hello', hello), ('door open', door), (u'caf\xe9', hello)])
+        self.assertEqual(len(bundle), 3)
+        self.assertEqual(bundle.names(), ['hello', 'door open', u'caf\xe9'])
+        self.assertEqual(bundle.number('door open'), 1)
+        self.assertEqual(bundle.ops('hello'), bytearray(hello))
+        self.assertEqual(bundle.ops(2), bytearray(hello))
+        self.assertEqual(bundle.ops('door open'), door)
+        codes = allophones.allophoneCodes
+        self.assertEqual(bundle.items('door open'),
+                         [codes['DD2'], codes['AO'], codes['ER1'], ('pause', 0.25), ('clock', 4.0),
+                          codes['OW'], codes['PP'], codes['EH'], codes['NN1']])
+        # Only entries with pauses or clock changes are flagged
+        self.assertEqual(bundle.entry('hello')[3], 0)
+        self.assertEqual(bundle.entry('door open')[3], utterances.CONTROLS)
+
+    def testLongNumbers(self):
+        bundle = self.compile([('one', bytearray([1])), ('two', bytearray([2]))])
+        self.assertEqual(bundle.ops(long(1)), bytearray([2]))
+
+    def testUnknownNames(self):
+        bundle = self.compile([('hello', bytearray([1])), ('world', bytearray([2]))])
+        self.assertFalse('goodbye' in bundle)
+        self.assertTrue('hello' in bundle)
+        self.assertEqual(bundle.number('goodbye'), None)
+        self.assertRaises(KeyError, bundle.ops, 'goodbye')
+        self.assertRaises(IndexError, bundle.ops, 2)
+        self.assertRaises(IndexError, bundle.ops, -1)
+
+    def testSmallBundles(self):
+        # Names the same length mustn't stop the hash placing them, however
+        # few there are
+        for n in range(1, 20):
+            names = ['entry {:02}'.format(m) for m in range(n)]
+            bundle = self.compile([(name, bytearray([m])) for m, name in enumerate(names)])
+            self.assertEqual([bundle.number(name) for name in names], list(range(n)))
+
+    def testArgumentLimits(self):
+        # Pauses and clock speeds are uint16 - milliseconds and kHz
+        bundle = self.compile([('long pause', utterances.pause(65535))])
+        self.assertEqual(bundle.items('long pause'), [('pause', 65.535)])
+        self.assertRaises(ValueError, utterances.pause, 65536)
+        self.assertRaises(ValueError, utterances.pause, -1)
+        self.assertRaises(ValueError, utterances.clock, 65.536)
+
+    def testNameLimit(self):
+        # Name lengths are uint16
+        name = 'x' * 65535
+        bundle = self.compile([(name, bytearray([1])), ('short', bytearray([2]))])
+        self.assertEqual(bundle.ops(name), bytearray([1]))
+        self.assertRaises(ValueError, utterances.compileBundle, [('x' * 65536, bytearray([1]))], self.path)
+
+    def testBadEntries(self):
+        self.assertRaises(ValueError, utterances.compileBundle, [], self.path)
+        self.assertRaises(ValueError, utterances.compileBundle, [('a', bytearray([1])), ('a', bytearray([2]))], self.path)
+
+    def testNotABundle(self):
+        lexicon.compileLexicon({'hello': 'HH1 EH LL AX OW'}, self.path)
+        self.assertRaises(ValueError, utterances.utteranceBundle, self.path)
+
+
+class testLexicon(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.lexicon')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def compile(self, words):
+        lexicon.compileLexicon(words, self.path)
+        compiled = lexicon.pronunciationLexicon(self.path)
+        self.addCleanup(compiled.close)
+        return compiled
+
+    def testRoundTrip(self):
+        words = {'hello': 'HH1 EH LL AX OW', 'world': 'WW ER1 LL DD1', 'a': 'EY', 'long': ' '.join(['AA'] * 255)}
+        compiled = self.compile(words)
+        self.assertEqual(len(compiled), 4)
+        for word, speech in words.items():
+            self.assertEqual(compiled.lookup(word), speech)
+            self.assertEqual(list(compiled.lookupCodes(word)), allophones.encode(speech).tolist())
+        # Words are looked up whatever their case
+        self.assertEqual(compiled.lookup('Hello'), words['hello'])
+
+    def testUnknownWords(self):
+        compiled = self.compile({'hello': 'HH1 EH LL AX OW', 'world': 'WW ER1 LL DD1'})
+        self.assertFalse('goodbye' in compiled)
+        self.assertEqual(compiled.lookup('goodbye'), None)
+        self.assertEqual(compiled.lookupCodes('goodbye'), None)
+
+    def testSameLengthWords(self):
+        words = dict(('W{:03}'.format(n), 'AA') for n in range(2))
+        compiled = self.compile(words)
+        for word in words:
+            self.assertEqual(compiled.lookup(word), 'AA')
+
+    def testLimits(self):
+        # A word's allophone count is a byte
+        self.assertRaises(ValueError, lexicon.compileLexicon, {'long': ' '.join(['AA'] * 256)}, self.path)
+        self.assertRaises(ValueError, lexicon.compileLexicon, {}, self.path)
+
+    def testPacking(self):
+        for n in range(20):
+            codes = [(m * 37 + n) % 64 for m in range(n)]
+            packed = lexicon.packCodes(codes)
+            self.assertEqual(len(packed), (n * 6 + 7) // 8)
+            self.assertEqual(lexicon.unpackCodes(packed, n).tolist(), codes)
+
+
+if __name__ == '__main__':
+    unittest.main()
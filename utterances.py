@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+#********************
+# retroSpeak utterance bundles
+# Canned messages compiled once to allophone codes, in a memory mapped file
+# any number of processes can speak from.
+#
+#   usage: utterances.py compile [-i SOURCE] [--vocabulary] [--times]
+#                                [--dates [YEAR]] OUTPUT
+#          utterances.py list BUNDLE
+#
+# The entries in a bundle come from
+#   -i SOURCE       a text file with a name and text on each line, separated
+#                   by a tab. The text is translated with retroTTS, and can
+#                   have in it
+#                     [pause MS]           silence for MS milliseconds
+#                     [clock MHZ]          change the clock speed, 1.0 to 5.1
+#                     [allophones PA4 ...] allophones, not translated
+#                   Lines starting with # are comments.
+#   --vocabulary    every word and phrase in vocabulary.py, by name
+#   --times         'time HH:MM' for every minute of the day, from speakTime
+#   --dates YEAR    'date YYYY-MM-DD' for every day of a year, from speakTime
+#
+# A retroSpeak board speaks an entry by name or number with:
+#   speech.loadBundle('messages.bundle')
+#   speech.speakEntry('door open')
+#
+# The file is memory mapped, so opening it only reads the header however many
+# entries it has, and the pages are shared between processes. An entry is
+# found by name with a minimal perfect hash, as in lexicon.py, and by number
+# straight from the entry table. An entry's ops are ready to queue - one byte
+# for each allophone - so there is nothing to parse unless it has pauses or
+# clock changes in it.
+#
+# File layout - all numbers little-endian:
+#   0   4 bytes  magic 'RSUB'
+#   4   uint32   version
+#   8   uint32   number of entries, n
+#   12  uint32   offset of the displacement table - n int32
+#   16  uint32   offset of the slot table - n uint32 entry numbers
+#   20  uint32   offset of the entry table - n entries
+# Each entry in the entry table is
+#   uint32   offset of the name, which the ops follow
+#   uint32   length of the ops in bytes
+#   uint16   length of the name
+#   uint16   flags - 1 if there are pauses or clock changes
+# Entries are numbered in the order they were compiled. The hash and
+# displacements are as in lexicon.py, giving a slot, and the slot table gives
+# the entry number in that slot.
+#
+# Ops are one byte, some followed by a uint16:
+#   0-63        speak the allophone with this address code
+#   0x40 MS     silence for MS milliseconds
+#   0x80 KHZ    set the clock to KHZ kHz
+#
+# (c) 2015 Jason Lane
+#
+# https://github.com/jas8mm/retroSpeak
+#
+# BSD Licence
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the
+# names of its contributors may be used to endorse or promote products
+# derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#********************
+
+import re
+import mmap
+import struct
+import numbers
+
+import allophones
+# Names are placed with the same hash as lexicon words
+from lexicon import perfectHash, _hash
+
+_magic = b'RSUB'
+_version = 2
+_header = struct.Struct('<4sIIIII')
+_entry = struct.Struct('<IIHH')
+_argument = struct.Struct('<H')
+
+# Ops and flags
+PAUSE = 0x40
+CLOCK = 0x80
+CONTROLS = 1
+
+def _key(name):
+    if not isinstance(name, bytes):
+        name = name.encode('utf-8')
+    return name
+
+def pause(milliseconds):
+    # Op for silence, up to 65535ms
+    milliseconds = int(milliseconds)
+    if milliseconds < 0 or milliseconds > 0xFFFF:
+        raise ValueError("Pause of {}ms not in range [0, 65535]".format(milliseconds))
+    return bytearray([PAUSE]) + _argument.pack(milliseconds)
+
+def clock(mhz):
+    # Op to change the clock speed
+    kHz = int(round(mhz*1000))
+    if kHz < 0 or kHz > 0xFFFF:
+        raise ValueError("Clock of {}MHz not in range [0, 65.535]".format(mhz))
+    return bytearray([CLOCK]) + _argument.pack(kHz)
+
+def compileBundle(entries, path):
+    # Write a bundle from a list of (name, ops) - ops as from pause, clock and
+    # allophone codes added together in a bytearray
+    names = [_key(name) for name, ops in entries]
+    if not names:
+        raise ValueError("No entries to compile")
+    if len(set(names)) != len(names):
+        raise ValueError("Entry names must be different")
+    for name in names:
+        if len(name) > 0xFFFF:
+            raise ValueError("Entry name {}... longer than 65535 bytes".format(name[:20]))
+    n = len(names)
+    displacements, slots = perfectHash(names)
+    numbers = dict((name, number) for number, name in enumerate(names))
+    tableOffset = _header.size
+    slotOffset = tableOffset + 4*n
+    entryOffset = slotOffset + 4*n
+    dataOffset = entryOffset + _entry.size*n
+    table = bytearray()
+    data = bytearray()
+    for name, (key, ops) in zip(names, entries):
+        ops = bytearray(ops)
+        flags = CONTROLS if any(op & 0xC0 for op in ops) else 0
+        table += _entry.pack(dataOffset + len(data), len(ops), len(name), flags)
+        data += name + ops
+    with open(path, 'wb') as f:
+        f.write(_header.pack(_magic, _version, n, tableOffset, slotOffset, entryOffset))
+        f.write(struct.pack('<{}i'.format(n), *displacements))
+        f.write(struct.pack('<{}I'.format(n), *[numbers[name] for name in slots]))
+        f.write(table)
+        f.write(data)
+    return n
+
+_markup = re.compile(r'\[(\w+)([^\]]*)\]')
+
+def textOps(text):
+    # Ops for a line of text with [pause], [clock] and [allophones] markup
+    import retroTTS
+    ops = bytearray()
+    position = 0
+    for match in list(_markup.finditer(text)) + [None]:
+        words = text[position:match.start() if match else len(text)]
+        if words.strip():
+            ops.extend(retroTTS.textToCodes(words.split()))
+        if match is None:
+            break
+        command, argument = match.group(1).lower(), match.group(2).strip()
+        if command == 'pause':
+            ops += pause(int(argument))
+        elif command == 'clock':
+            mhz = float(argument)
+            if mhz < 1.0 or mhz > 5.1:
+                raise ValueError("{} not in range [1.0, 5.1]".format(mhz))
+            ops += clock(mhz)
+        elif command == 'allophones':
+            ops.extend(allophones.encode(argument))
+        else:
+            raise ValueError("Unknown markup [{}]".format(match.group(1)))
+        position = match.end()
+    return ops
+
+def readSource(path):
+    # Read a text file of names and text - a list of (name, ops)
+    entries = []
+    for line in open(path):
+        if line.strip() and not line.startswith('#'):
+            name, text = line.rstrip('\n').split('\t', 1)
+            entries.append((name.strip(), textOps(text)))
+    return entries
+
+def vocabularyEntries():
+    import vocabulary
+    return [(name, allophones.encode(speech)) for table in (vocabulary.vocabulary, vocabulary.phrases)
+            for name, speech in sorted(table.items())]
+
+def timeEntries():
+    import speakTime
+    import datetime
+    table = speakTime.announcements()
+    return [('time {:02}:{:02}'.format(hour, minute), table.time(datetime.time(hour, minute)))
+            for hour in range(24) for minute in range(60)]
+
+def dateEntries(year):
+    import speakTime
+    import datetime
+    table = speakTime.announcements()
+    first = datetime.date(year, 1, 1)
+    days = (datetime.date(year+1, 1, 1) - first).days
+    return [('date {:%Y-%m-%d}'.format(day), table.date(day))
+            for day in (first + datetime.timedelta(n) for n in range(days))]
+
+
+class utteranceBundle():
+    # A compiled bundle, memory mapped
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._size, self._table, self._slots, self._entries = _header.unpack_from(self._map, 0)
+        if magic != _magic or version != _version:
+            raise ValueError("{} isn't a version {} utterance bundle".format(path, _version))
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, name):
+        return self.number(name) is not None
+
+    def number(self, name):
+        # The number of the entry with a name, or None
+        key = _key(name)
+        slot = _hash(key) % self._size
+        (d,) = struct.unpack_from('<i', self._map, self._table + 4*slot)
+        if d < 0:
+            slot = -d-1
+        else:
+            slot = _hash(key, d) % self._size
+        (number,) = struct.unpack_from('<I', self._map, self._slots + 4*slot)
+        offset, length, nameLength, flags = _entry.unpack_from(self._map, self._entries + _entry.size*number)
+        if self._map[offset:offset+nameLength] != key:
+            return None
+        return number
+
+    def name(self, number):
+        offset, length, nameLength, flags = self.entry(number)
+        return self._map[offset-nameLength:offset].decode('utf-8')
+
+    def names(self):
+        return [self.name(number) for number in range(self._size)]
+
+    def entry(self, entry):
+        # (offset of the ops, length of the ops, length of the name, flags)
+        # for an entry by name or number
+        if not isinstance(entry, numbers.Integral):
+            number = self.number(entry)
+            if number is None:
+                raise KeyError(entry)
+            entry = number
+        if entry < 0 or entry >= self._size:
+            raise IndexError(entry)
+        offset, length, nameLength, flags = _entry.unpack_from(self._map, self._entries + _entry.size*entry)
+        return offset + nameLength, length, nameLength, flags
+
+    def ops(self, entry):
+        # The ops of an entry as a bytearray
+        offset, length, nameLength, flags = self.entry(entry)
+        return bytearray(self._map[offset:offset+length])
+
+    def items(self, entry):
+        # An entry as retroSpeak queues it - allophone address codes, and
+        # ('pause', seconds) and ('clock', MHz) for the other ops
+        ops = self.ops(entry)
+        items = []
+        n = 0
+        while n < len(ops):
+            op = ops[n]
+            if op & 0xC0:
+                (argument,) = _argument.unpack_from(bytes(ops[n+1:n+3]))
+                items.append(('pause', argument / 1000.0) if op == PAUSE else ('clock', argument / 1000.0))
+                n += 3
+            else:
+                items.append(op)
+                n += 1
+        return items
+
+    def duration(self, entry, clock=allophones.defaultClock):
+        # Predicted seconds an entry takes to speak, starting at clock MHz
+        seconds = 0.0
+        for item in self.items(entry):
+            if isinstance(item, tuple):
+                if item[0] == 'pause':
+                    seconds += item[1]
+                else:
+                    clock = item[1]
+            else:
+                seconds += allophones.codeDuration(item, clock)
+        return seconds
+
+    def close(self):
+        self._map.close()
+
+
+if __name__ == '__main__':
+    import time
+    import argparse
+    parser = argparse.ArgumentParser(description='Compile and list retroSpeak utterance bundles')
+    commands = parser.add_subparsers(dest='command')
+    compiler = commands.add_parser('compile', help='Compile a bundle')
+    compiler.add_argument('-i','--input', action="append", default=[], dest='inputs', metavar='SOURCE', help='Text file of names and text, separated by a tab')
+    compiler.add_argument('--vocabulary', action="store_const", const=True, default=False, dest='vocabulary', help='Every word and phrase in vocabulary.py')
+    compiler.add_argument('--times', action="store_const", const=True, default=False, dest='times', help='Every time of day, from speakTime')
+    compiler.add_argument('--dates', action="store", nargs='?', const=time.localtime().tm_year, default=None, dest='year', type=int, help='Every date in a year, from speakTime - default is this year')
+    compiler.add_argument('output', help='Compiled bundle')
+    lister = commands.add_parser('list', help='List the entries in a bundle')
+    lister.add_argument('bundle', help='Compiled bundle')
+    args = parser.parse_args()
+
+    if args.command == 'compile':
+        start = time.time()
+        entries = []
+        for path in args.inputs:
+            entries += readSource(path)
+        if args.vocabulary:
+            entries += vocabularyEntries()
+        if args.times:
+            entries += timeEntries()
+        if args.year:
+            entries += dateEntries(args.year)
+        count = compileBundle(entries, args.output)
+        print("{} entries compiled in {:.1f}s".format(count, time.time()-start))
+    else:
+        bundle = utteranceBundle(args.bundle)
+        for number, name in enumerate(bundle.names()):
+            print("{}\t{}\t{:.2f}s".format(number, name, bundle.duration(number)))
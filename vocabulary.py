@@ -18,6 +18,8 @@
 # Also a dictionary of numbers is available so num=numbers[1] will return the allophones for 'one'
 # daysOfMonth[1] will return allophones for 'first' and daysOfMonth[31] 'thirty first'
 # daysOfWeek[0] will return allophones for 'monday' and daysOfWeek[6] 'sunday'
+# phrases['the time is'] will return allophones for the whole phrase, with pauses
+# between the words to suit it
 # 
 # As this is based heavily on work in the public domain work, this code is relased as public domain.
 #
@@ -27,6 +29,8 @@ vocabulary = {
     'a':'EY',
     'alarm':'AX LL AR MM',
     'am':'AE AE PA2 MM',
+    'amp':'AE AE MM PA3 PP',
+    'amps':'AE AE MM PA3 PP SS',
     'and':'AE AE NN1 PA2 DD1',
     'april':'EY PA3 PP RR2 IH IH LL',
     'ate':'EY PA3 TT2',
@@ -40,6 +44,7 @@ vocabulary = {
     'by':'BB2 AA AY',
     'c':'SS SS IY',
     'calendar':'KK1 AE AE LL EH NN1 PA2 DD2 ER1',
+    'celsius':'SS SS EH EH LL SS IY AX SS',
     'check':'CH EH EH PA3 KK2',
     'checked':'CH EH EH PA3 KK2 PA2 TT2',
     'checker':'CH EH EH PA3 KK1 ER1',
@@ -63,6 +68,8 @@ vocabulary = {
     'daughter':'DD2 AO TT2 ER1',
     'day':'DD2 EH EY',
     'december':'DD2 IY SS SS EH EH MM PA1 BB2 ER1',
+    'degree':'DD2 IH PA2 GG3 RR2 IY',
+    'degrees':'DD2 IH PA2 GG3 RR2 IY ZZ',
     'divided':'DD2 IH VV AY PA2 DD2 IH PA2 DD1',
     'e':'IY',
     'eight':'EY PA3 TT2',
@@ -74,7 +81,7 @@ vocabulary = {
     'eleventh':'IH LL EH EH VV IH NN1 PA2 TH',
     'emotional':'IY MM OW SH AX NN1 AX EL',
     'engage':'EH EH PA1 NN1 GG1 EY PA2 JH',
-    'engagement':'EH EH PA1 NN1 GG1 EY PA2 JH MM EH EH NN1 PA2 PA3 TT2 ',
+    'engagement':'EH EH PA1 NN1 GG1 EY PA2 JH MM EH EH NN1 PA2 PA3 TT2',
     'engages':'EH EH PA1 NN1 GG1 EY PA2 JH IH ZZ',
     'engaging':'EH EH PA1 NN1 GG1 EY PA2 JH IH NG',
     'enrage':'EH NN1 RR1 EY PA2 JH',
@@ -118,7 +125,9 @@ vocabulary = {
     'gauging':'GG1 EY PA2 JH IH NG',
     'h':'EY PA2 PA3 CH',
     'hello':'HH1 EH LL AX OW',
+    'hertz':'HH1 ER1 PA3 TT2 SS',
     'hour':'AW ER1',
+    'hours':'AW ER1 ZZ',
     'hundred':'HH2 AX AX NN1 PA2 DD2 RR2 IH IH PA1 DD1',
     'i':'AA AY',
     'infinitive':'IH NN1 FF FF IH IH NN1 IH PA2 PA3 TT2 IH VV',
@@ -139,6 +148,10 @@ vocabulary = {
     'june':'JH UW2 NN1',
     'k':'KK1 EH EY',
     'key':'KK1 IY',
+    'kilometre':'KK1 IH LL AX MM IY PA3 TT2 ER1',
+    'kilometres':'KK1 IH LL AX MM IY PA3 TT2 ER1 ZZ',
+    'knot':'NN1 AA AA PA3 TT2',
+    'knots':'NN1 AA AA PA3 TT2 SS',
     'l':'EH EH EL',
     'legislate':'LL EH EH PA2 JH IH SS SS LL EY PA2 PA3 TT2',
     'legislated':'LL EH EH PA2 JH IH SS SS LL EY PA2 PA3 TT2 IH DD1',
@@ -148,13 +161,20 @@ vocabulary = {
     'letter':'LL EH EH PA3 TT2 ER1',
     'litter':'LL IH IH PA3 TT2 ER1',
     'little':'LL IH IH PA3 TT2 EL',
+    'lux':'LL AX AX PA3 KK2 SS',
     'm':'EH EH MM',
     'march':'MM AR PA3 CH',
     'may':'MM EY',
     'memories':'MM EH EH MM ER2 IY ZZ',
     'memory':'MM EH EH MM ER2 IY',
+    'metre':'MM IY PA3 TT2 ER1',
+    'metres':'MM IY PA3 TT2 ER1 ZZ',
+    'millibar':'MM IH LL IH PA2 BB2 AR',
+    'millibars':'MM IH LL IH PA2 BB2 AR ZZ',
     'million':'MM IH IH LL YY1 AX NN1',
+    'minus':'MM AY NN1 AX SS',
     'minute':'MM IH NN1 IH PA3 TT2',
+    'minutes':'MM IH NN1 IH PA3 TT2 SS',
     'monday':'MM AX AX NN1 PA2 DD2 EY',
     'month':'MM AX NN1 TH',
     'n':'EH EH NN1',
@@ -174,6 +194,8 @@ vocabulary = {
     'october':'AA PA2 KK2 PA3 TT2 OW PA1 BB2 ER1',
     'one':'WW AX AX NN1',
     'p':'PP IY',
+    'per':'PP ER1',
+    'percent':'PP ER1 SS SS EH EH NN1 PA3 TT2',
     'physical':'FF FF IH ZZ IH PA3 KK1 AX EL',
     'pi':'PP AA AA AY',
     'pin':'PP IH IH NN1',
@@ -185,6 +207,7 @@ vocabulary = {
     'pledges':'PP LL EH EH PA3 JH IH ZZ',
     'pledging':'PP LL EH EH PA3 JH IH NG',
     'plus':'PP LL AX AX SS SS',
+    'point':'PP OY NN1 PA3 TT2',
     'q':'KK1 YY1 UW2',
     'r':'AR',
     'raspberry':'RR1 AX SS SS PA3 BB1 ER2 RR2 IY',
@@ -198,6 +221,7 @@ vocabulary = {
     'saturday':'SS SS AE PA3 TT2 ER1 PA2 DD2 EY',
     'score':'SS SS PA3 KK3 OR',
     'second':'SS SS EH PA3 KK1 IH NN1 PA2 DD1',
+    'seconds':'SS SS EH PA3 KK1 IH NN1 PA2 DD1 ZZ',
     'sensitive':'SS SS EH EH NN1 SS SS IH PA2 PA3 TT2 IH VV',
     'sensitivity':'SS SS EH EH NN1 SS SS IH PA2 PA3 TT2 IH VV IH PA2 PA3 TT2 IY',
     'september':'SS SS EH PA3 PP PA3 TT2 EH EH MM PA1 BB2 ER1',
@@ -286,7 +310,11 @@ vocabulary = {
     'u':'YY1 UW2',
     'uncle':'AX NG PA3 KK3 EL',
     'v':'VV IY',
+    'volt':'VV OW LL PA3 TT2',
+    'volts':'VV OW LL PA3 TT2 SS',
     'w':'DD2 AX PA2 BB2 EL YY1 UW2',
+    'watt':'WW AA AA PA3 TT2',
+    'watts':'WW AA AA PA3 TT2 SS',
     'wednesday':'WW EH EH NN1 ZZ PA2 DD2 EY',
     'whale':'WW EY EL',
     'whaler':'WW EY LL ER1',
@@ -316,17 +344,17 @@ daysOfMonth = [ '',
     vocabulary['thirteenth'],vocabulary['fourteenth'],vocabulary['fifteenth'],
     vocabulary['sixteenth'],vocabulary['seventeenth'],vocabulary['eighteenth'],
     vocabulary['nineteenth'],vocabulary['twentieth'],
-    vocabulary['twenty']+'PA2'+vocabulary['first'],
-    vocabulary['twenty']+'PA2'+vocabulary['second'],
-    vocabulary['twenty']+'PA2'+vocabulary['third'],
-    vocabulary['twenty']+'PA2'+vocabulary['fourth'],
-    vocabulary['twenty']+'PA2'+vocabulary['fifth'],
-    vocabulary['twenty']+'PA2'+vocabulary['sixth'],
-    vocabulary['twenty']+'PA2'+vocabulary['seventh'],
-    vocabulary['twenty']+'PA2'+vocabulary['eighth'],
-    vocabulary['twenty']+'PA2'+vocabulary['ninth'],
+    ' '.join([vocabulary['twenty'], 'PA2', vocabulary['first']]),
+    ' '.join([vocabulary['twenty'], 'PA2', vocabulary['second']]),
+    ' '.join([vocabulary['twenty'], 'PA2', vocabulary['third']]),
+    ' '.join([vocabulary['twenty'], 'PA2', vocabulary['fourth']]),
+    ' '.join([vocabulary['twenty'], 'PA2', vocabulary['fifth']]),
+    ' '.join([vocabulary['twenty'], 'PA2', vocabulary['sixth']]),
+    ' '.join([vocabulary['twenty'], 'PA2', vocabulary['seventh']]),
+    ' '.join([vocabulary['twenty'], 'PA2', vocabulary['eighth']]),
+    ' '.join([vocabulary['twenty'], 'PA2', vocabulary['ninth']]),
     vocabulary['thirtieth'],
-    vocabulary['thirty']+'PA2'+vocabulary['first'] 
+    ' '.join([vocabulary['thirty'], 'PA2', vocabulary['first']])
     ]
 
 numbers = { 1:vocabulary['one'], 2:vocabulary['two'], 3:vocabulary['three'], 4:vocabulary['four'], 
@@ -338,3 +366,16 @@ numbers = { 1:vocabulary['one'], 2:vocabulary['two'], 3:vocabulary['three'], 4:v
             70:vocabulary['seventy'], 80:vocabulary['eighty'], 90:vocabulary['ninety'], 100:vocabulary['hundred'], 
             1000:vocabulary['thousand'], 1000000:vocabulary['million'] }
 
+# Phrases spoken as one block. The pauses between the words suit the phrase,
+# instead of the PA4 after every word that retroTTS uses when looking words up
+# one at a time. retroTTS uses the longest phrase that matches the text
+phrases = {
+    'the time is':vocabulary['the']+' PA2 '+vocabulary['time']+' PA3 '+vocabulary['is'],
+    'the date is':vocabulary['the']+' PA2 '+vocabulary['date']+' PA2 '+vocabulary['is'],
+    'today is':vocabulary['today']+' PA3 '+vocabulary['is'],
+    'o clock':vocabulary['o']+' PA1 '+vocabulary['clock'],
+    'hello raspberry pi':vocabulary['hello']+' PA4 '+vocabulary['raspberry']+' PA2 '+vocabulary['pi'],
+    'speak and spell':vocabulary['speak']+' PA2 '+vocabulary['and']+' PA2 '+vocabulary['spell'],
+    'stop the alarm':vocabulary['stop']+' PA2 '+vocabulary['the']+' PA1 '+vocabulary['alarm'],
+    'the alarm is':vocabulary['the']+' PA1 '+vocabulary['alarm']+' PA3 '+vocabulary['is'],
+    }